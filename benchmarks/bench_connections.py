@@ -0,0 +1,137 @@
+"""
+Benchmark connection latency and query throughput for each SQLCipher setting
+
+Each setting runs in its own process against a scratch database, configured through the same environment
+variables as the API. Prints the time to derive the key once, the latency of opening a new connection, and
+point lookups per second both through the pre-warmed pool and when every query opens its own connection.
+
+Run from the project root with `python -m benchmarks.bench_connections --reviews 5000`
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SETTINGS = {
+    "default": {},
+    "kdf-64k": {"DATABASE_KDF_ITER": "64000"},
+    "raw-key": {"DATABASE_RAW_KEY": "true", "DATABASE_KEY_SALT": "benchmark"},
+    "raw-key-16k-pages": {
+        "DATABASE_RAW_KEY": "true",
+        "DATABASE_KEY_SALT": "benchmark",
+        "DATABASE_CIPHER_PAGE_SIZE": "16384",
+    },
+    "raw-key-16mb-cache": {
+        "DATABASE_RAW_KEY": "true",
+        "DATABASE_KEY_SALT": "benchmark",
+        "DATABASE_CACHE_SIZE": "-16000",
+    },
+}
+
+
+def run_setting(reviews: int, connects: int, queries: int, concurrency: int) -> dict:
+    """Benchmark the settings in this process's environment"""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+    from sqlmodel import Session, SQLModel
+
+    from src.database import database_key, engine, sqlcipher_driver, warm_pool
+    from src.reviewers.models import Reviewer
+    from src.reviews.models import Review
+
+    start = time.perf_counter()
+    database_key()
+    key_seconds = time.perf_counter() - start
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Reviewer(email=f"reviewer{n}@example.com", name="Benchmark Reviewer", country="GBR")
+            for n in range(100)
+        )
+        session.flush()
+        session.add_all(
+            Review(reviewer_id=n % 100 + 1, title="Benchmark", rating=n % 5 + 1, content="Benchmark review")
+            for n in range(reviews)
+        )
+        session.commit()
+
+    unpooled = create_engine(engine.url, module=sqlcipher_driver, poolclass=NullPool)
+    latencies = []
+    for _ in range(connects):
+        start = time.perf_counter()
+        with unpooled.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        latencies.append(time.perf_counter() - start)
+
+    def lookups_per_second(lookup_engine) -> float:
+        def lookup(review_id: int):
+            with Session(lookup_engine) as session:
+                session.get(Review, review_id)
+
+        ids = [random.randint(1, reviews) for _ in range(queries)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lookup, ids))
+        return queries / (time.perf_counter() - start)
+
+    warm_pool(engine)
+    return {
+        "key_ms": key_seconds * 1000,
+        "connect_ms": statistics.mean(latencies) * 1000,
+        "connect_p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000,
+        "pooled_per_second": lookups_per_second(engine),
+        "unpooled_per_second": lookups_per_second(unpooled),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=5000, help="Number of reviews in each database")
+    parser.add_argument("--connects", type=int, default=20, help="Number of new connections to time")
+    parser.add_argument("--queries", type=int, default=2000, help="Number of point lookups per run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--settings", nargs="+", choices=list(SETTINGS), default=list(SETTINGS))
+    parser.add_argument("--run-setting", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_setting:
+        print(json.dumps(run_setting(args.reviews, args.connects, args.queries, args.concurrency)))
+        return
+
+    print(f"{args.reviews} reviews, {args.queries} lookups from {args.concurrency} threads")
+    print(f"{'setting':>20}{'key ms':>10}{'connect ms':>12}{'p95 ms':>10}{'pooled/s':>12}{'unpooled/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.settings:
+            env = {
+                **os.environ,
+                **SETTINGS[name],
+                "DATABASE_PATH": tmp_dir,
+                "DATABASE_NAME": name,
+                "DATABASE_POOL_SIZE": str(args.concurrency),
+            }
+            output = subprocess.run(
+                [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_connections", "--run-setting"]
+                + [f"--reviews={args.reviews}", f"--connects={args.connects}"]
+                + [f"--queries={args.queries}", f"--concurrency={args.concurrency}"],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{name:>20}{result['key_ms']:>10.1f}{result['connect_ms']:>12.1f}{result['connect_p95_ms']:>10.1f}"
+                f"{result['pooled_per_second']:>12.0f}{result['unpooled_per_second']:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
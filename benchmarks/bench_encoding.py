@@ -0,0 +1,94 @@
+"""
+Benchmark response size and encode CPU time for each response format
+
+Encodes a list of reviews, like the one returned by `GET /reviews/`, as JSON and MessagePack, each uncompressed
+and compressed with gzip and zstd. Prints bytes on the wire and CPU time per encode, including compression.
+The reviews cycle through the rows of the sample data, so compression ratios will be better than for real data.
+
+Run from the project root with `python -m benchmarks.bench_encoding --reviews 1000`
+"""
+
+import argparse
+import csv
+import itertools
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.compression import COMPRESSORS
+from src.config import COMPRESSION_GZIP_LEVEL, COMPRESSION_ZSTD_LEVEL
+from src.utils import demojize_str
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+LEVELS = {"gzip": COMPRESSION_GZIP_LEVEL, "zstd": COMPRESSION_ZSTD_LEVEL}
+
+
+def build_reviews(count: int, csv_path: str) -> list:
+    """Build a list of review responses by cycling through the rows of the sample data"""
+    with open(csv_path, mode="r", encoding="utf-8") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+
+    start = datetime(2024, 1, 1)
+    reviews = []
+    for review_id, row in zip(range(1, count + 1), itertools.cycle(rows)):
+        reviews.append(
+            {
+                "reviewer_id": review_id % 500 + 1,
+                "title": row["Review Title"],
+                "rating": int(row["Review Rating"]),
+                "content": demojize_str(row["Review Content"]),
+                "id": review_id,
+                "created_at": start + timedelta(minutes=review_id),
+            }
+        )
+    return jsonable_encoder(reviews)
+
+
+def cpu_time(func, repeat: int) -> float:
+    """Mean CPU time of a call, in milliseconds"""
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reviews", type=int, default=1000, help="Number of reviews in the response")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of times each encode is timed")
+    parser.add_argument("--data", default="./data/dataops_tp_reviews.csv")
+    args = parser.parse_args()
+
+    content = build_reviews(args.reviews, args.data)
+    serialisers = {"json": lambda: JSONResponse(content).body}
+    if msgpack:
+        serialisers["msgpack"] = lambda: msgpack.packb(content)
+
+    print(f"{args.reviews} reviews, mean of {args.repeat} runs")
+    print(f"{'format':<10}{'encoding':<10}{'bytes':>12}{'ratio':>8}{'cpu ms':>10}")
+    baseline = len(serialisers["json"]())
+    for format_name, serialise in serialisers.items():
+        body = serialise()
+        encode_ms = cpu_time(serialise, args.repeat)
+        print(
+            f"{format_name:<10}{'identity':<10}{len(body):>12}{len(body) / baseline:>8.2f}{encode_ms:>10.2f}"
+        )
+
+        for encoding, compressor_class in COMPRESSORS.items():
+            level = LEVELS[encoding]
+            compressed = compressor_class(level).finish(body)
+            compress_ms = cpu_time(lambda: compressor_class(level).finish(serialise()), args.repeat)
+            print(
+                f"{format_name:<10}{encoding:<10}{len(compressed):>12}"
+                f"{len(compressed) / baseline:>8.2f}{compress_ms:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
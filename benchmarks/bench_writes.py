@@ -0,0 +1,90 @@
+"""
+Benchmark write throughput with and without the group commit write queue
+
+Creates reviewers from concurrent threads against a scratch SQLCipher database, first with each write committing
+its own transaction and then through the write queue. Prints writes per second for each concurrency level.
+
+Run from the project root with `python -m benchmarks.bench_writes --writes 2000`
+"""
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlcipher3 import dbapi2 as sqlcipher_driver
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.config import WRITE_QUEUE_MAX_BATCH_SIZE, WRITE_QUEUE_MAX_WAIT
+from src.reviewers.models import Reviewer
+from src.writer import WriteQueue
+
+
+def create_reviewer(n: int):
+    def write(session: Session):
+        session.add(Reviewer(email=f"reviewer{n}@example.com", name="Benchmark Reviewer", country="GBR"))
+        session.flush()
+
+    return write
+
+
+def run_direct(session_factory: sessionmaker, offset: int, writes: int, concurrency: int) -> float:
+    def commit_write(n: int):
+        with session_factory() as session:
+            create_reviewer(n)(session)
+            session.commit()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(commit_write, range(offset, offset + writes)))
+    return writes / (time.perf_counter() - start)
+
+
+def run_queued(session_factory: sessionmaker, offset: int, writes: int, concurrency: int) -> float:
+    write_queue = WriteQueue(session_factory, WRITE_QUEUE_MAX_BATCH_SIZE, WRITE_QUEUE_MAX_WAIT)
+    write_queue.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(
+            executor.map(
+                lambda n: write_queue.submit(create_reviewer(n)).result(), range(offset, offset + writes)
+            )
+        )
+    elapsed = time.perf_counter() - start
+    write_queue.stop()
+    return writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000, help="Number of writes per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(
+            f"sqlite:///{Path(tmp_dir) / 'bench.db'}",
+            module=sqlcipher_driver,
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            pool_size=max(args.concurrency) + 1,
+        )
+        SQLModel.metadata.create_all(engine)
+        session_factory = sessionmaker(class_=Session, autocommit=False, autoflush=False, bind=engine)
+
+        print(f"{args.writes} writes per run")
+        print(f"{'concurrency':>12}{'direct/s':>12}{'queued/s':>12}")
+        offset = 0
+        for concurrency in args.concurrency:
+            direct = run_direct(session_factory, offset, args.writes, concurrency)
+            queued = run_queued(session_factory, offset + args.writes, args.writes, concurrency)
+            offset += 2 * args.writes
+            print(f"{concurrency:>12}{direct:>12.0f}{queued:>12.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Run the API server, with `WORKERS` processes sharing the database
+
+Run from the project root with `python -m src`
+"""
+
+import uvicorn
+
+from .config import HOST, PORT, WORKERS
+
+
+def main():
+    uvicorn.run("src.api:app", host=HOST, port=PORT, workers=WORKERS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+from typing import Annotated, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastapi.routing import APIRoute
+from pydantic import Field
+from sqlmodel import SQLModel
+
+from ..auth import verify_admin_api_key
+from ..backup import BackupResponce, backup_manager
+from ..config import PROFILE_MAX_SECONDS
+from ..metrics import metrics
+from ..profiler import ProfileFormat, SamplingProfiler
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(verify_admin_api_key)])
+
+# Only one profile runs at a time, as profiles would include each other
+profile_lock = threading.Lock()
+
+
+class BackupRequest(SQLModel):
+    file_name: str | None = Field(
+        default=None,
+        pattern=r"^[\w\-.]+\.db$",
+        description="Name of the backup file in the backup directory, defaults to the database name and time",
+    )
+
+
+@router.post("/backups", response_model=BackupResponce, status_code=status.HTTP_202_ACCEPTED)
+def create_backup(backup: BackupRequest | None = None):
+    """## Start an online backup of the database
+
+    The backup runs in the background, copying the database in small steps so requests aren't held up. The backup is encrypted with the same key as the database. Poll the returned backup for its progress.
+    """
+    job = backup_manager.start(backup.file_name if backup else None)
+    return BackupResponce.model_validate(job)
+
+
+@router.get("/backups", response_model=List[BackupResponce])
+def get_backups():
+    """## Retrieve all backups started since the API started"""
+    return [BackupResponce.model_validate(job) for job in backup_manager.list()]
+
+
+@router.get("/backups/{backup_id}", response_model=BackupResponce)
+def get_backup(backup_id: str):
+    """## Retrieve the progress of a backup"""
+    job = backup_manager.get(backup_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Backup not found")
+    return BackupResponce.model_validate(job)
+
+
+@router.get("/metrics", response_model=Dict[str, float])
+def get_metrics():
+    """## Retrieve the API's metrics
+
+    Includes the size of the database's WAL file and number of free pages, along with counts of the maintenance that has been run. With multiple workers, the counts are for the worker that handles the request.
+    """
+    return metrics.snapshot()
+
+
+@router.post(
+    "/profile",
+    response_class=Response,
+    responses={status.HTTP_200_OK: {"content": {"text/plain": {}, "application/json": {}}}},
+)
+def profile(
+    request: Request,
+    seconds: Annotated[
+        float, Query(title="Seconds", description="How long to sample for.", gt=0, le=PROFILE_MAX_SECONDS)
+    ] = 5.0,
+    interval: Annotated[
+        float, Query(title="Interval", description="Seconds between samples.", ge=0.001, le=1.0)
+    ] = 0.005,
+    format: Annotated[
+        ProfileFormat,
+        Query(title="Format", description="Either `collapsed` stacks or a `speedscope` profile."),
+    ] = ProfileFormat.collapsed,
+    route: Annotated[
+        str | None,
+        Query(
+            title="Route",
+            description="Only profile requests to this route, using its path template like `/reviews/{review_id}`.",
+        ),
+    ] = None,
+    include_idle: Annotated[
+        bool, Query(title="Include Idle", description="Include threads that are waiting for work.")
+    ] = False,
+):
+    """## Profile the running API
+
+    Samples the stacks of all the API's threads for a number of seconds, to show where time is being spent while it handles requests. With multiple workers, only the worker that handles this request is profiled.
+
+    Collapsed stacks can be turned into a flame graph with `flamegraph.pl`, and speedscope profiles can be opened at https://www.speedscope.app.
+    """
+    codes = None
+    if route is not None:
+        codes = frozenset(
+            api_route.endpoint.__code__
+            for api_route in request.app.routes
+            if isinstance(api_route, APIRoute) and api_route.path.rstrip("/") == route.rstrip("/")
+        )
+        if not codes:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    try:
+        result = SamplingProfiler(interval=interval, codes=codes, include_idle=include_idle).run(seconds)
+    finally:
+        profile_lock.release()
+
+    if format == ProfileFormat.speedscope:
+        return JSONResponse(result.speedscope())
+    return PlainTextResponse(result.collapsed())
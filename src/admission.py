@@ -0,0 +1,165 @@
+"""
+Admission control middleware
+
+Each request takes a slot from the budget for its class before it is handled: reads, writes, or heavy list queries
+like `GET /reviews`. Once a class's slots are taken, requests wait in a bounded queue for one to free up. When the
+queue is full, or a request has waited longer than the queue timeout, it is rejected straight away with a `503`
+and a `Retry-After` header. So under a spike the requests that are accepted still get a fast response, rather than
+every request queueing in the threadpool until they all time out.
+
+Heavy queries have their own budget so they can't use up the slots for cheap reads, and writes have theirs as
+SQLite only runs one write at a time. Limits are per worker.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict, FrozenSet, Tuple
+
+from fastapi import status
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics import MetricsRegistry, metrics
+from .responses import NegotiatedResponse, request_media_type
+
+log = logging.getLogger(__name__)
+
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+# Routes with their own budget, as method and path without the trailing slash
+HEAVY_ROUTES: FrozenSet[Tuple[str, str]] = frozenset((("GET", "/reviews"), ("GET", "/reviews/export")))
+
+# Paths that are always admitted, so the API can still be inspected and health checked while it is overloaded
+EXEMPT_PREFIXES: Tuple[str, ...] = ("/admin", "/healthz", "/readyz")
+
+
+class RequestClass(str, Enum):
+    read = "read"
+    write = "write"
+    heavy = "heavy"
+
+
+def route_path(scope: Scope) -> str:
+    """Path of the request relative to the application's root path"""
+    path, root_path = scope["path"], scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    return path.rstrip("/") or "/"
+
+
+def classify(method: str, path: str) -> RequestClass:
+    if (method, path) in HEAVY_ROUTES:
+        return RequestClass.heavy
+    if method in READ_METHODS:
+        return RequestClass.read
+    return RequestClass.write
+
+
+class ConcurrencyLimit:
+    """Limits the number of requests running at once, with a bounded queue of requests waiting for a slot
+
+    Slots are handed straight to the longest waiting request when they are released, so waiting requests are
+    admitted in order. Only used from the event loop, so it doesn't need a lock.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting for one if needed, returning whether a slot was taken"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the wait timed out, in which case it is taken
+            return waiter.done() and not waiter.cancelled()
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the request was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return True
+
+    def release(self):
+        """Free a slot, handing it to the next waiting request if there is one"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Dict[RequestClass, ConcurrencyLimit],
+        retry_after: int = 1,
+        metrics: MetricsRegistry = metrics,
+    ):
+        self.app = app
+        self.limits = limits
+        self.retry_after = retry_after
+        self.metrics = metrics
+        metrics.register_collector("admission", self.collect)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = route_path(scope)
+        if path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        request_class = classify(scope["method"], path)
+        limit = self.limits[request_class]
+        if not await limit.acquire():
+            self.metrics.increment(f"admission.{request_class.value}.rejected")
+            log.warning(f"Rejected {scope['method']} {path}, too many {request_class.value} requests")
+            # Runs before content negotiation, so the response is negotiated here
+            response = NegotiatedResponse(
+                {"detail": "Service is overloaded, try again later"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after), "Vary": "Accept"},
+                media_type=request_media_type(scope),
+            )
+            await response(scope, receive, send)
+            return
+
+        self.metrics.increment(f"admission.{request_class.value}.admitted")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+    def collect(self) -> Dict[str, float]:
+        """Current limits and usage of each budget as metrics"""
+        values = {}
+        for request_class, limit in self.limits.items():
+            values[f"admission.{request_class.value}.limit"] = limit.limit
+            values[f"admission.{request_class.value}.queue_size"] = limit.queue_size
+            values[f"admission.{request_class.value}.active"] = limit.active
+            values[f"admission.{request_class.value}.queued"] = limit.queued
+        return values
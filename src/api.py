@@ -9,16 +9,66 @@ import sys
 from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from fastapi.utils import is_body_allowed_for_status_code
 from pydantic import ValidationError
 from sqlmodel import SQLModel
+from starlette.exceptions import HTTPException
 
+from .admin.router import router as admin_router
+from .admission import AdmissionMiddleware, ConcurrencyLimit, RequestClass
 from .auth import verify_api_key
-from .config import ENVIRONMENT, LOG_FORMAT, LOG_LEVEL, PROJECT_NAME
-from .database import engine, get_table_names
-from .ingest import load_database_from_csv
+from .changes.router import router as changes_router
+from .compression import CompressionMiddleware
+from .config import (
+    ADMISSION_ENABLED,
+    ADMISSION_HEAVY_LIMIT,
+    ADMISSION_HEAVY_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_READ_LIMIT,
+    ADMISSION_READ_QUEUE,
+    ADMISSION_RETRY_AFTER,
+    ADMISSION_WRITE_LIMIT,
+    ADMISSION_WRITE_QUEUE,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MINIMUM_SIZE,
+    COMPRESSION_ZSTD_LEVEL,
+    ENVIRONMENT,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    MAINTENANCE_ENABLED,
+    PROJECT_NAME,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_HEAVY_COST,
+    RATE_LIMIT_RATE,
+    RATE_LIMIT_WRITE_COST,
+    SEED_IN_BACKGROUND,
+    WORKERS,
+    WRITE_QUEUE_ENABLED,
+)
+from .database import (
+    engine,
+    get_table_names,
+    migrate_database,
+    rekey_database,
+    set_schema_version,
+    startup_lock,
+    warm_pool,
+)
+from .health.router import router as health_router
+from .health.service import seeder
+from .ingestion.router import router as ingestion_router
+from .maintenance import enable_incremental_vacuum, maintenance_scheduler
+from .metrics import metrics
+from .ratelimit import RateLimitMiddleware
+from .responses import ContentNegotiationMiddleware, NegotiatedResponse
 from .reviewers.router import router as reviewers_router
 from .reviews.router import router as reviews_router
+from .similarity import similarity_backfill
+from .writer import write_queue
 
 log = logging.getLogger(__name__)
 
@@ -29,37 +79,114 @@ logging.basicConfig(level=LOG_LEVEL, handlers=[console_handler])
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    table_names = get_table_names()
-    if not table_names:
-        log.info("Creating Database tables")
-        SQLModel.metadata.create_all(engine)
-        log.info("Created Database tables")
+    # With multiple workers each one runs this, the lock makes sure the database is only set up once
+    with startup_lock():
+        rekey_database()
+        enable_incremental_vacuum(engine)
+        table_names = get_table_names()
+        if not table_names:
+            log.info("Creating Database tables")
+            SQLModel.metadata.create_all(engine)
+            set_schema_version(engine)
+            log.info("Created Database tables")
 
-        load_database_from_csv("./data/dataops_tp_reviews.csv")
-    else:
-        log.info("Database tables already exist")
+            seeder.start(background=SEED_IN_BACKGROUND)
+        else:
+            log.info("Database tables already exist")
+            # Bring databases created by older versions up to date
+            migrate_database(engine)
+
+    warm_pool(engine)
+    if WRITE_QUEUE_ENABLED:
+        write_queue.start()
+    metrics.register_collector("database", maintenance_scheduler.collect)
+    if MAINTENANCE_ENABLED:
+        maintenance_scheduler.start()
+    # Index reviews written before the similarity index existed, without holding up startup
+    similarity_backfill.start()
 
     yield
 
+    similarity_backfill.stop()
+    maintenance_scheduler.stop()
+    write_queue.stop()
+
 
 # FastAPI application
 app = FastAPI(
     title=f"{PROJECT_NAME}-{ENVIRONMENT}",
     description=__doc__,
-    dependencies=[
-        Depends(verify_api_key)
-    ],
     root_path="/api/v1",
     lifespan=lifespan,
+    default_response_class=NegotiatedResponse,
 )
 
-app.include_router(reviewers_router)
-app.include_router(reviews_router)
+# Middleware added last runs first, so responses are negotiated before they are compressed
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    zstd_level=COMPRESSION_ZSTD_LEVEL,
+)
+# Added near the end so requests are rejected before doing any other work
+if ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        limits={
+            RequestClass.read: ConcurrencyLimit(
+                ADMISSION_READ_LIMIT, ADMISSION_READ_QUEUE, ADMISSION_QUEUE_TIMEOUT
+            ),
+            RequestClass.write: ConcurrencyLimit(
+                ADMISSION_WRITE_LIMIT, ADMISSION_WRITE_QUEUE, ADMISSION_QUEUE_TIMEOUT
+            ),
+            RequestClass.heavy: ConcurrencyLimit(
+                ADMISSION_HEAVY_LIMIT, ADMISSION_HEAVY_QUEUE, ADMISSION_QUEUE_TIMEOUT
+            ),
+        },
+        retry_after=ADMISSION_RETRY_AFTER,
+    )
+# Runs before admission control, so clients over their rate limit don't take up slots
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rate=RATE_LIMIT_RATE / WORKERS,
+        burst=RATE_LIMIT_BURST / WORKERS,
+        costs={
+            RequestClass.read: 1,
+            RequestClass.write: RATE_LIMIT_WRITE_COST,
+            RequestClass.heavy: RATE_LIMIT_HEAVY_COST,
+        },
+    )
+
+# Health checks don't need an API key, so they can be used by orchestrators
+app.include_router(health_router)
+app.include_router(reviewers_router, dependencies=[Depends(verify_api_key)])
+app.include_router(reviews_router, dependencies=[Depends(verify_api_key)])
+app.include_router(changes_router, dependencies=[Depends(verify_api_key)])
+app.include_router(ingestion_router, dependencies=[Depends(verify_api_key)])
+app.include_router(admin_router, dependencies=[Depends(verify_api_key)])
+
+
+# Errors are negotiated like any other response, so MessagePack clients get them as MessagePack
+@app.exception_handler(HTTPException)
+async def http_exception_handler(request: Request, exc: HTTPException):
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=exc.headers)
+    return NegotiatedResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
+@app.exception_handler(RequestValidationError)
+async def request_validation_exception_handler(request: Request, exc: RequestValidationError):
+    return NegotiatedResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": jsonable_encoder(exc.errors())},
+    )
 
 
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request: Request, exc: ValidationError):
-    return JSONResponse(
+    return NegotiatedResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": exc.errors()[0]},
     )
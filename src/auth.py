@@ -1,7 +1,12 @@
+import secrets
+
 from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 
+from .config import ADMIN_API_KEY
+
 api_key_header = APIKeyHeader(name="X-API-Key")
+admin_api_key_header = APIKeyHeader(name="X-Admin-API-Key", auto_error=False)
 
 def verify_api_key(api_key_header: str = Security(api_key_header)) -> bool:
     """Verify if the API Key in request header is valid"""
@@ -17,3 +22,13 @@ def verify_api_key(api_key_header: str = Security(api_key_header)) -> bool:
 def check_api_key(api_key: str):
     """Check if API key is valid"""
     return not api_key.startswith("dud0-")
+
+
+def verify_admin_api_key(admin_api_key: str | None = Security(admin_api_key_header)) -> bool:
+    """Verify the admin API Key in request header, admin endpoints are disabled if no admin key is configured"""
+    if str(ADMIN_API_KEY) and admin_api_key and secrets.compare_digest(admin_api_key, str(ADMIN_API_KEY)):
+        return True
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Not authenticated"
+    )
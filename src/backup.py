@@ -0,0 +1,252 @@
+"""
+Online backups of the database
+
+Backups use SQLite's online backup API, which copies a consistent snapshot of the database while the API keeps
+serving requests, unlike copying the file which isn't safe in WAL mode. Pages are copied in small steps with a
+sleep in between, so a backup doesn't hold the database for long enough to starve requests. The backup is keyed
+with the same key as the database, so it stays encrypted.
+
+SQLite restarts a backup from the beginning whenever another connection writes to the database between steps, so
+under sustained writes a paced backup may never finish. After `BACKUP_MAX_RESTARTS` restarts the rest of the
+database is copied in a single step instead. In WAL mode this doesn't block writers, but checkpoints can't complete
+until it has finished.
+
+Run from the command line with `python -m src.backup --output reviews-backup.db`
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlmodel import SQLModel
+
+from .config import (
+    BACKUP_MAX_RESTARTS,
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_PATH,
+    BACKUP_STEP_SLEEP,
+    DATABASE,
+    DATABASE_NAME,
+    LOG_FORMAT,
+    LOG_LEVEL,
+)
+from .database import connection_pragmas, database_key, sqlcipher_driver
+
+log = logging.getLogger(__name__)
+
+# Called after each step with the number of pages remaining, the total number of pages and the number of restarts
+Progress = Callable[[int, int, int], None]
+
+
+class _TooManyRestarts(Exception):
+    """Aborts a paced backup that keeps being restarted by writes"""
+
+
+def _connect(path: Path, key: str):
+    connection = sqlcipher_driver.connect(str(path), check_same_thread=False)
+    # Only the key and cipher settings, the backup copies everything else from the database
+    for pragma in connection_pragmas(key)[:3]:
+        connection.execute(pragma)
+    return connection
+
+
+def backup_database(
+    destination: Path,
+    source: Path = DATABASE,
+    key: str | None = None,
+    pages: int = BACKUP_PAGES_PER_STEP,
+    sleep: float = BACKUP_STEP_SLEEP,
+    progress: Progress | None = None,
+    max_restarts: int = BACKUP_MAX_RESTARTS,
+) -> int:
+    """Back up the database to a new file, encrypted with the same key, returning how many times it restarted
+
+    The backup is written to a temporary file next to the destination, which is only renamed once the backup has
+    completed. So the destination is never a partial backup. Raises `FileExistsError` rather than overwriting a file
+    already at the destination.
+    """
+    if destination.exists():
+        raise FileExistsError(f"{destination} already exists")
+    key = key if key is not None else database_key()
+    partial = destination.with_name(f"{destination.name}.partial")
+    partial.unlink(missing_ok=True)
+    restarts = 0
+    previous_remaining: int | None = None
+    paced = True
+
+    def step(status: int, remaining: int, total: int):
+        nonlocal restarts, previous_remaining
+        # Every step copies some pages, so when as many are left as before the backup has started again
+        if paced and previous_remaining is not None and remaining >= previous_remaining:
+            restarts += 1
+        previous_remaining = remaining
+        if progress:
+            progress(remaining, total, restarts)
+        if paced and restarts > max_restarts:
+            raise _TooManyRestarts()
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    source_connection = _connect(source, key)
+    try:
+        target_connection = _connect(partial, key)
+        try:
+            try:
+                source_connection.backup(target_connection, pages=pages, progress=step)
+            except _TooManyRestarts:
+                log.warning(f"Backup restarted {restarts} times by writes, copying it in a single step")
+                paced = False
+                source_connection.backup(target_connection, pages=-1, progress=step)
+        finally:
+            target_connection.close()
+    except Exception:
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        source_connection.close()
+    # Linking fails if the destination was created while backing up, where renaming would replace it
+    try:
+        os.link(partial, destination)
+    finally:
+        partial.unlink(missing_ok=True)
+    return restarts
+
+
+class BackupStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+@dataclass
+class BackupJob:
+    id: str
+    file_name: str
+    created_at: datetime
+    status: BackupStatus = BackupStatus.pending
+    pages_total: int | None = None
+    pages_remaining: int | None = None
+    restarts: int = 0
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == BackupStatus.completed:
+            return 1.0
+        if not self.pages_total:
+            return 0.0
+        return (self.pages_total - self.pages_remaining) / self.pages_total
+
+
+class BackupResponce(SQLModel):
+    id: str
+    file_name: str
+    status: BackupStatus
+    progress: float
+    pages_total: int | None
+    pages_remaining: int | None
+    restarts: int
+    created_at: datetime
+    finished_at: datetime | None
+    error: str | None
+
+
+def backup_file_name() -> str:
+    # Down to the microsecond, so backups started in the same second don't share a file
+    return f"{DATABASE_NAME}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}.db"
+
+
+class BackupManager:
+    """Runs backups one at a time in a background thread, keeping track of their progress
+
+    Jobs are tracked in memory, so with multiple workers a job's progress is only known to the worker running it.
+    """
+
+    def __init__(self, backup_path: Path = BACKUP_PATH, source: Path = DATABASE):
+        self.backup_path = backup_path
+        self.source = source
+        self.jobs: Dict[str, BackupJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+
+    def start(self, file_name: str | None = None) -> BackupJob:
+        """Queue a backup to a file in the backup directory"""
+        job = BackupJob(
+            id=uuid.uuid4().hex,
+            file_name=file_name or backup_file_name(),
+            created_at=datetime.now(timezone.utc),
+        )
+        with self._lock:
+            self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> BackupJob | None:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[BackupJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _run(self, job: BackupJob):
+        def progress(remaining: int, total: int, restarts: int):
+            job.pages_remaining = remaining
+            job.pages_total = total
+            job.restarts = restarts
+
+        job.status = BackupStatus.running
+        log.info(f"Backing up database to {job.file_name}")
+        try:
+            self.backup_path.mkdir(parents=True, exist_ok=True)
+            backup_database(self.backup_path / job.file_name, source=self.source, progress=progress)
+        except Exception as err:
+            log.exception(f"Backup to {job.file_name} failed")
+            job.status = BackupStatus.failed
+            job.error = str(err)
+        else:
+            log.info(f"Backed up database to {job.file_name}")
+            job.status = BackupStatus.completed
+        job.finished_at = datetime.now(timezone.utc)
+
+
+backup_manager = BackupManager()
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Back up the database while the API is running")
+    parser.add_argument(
+        "--output", type=Path, help="File to write the backup to, defaults to the backup directory"
+    )
+    parser.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages copied per step")
+    parser.add_argument(
+        "--sleep", type=float, default=BACKUP_STEP_SLEEP, help="Seconds to sleep between steps"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, stream=sys.stderr)
+
+    output = args.output or BACKUP_PATH / backup_file_name()
+    if output.exists():
+        parser.error(f"{output} already exists")
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    def progress(remaining: int, total: int, restarts: int):
+        log.info(f"Backed up {total - remaining} of {total} pages, restarted {restarts} times")
+
+    backup_database(output, pages=args.pages, sleep=args.sleep, progress=progress)
+    log.info(f"Backed up database to {output}")
+
+
+if __name__ == "__main__":
+    main()
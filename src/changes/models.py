@@ -0,0 +1,64 @@
+from datetime import datetime
+from enum import Enum
+from typing import List
+
+from sqlalchemy import DDL, JSON, Column, Table, event
+from sqlmodel import Field, SQLModel
+
+from ..reviewers.models import Reviewer, ReviewerResponce
+from ..reviews.models import Review, ReviewResponce
+
+
+class ChangeOperation(str, Enum):
+    insert = "insert"
+    update = "update"
+    delete = "delete"
+
+
+class ChangeBase(SQLModel):
+    entity: str
+    entity_id: int
+    operation: ChangeOperation
+    changed_at: datetime
+
+
+class Change(ChangeBase, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}  # Sequence numbers are never reused
+
+    seq: int | None = Field(default=None, primary_key=True)
+    data: dict | None = Field(default=None, sa_column=Column(JSON))  # Row after the change, null for deletes
+
+
+class ChangeResponce(ChangeBase):
+    seq: int
+    data: ReviewerResponce | ReviewResponce | None = None
+
+
+# Tables that have their changes recorded in the change feed
+TRACKED_TABLES: List[Table] = [Reviewer.__table__, Review.__table__]
+
+
+def change_trigger(table: Table, operation: ChangeOperation) -> DDL:
+    """Trigger that records a change to a row of the table in the change feed"""
+    row = "OLD" if operation == ChangeOperation.delete else "NEW"
+    if operation == ChangeOperation.delete:
+        data = "NULL"
+    else:
+        data = "json_object({})".format(
+            ", ".join(f"'{column.name}', NEW.{column.name}" for column in table.columns)
+        )
+    return DDL(
+        # Percent signs are escaped, as DDL statements are formatted with the % operator
+        f"CREATE TRIGGER IF NOT EXISTS {table.name}_{operation.value}_change "
+        f"AFTER {operation.value.upper()} ON {table.name} "
+        "BEGIN "
+        f"INSERT INTO {Change.__tablename__} (entity, entity_id, operation, changed_at, data) "
+        f"VALUES ('{table.name}', {row}.id, '{operation.value}', strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now'), {data}); "
+        "END"
+    )
+
+
+# Triggers are created once all tables exist, so they are also added to existing databases
+for table in TRACKED_TABLES:
+    for operation in ChangeOperation:
+        event.listen(SQLModel.metadata, "after_create", change_trigger(table, operation))
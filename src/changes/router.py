@@ -0,0 +1,46 @@
+from typing import Annotated, List
+
+from fastapi import APIRouter, Query
+from sqlmodel import select
+
+from ..database import Session
+from ..reviewers.models import Reviewer, ReviewerResponce
+from ..reviews.models import Review, ReviewResponce
+from .models import Change, ChangeResponce
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+RESPONSE_MODELS = {
+    Reviewer.__tablename__: ReviewerResponce,
+    Review.__tablename__: ReviewResponce,
+}
+
+
+@router.get("/", response_model=List[ChangeResponce])
+def get_changes(
+    session: Session,
+    since: Annotated[
+        int,
+        Query(
+            title="Since Sequence Number",
+            description="Only return changes after this sequence number. Use the `seq` of the last change from the previous call to get the next page.",
+            ge=0,
+        ),
+    ] = 0,
+    limit: Annotated[
+        int,
+        Query(title="Limit", description="Maximum number of changes to return.", ge=1, le=1000),
+    ] = 100,
+):
+    """## Retrieve changes made to reviewers and reviews
+
+    Every insert, update and delete is recorded with an increasing sequence number, so the data can be kept in sync by only fetching changes since the last sync. Changes are returned in the order they were made. Inserts and updates include the row after the change, deletes only include the id of the deleted row.
+    """
+    changes = session.exec(select(Change).where(Change.seq > since).order_by(Change.seq).limit(limit)).all()
+    return [
+        ChangeResponce(
+            **change.model_dump(exclude={"data"}),
+            data=RESPONSE_MODELS[change.entity].model_validate(change.data) if change.data else None,
+        )
+        for change in changes
+    ]
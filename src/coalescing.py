@@ -0,0 +1,138 @@
+"""
+Request coalescing for identical concurrent reads
+
+When many identical reads arrive at once, such as a popular review or filtered list, each would run the same query.
+Instead the first request runs the query and renders its response, and requests with the same key that arrive
+while it is running wait for it and share the rendered response.
+
+Every write committed by this worker increments a commit generation, which is part of the key. Writes committed by
+other workers are seen through the WAL file, which every commit appends to, so its size and modification time are
+part of the key too. So a request that arrives after a write has committed, by any worker, never shares the
+response of a query that started before it, and always sees the write.
+"""
+
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import COALESCING_ENABLED
+from .database import DATABASE, wal_path
+from .metrics import MetricsRegistry, metrics
+from .responses import NegotiatedResponse, negotiated_media_type
+
+T = TypeVar("T")
+
+
+def database_version(database: Path = DATABASE) -> Tuple[int, int]:
+    """Size and modification time of the WAL file, which change whenever any worker commits a write"""
+    try:
+        stat = wal_path(database).stat()
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+class SingleFlight:
+    """Shares one in progress call between concurrent callers with the same key
+
+    Calls are only shared by callers that see the same `version`, along with the same generation.
+    """
+
+    def __init__(
+        self, name: str, metrics: MetricsRegistry = metrics, version: Callable[[], Hashable] | None = None
+    ):
+        self.name = name
+        self.metrics = metrics
+        self.version = version
+        self.generation = 0
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        metrics.register_collector(f"coalescing.{name}", self.collect)
+
+    def invalidate(self):
+        """Start a new generation, so calls already in progress aren't shared with later callers"""
+        with self._lock:
+            self.generation += 1
+
+    def do(self, key: Hashable, call: Callable[[], T]) -> T:
+        """Run the call, or wait for the result of the call with the same key that is already running"""
+        version = self.version() if self.version else None
+        with self._lock:
+            key = (self.generation, version, key)
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            self.metrics.increment(f"coalescing.{self.name}.shared")
+            return future.result()
+
+        self.metrics.increment(f"coalescing.{self.name}.executed")
+        try:
+            result = call()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def collect(self) -> Dict[str, float]:
+        """Proportion of calls that shared another call's result"""
+        executed = self.metrics.get(f"coalescing.{self.name}.executed")
+        shared = self.metrics.get(f"coalescing.{self.name}.shared")
+        total = executed + shared
+        return {f"coalescing.{self.name}.ratio": shared / total if total else 0.0}
+
+
+read_flights = SingleFlight("reads", version=database_version)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_reads(session: Session):
+    read_flights.invalidate()
+
+
+@dataclass(frozen=True)
+class SharedResponse:
+    body: bytes
+    media_type: str
+    headers: Tuple[Tuple[str, str], ...]
+
+    def response(self) -> Response:
+        """A new response for each request sharing this one, as responses are modified as they are sent"""
+        return Response(self.body, media_type=self.media_type, headers=dict(self.headers))
+
+
+def coalesced_response(
+    key: Hashable,
+    load: Callable[[], Tuple[Any, Dict[str, str]]],
+    adapter: TypeAdapter,
+    flights: SingleFlight = read_flights,
+) -> Response:
+    """Respond with the content and headers returned by `load`, sharing it with identical concurrent requests
+
+    The content is validated with the response model's adapter and rendered once, in the negotiated media type.
+    """
+    media_type = negotiated_media_type.get()
+
+    def render() -> SharedResponse:
+        content, headers = load()
+        content = adapter.dump_python(adapter.validate_python(content, from_attributes=True), mode="json")
+        response = NegotiatedResponse(content, media_type=media_type)
+        return SharedResponse(response.body, media_type, tuple(headers.items()))
+
+    if not COALESCING_ENABLED:
+        return render().response()
+    return flights.do((media_type, key), render).response()
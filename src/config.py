@@ -9,6 +9,11 @@ config = Config(".env")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_LEVEL: int = config("LOG_LEVEL", cast=int, default=logging.INFO)
 
+HOST: str = config("HOST", default="127.0.0.1")
+PORT: int = config("PORT", cast=int, default=8000)
+# Number of server processes started by `python -m src`
+WORKERS: int = config("WORKERS", cast=int, default=1)
+
 ENVIRONMENT: str = config("ENVIRONMENT", default="local")
 PROJECT_NAME: str = config("PROJECT_NAME", default="trustpilot-reviews")
 
@@ -17,3 +22,100 @@ DATABASE_PATH: Path = config("DATABASE_PATH", default=Path(__file__).resolve().p
 DATABASE_NAME: str = config("DATABASE_NAME", default="reviews")
 DATABASE: Path = DATABASE_PATH / (DATABASE_NAME + ".db")
 DATABASE_PASSPHRASE: str = config("DATABASE_PASSPHRASE", cast=Secret)
+# Derive the encryption key from the passphrase once per process rather than SQLCipher deriving it on every
+# connection. Switching this on or off changes the key, so an existing database must be rekeyed
+DATABASE_RAW_KEY: bool = config("DATABASE_RAW_KEY", cast=bool, default=False)
+DATABASE_KEY_SALT: str = config("DATABASE_KEY_SALT", cast=Secret, default="")
+# SQLCipher settings, the KDF iterations and page size must match the ones the database was created with
+DATABASE_KDF_ITER: int = config("DATABASE_KDF_ITER", cast=int, default=256000)
+DATABASE_CIPHER_PAGE_SIZE: int = config("DATABASE_CIPHER_PAGE_SIZE", cast=int, default=4096)
+# Page cache per connection, negative values are in KiB and positive values are a number of pages
+DATABASE_CACHE_SIZE: int = config("DATABASE_CACHE_SIZE", cast=int, default=-2000)
+# Connections are opened when the application starts and kept open, requests wait for a free connection.
+# This is the total across all workers, each worker gets an equal share of it
+DATABASE_POOL_SIZE: int = config("DATABASE_POOL_SIZE", cast=int, default=10)
+DATABASE_POOL_TIMEOUT: float = config("DATABASE_POOL_TIMEOUT", cast=float, default=30.0)
+
+# Load the seed data into a new database in the background, so the API starts straight away. `/readyz` reports
+# the API as not ready until the data has loaded
+SEED_IN_BACKGROUND: bool = config("SEED_IN_BACKGROUND", cast=bool, default=False)
+
+# Background database maintenance, checkpointing the WAL file and freeing unused pages
+MAINTENANCE_ENABLED: bool = config("MAINTENANCE_ENABLED", cast=bool, default=True)
+MAINTENANCE_INTERVAL: float = config("MAINTENANCE_INTERVAL", cast=float, default=10.0)
+# Seconds without any writes before the database is treated as idle
+MAINTENANCE_IDLE_SECONDS: float = config("MAINTENANCE_IDLE_SECONDS", cast=float, default=30.0)
+# WAL file size in bytes above which a passive checkpoint is run, even when the database isn't idle
+WAL_CHECKPOINT_SIZE: int = config("WAL_CHECKPOINT_SIZE", cast=int, default=4 * 1024 * 1024)
+# Free pages needed before an incremental vacuum is run while idle, and the most pages freed per run
+VACUUM_FREELIST_PAGES: int = config("VACUUM_FREELIST_PAGES", cast=int, default=100)
+VACUUM_PAGES_PER_RUN: int = config("VACUUM_PAGES_PER_RUN", cast=int, default=1000)
+
+# Admission control, the most requests of each class handled at once by each worker, and how many more can wait
+ADMISSION_ENABLED: bool = config("ADMISSION_ENABLED", cast=bool, default=True)
+ADMISSION_READ_LIMIT: int = config("ADMISSION_READ_LIMIT", cast=int, default=32)
+ADMISSION_READ_QUEUE: int = config("ADMISSION_READ_QUEUE", cast=int, default=64)
+ADMISSION_WRITE_LIMIT: int = config("ADMISSION_WRITE_LIMIT", cast=int, default=8)
+ADMISSION_WRITE_QUEUE: int = config("ADMISSION_WRITE_QUEUE", cast=int, default=32)
+# Heavy list queries, like `GET /reviews`
+ADMISSION_HEAVY_LIMIT: int = config("ADMISSION_HEAVY_LIMIT", cast=int, default=4)
+ADMISSION_HEAVY_QUEUE: int = config("ADMISSION_HEAVY_QUEUE", cast=int, default=8)
+# Seconds a request can wait for a slot before it is rejected, and the `Retry-After` sent when it is
+ADMISSION_QUEUE_TIMEOUT: float = config("ADMISSION_QUEUE_TIMEOUT", cast=float, default=2.0)
+ADMISSION_RETRY_AFTER: int = config("ADMISSION_RETRY_AFTER", cast=int, default=1)
+
+# Per API key rate limits, a token bucket refilling at `RATE_LIMIT_RATE` tokens a second up to `RATE_LIMIT_BURST`
+# tokens. Reads cost one token, writes and heavy list queries cost more. The limits are split between the workers
+RATE_LIMIT_ENABLED: bool = config("RATE_LIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMIT_RATE: float = config("RATE_LIMIT_RATE", cast=float, default=50.0)
+RATE_LIMIT_BURST: float = config("RATE_LIMIT_BURST", cast=float, default=100.0)
+RATE_LIMIT_WRITE_COST: float = config("RATE_LIMIT_WRITE_COST", cast=float, default=5.0)
+RATE_LIMIT_HEAVY_COST: float = config("RATE_LIMIT_HEAVY_COST", cast=float, default=10.0)
+
+# Share the response of identical reads running at the same time, rather than each one running the query
+COALESCING_ENABLED: bool = config("COALESCING_ENABLED", cast=bool, default=True)
+
+# Key for the admin endpoints, sent in the `X-Admin-API-Key` header. Admin endpoints are disabled when not set
+ADMIN_API_KEY: str = config("ADMIN_API_KEY", cast=Secret, default="")
+
+# Longest a profile of the running API, from `/admin/profile`, can sample for
+PROFILE_MAX_SECONDS: float = config("PROFILE_MAX_SECONDS", cast=float, default=60.0)
+
+# Directory online backups are written to
+BACKUP_PATH: Path = config("BACKUP_PATH", cast=Path, default=DATABASE_PATH / "backups")
+# Backups copy this many pages at a time, sleeping between steps so requests aren't starved of the database
+BACKUP_PAGES_PER_STEP: int = config("BACKUP_PAGES_PER_STEP", cast=int, default=100)
+BACKUP_STEP_SLEEP: float = config("BACKUP_STEP_SLEEP", cast=float, default=0.01)
+# Times a backup can be restarted by writes before the database is copied in a single step, rather than paced
+BACKUP_MAX_RESTARTS: int = config("BACKUP_MAX_RESTARTS", cast=int, default=10)
+
+# Directory CSV files uploaded to `/ingest` are saved to while they are loaded
+INGEST_PATH: Path = config("INGEST_PATH", cast=Path, default=DATABASE_PATH / "ingest")
+# Number of uploaded files loaded at once, and how many more can wait to be loaded
+INGEST_CONCURRENCY: int = config("INGEST_CONCURRENCY", cast=int, default=1)
+INGEST_MAX_QUEUED: int = config("INGEST_MAX_QUEUED", cast=int, default=10)
+INGEST_MAX_UPLOAD_SIZE: int = config("INGEST_MAX_UPLOAD_SIZE", cast=int, default=1024 * 1024 * 1024)
+# Finished jobs, and their rejects files, are kept for this many seconds, and at most this many are kept
+INGEST_JOB_TTL: float = config("INGEST_JOB_TTL", cast=float, default=24 * 60 * 60.0)
+INGEST_MAX_FINISHED_JOBS: int = config("INGEST_MAX_FINISHED_JOBS", cast=int, default=100)
+# Rows skipped while loading a file are logged at most once per this many seconds
+INGEST_LOG_INTERVAL: float = config("INGEST_LOG_INTERVAL", cast=float, default=5.0)
+
+# Reviews with at least this estimated similarity of content are returned by `/reviews/{id}/similar` by default
+SIMILARITY_THRESHOLD: float = config("SIMILARITY_THRESHOLD", cast=float, default=0.5)
+# New reviews at least this similar to an existing review are rejected, when a duplicate check is requested
+DUPLICATE_THRESHOLD: float = config("DUPLICATE_THRESHOLD", cast=float, default=0.8)
+
+# Number of rows fetched from the database per batch when streaming an export
+EXPORT_BATCH_SIZE: int = config("EXPORT_BATCH_SIZE", cast=int, default=1000)
+
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MINIMUM_SIZE: int = config("COMPRESSION_MINIMUM_SIZE", cast=int, default=1000)
+COMPRESSION_GZIP_LEVEL: int = config("COMPRESSION_GZIP_LEVEL", cast=int, default=6)
+COMPRESSION_ZSTD_LEVEL: int = config("COMPRESSION_ZSTD_LEVEL", cast=int, default=3)
+
+# Group commit write queue, when disabled each write request commits its own transaction
+WRITE_QUEUE_ENABLED: bool = config("WRITE_QUEUE_ENABLED", cast=bool, default=False)
+WRITE_QUEUE_MAX_BATCH_SIZE: int = config("WRITE_QUEUE_MAX_BATCH_SIZE", cast=int, default=100)
+# Seconds to wait for more writes to join a group, by default a group is the writes queued during the last commit
+WRITE_QUEUE_MAX_WAIT: float = config("WRITE_QUEUE_MAX_WAIT", cast=float, default=0.0)
@@ -0,0 +1,182 @@
+"""
+Row counts maintained by triggers
+
+Counting reviews or reviewers with `COUNT(*)` scans every matching row. The common counts, in total and grouped
+by a column, are instead kept in the counter table by triggers on every insert, update and delete. So a count for
+a single value, like the number of reviews with a rating of 5, is a single row lookup.
+
+The cost is moved to writes instead. Triggers run once per row, so a statement deleting many rows, such as deleting
+a reviewer's reviews with `cascade`, updates the counters once for every deleted review, inside the same write
+transaction.
+"""
+
+from typing import Annotated, Any, Callable, Dict, List, Sequence, Tuple
+
+from fastapi import Query
+from sqlalchemy import DDL, Column, Integer, Table, cast, delete, event, func, text
+from sqlmodel import Field, Session, SQLModel, select
+
+from .filters import OPERATORS, FilterSet
+from .reviewers.models import Reviewer
+from .reviews.models import Review
+
+TOTAL_KEY = ""
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+IncludeCount = Annotated[
+    bool,
+    Query(
+        title="Include Count",
+        description=f"Return the total number of matching results in the `{TOTAL_COUNT_HEADER}` response header.",
+    ),
+]
+
+
+class Counter(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    key: str = Field(default=TOTAL_KEY, primary_key=True)
+    value: int = Field(default=0)
+
+
+# Counted tables, along with the columns they are also counted by
+COUNTED_COLUMNS: Dict[Table, List[Column]] = {
+    Reviewer.__table__: [Reviewer.__table__.c.country],
+    Review.__table__: [Review.__table__.c.rating, Review.__table__.c.reviewer_id],
+}
+
+
+def counter_name(table: Table, column: Column | None = None) -> str:
+    """Name of the counter for a table, or for a table grouped by one of its columns"""
+    return f"{table.name}.{column.name}" if column is not None else table.name
+
+
+def _increment(name: str, key: str, amount: int) -> str:
+    return (
+        f"INSERT INTO {Counter.__tablename__} (name, key, value) VALUES ('{name}', {key}, {amount}) "
+        f"ON CONFLICT (name, key) DO UPDATE SET value = value + {amount};"
+    )
+
+
+def counter_triggers(table: Table, columns: List[Column]) -> List[DDL]:
+    """Triggers that keep a table's counters up to date"""
+    insert_counts = [_increment(counter_name(table), f"'{TOTAL_KEY}'", 1)]
+    delete_counts = [_increment(counter_name(table), f"'{TOTAL_KEY}'", -1)]
+    for column in columns:
+        insert_counts.append(_increment(counter_name(table, column), f"NEW.{column.name}", 1))
+        delete_counts.append(_increment(counter_name(table, column), f"OLD.{column.name}", -1))
+
+    column_names = ", ".join(column.name for column in columns)
+    update_counts = delete_counts[1:] + insert_counts[1:]
+    return [
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_insert_counter AFTER INSERT ON {table.name} "
+            f"BEGIN {' '.join(insert_counts)} END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_delete_counter AFTER DELETE ON {table.name} "
+            f"BEGIN {' '.join(delete_counts)} END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_update_counter AFTER UPDATE OF {column_names} ON {table.name} "
+            f"BEGIN {' '.join(update_counts)} END"
+        ),
+    ]
+
+
+def rebuild_counters(connection):
+    """Recalculate all counters from the rows in the counted tables"""
+    connection.execute(Counter.__table__.delete())
+    for table, columns in COUNTED_COLUMNS.items():
+        connection.execute(
+            Counter.__table__.insert().from_select(
+                ["name", "key", "value"],
+                select(text(f"'{counter_name(table)}'"), text(f"'{TOTAL_KEY}'"), func.count()).select_from(
+                    table
+                ),
+            )
+        )
+        for column in columns:
+            connection.execute(
+                Counter.__table__.insert().from_select(
+                    ["name", "key", "value"],
+                    select(text(f"'{counter_name(table, column)}'"), column, func.count())
+                    .select_from(table)
+                    .group_by(column),
+                )
+            )
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_counters(metadata, connection, tables, **kwargs):
+    """Create the counter triggers, and fill in the counters when the table is added to an existing database"""
+    for table, columns in COUNTED_COLUMNS.items():
+        for trigger in counter_triggers(table, columns):
+            connection.execute(trigger)
+    if Counter.__table__ in tables:
+        rebuild_counters(connection)
+
+
+def get_count(session: Session, table: Table, column: Column | None = None, key: str = TOTAL_KEY) -> int:
+    """Count the rows of a table, or the rows with a single value of a column"""
+    name = counter_name(table, column)
+    value = session.exec(select(Counter.value).where(Counter.name == name, Counter.key == str(key))).first()
+    return value or 0
+
+
+def get_filtered_count(
+    session: Session, table: Table, column: Column, conditions: List[Tuple[Callable, Any]]
+) -> int:
+    """Count the rows of a table where a column matches all the conditions, by summing the column's counters
+
+    Each condition is an operator function, like `operator.gt`, and the value to compare the column with.
+    """
+    name = counter_name(table, column)
+    key = cast(Counter.key, Integer) if isinstance(column.type, Integer) else Counter.key
+    query = select(func.coalesce(func.sum(Counter.value), 0)).where(
+        Counter.name == name, *(operator(key, value) for operator, value in conditions)
+    )
+    return session.exec(query).one()
+
+
+def count_filtered(session: Session, filters: FilterSet) -> int:
+    """Count the rows matching a filter set
+
+    Counts of all rows, or of rows filtered on a single counted column, are read from the counters. Any other
+    combination of filters falls back to a `COUNT(*)`.
+    """
+    table = filters.model.__table__
+    if not filters:
+        return get_count(session, table)
+
+    names = {condition.field for condition in filters.conditions}
+    if len(names) == 1:
+        name = names.pop()
+        column = table.c[filters.fields[name].column.key]
+        if column.name in {counted.name for counted in COUNTED_COLUMNS.get(table, [])}:
+            conditions = filters.on(name)
+            if len(conditions) == 1 and conditions[0].operator == "eq":
+                return get_count(session, table, column, conditions[0].value)
+            return get_filtered_count(
+                session,
+                table,
+                column,
+                [(OPERATORS[condition.operator], condition.value) for condition in conditions],
+            )
+
+    return session.exec(filters.count_statement(), params=filters.params).one()
+
+
+def prune_counters(session: Session, table: Table, column: Column, keys: Sequence[Any]):
+    """Remove a column's counters for values that no longer have any rows, such as deleted reviewers"""
+    session.exec(
+        delete(Counter).where(
+            Counter.name == counter_name(table, column),
+            Counter.key.in_([str(key) for key in keys]),
+            Counter.value == 0,
+        )
+    )
+
+
+class CountResponce(SQLModel):
+    count: int
@@ -1,22 +1,102 @@
-from typing import Annotated
+import fcntl
+import hashlib
+import logging
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+from typing import Annotated, Callable, Dict, Iterator, List
 
 from fastapi import Depends
 from sqlalchemy import event
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlcipher3 import dbapi2 as sqlcipher_driver
 from sqlmodel import Session as SQLModelSession
-from sqlmodel import create_engine, inspect
+from sqlmodel import SQLModel, create_engine, inspect
 
-from .config import DATABASE, DATABASE_PASSPHRASE
+from .config import (
+    DATABASE,
+    DATABASE_CACHE_SIZE,
+    DATABASE_CIPHER_PAGE_SIZE,
+    DATABASE_KDF_ITER,
+    DATABASE_KEY_SALT,
+    DATABASE_PASSPHRASE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_RAW_KEY,
+    WORKERS,
+)
+from .minhash import SQL_FUNCTIONS
+
+log = logging.getLogger(__name__)
+
+# Held by the worker setting up the database, so workers don't create tables or seed data at the same time
+DATABASE_LOCK: Path = DATABASE.with_suffix(".lock")
+# Held while the seed data is loaded, so every worker can tell the database is still being seeded
+SEED_LOCK: Path = DATABASE.with_suffix(".seed.lock")
+
+# Version of the database schema, kept in the database's `user_version`. When the schema changes increase it, and
+# register a migration for the new version with `@migration`
+SCHEMA_VERSION = 1
 
+# Key that older versions encrypted the database with, as the passphrase was never interpolated into the pragma
+LEGACY_KEY = "{DATABASE_PASSPHRASE}"
+
+# Keying the connection is left to `set_sqlite_pragma`, so the SQLite dialect is used with the SQLCipher driver.
+# Opening a connection runs the key derivation, so a fixed number of connections are kept open in the pool.
+# Each worker gets its own pool with its share of `DATABASE_POOL_SIZE` (at least one connection), so the total
+# stays roughly the same however many workers are running
 engine = create_engine(
-    f"sqlite+pysqlcipher://:{DATABASE_PASSPHRASE}@/{DATABASE}",
+    f"sqlite:///{DATABASE}",
     module=sqlcipher_driver,
     connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=max(1, DATABASE_POOL_SIZE // WORKERS),
+    max_overflow=0,
+    pool_timeout=DATABASE_POOL_TIMEOUT,
 )
 
 
+def wal_path(database: Path = DATABASE) -> Path:
+    return database.with_name(f"{database.name}-wal")
+
+
+def derive_raw_key(passphrase: str, salt: str, iterations: int = DATABASE_KDF_ITER) -> str:
+    """Derive a 256 bit key from a passphrase with PBKDF2-HMAC-SHA512, the same KDF SQLCipher uses"""
+    key = hashlib.pbkdf2_hmac("sha512", passphrase.encode(), salt.encode(), iterations, dklen=32)
+    return key.hex()
+
+
+@cache
+def database_key() -> str:
+    """Value for `PRAGMA key`, either the passphrase or a raw key derived from it once per process"""
+    if DATABASE_RAW_KEY:
+        if not str(DATABASE_KEY_SALT):
+            raise RuntimeError("DATABASE_KEY_SALT must be set to use a raw database key")
+        return f"x'{derive_raw_key(str(DATABASE_PASSPHRASE), str(DATABASE_KEY_SALT))}'"
+    return str(DATABASE_PASSPHRASE)
+
+
+def connection_pragmas(
+    key: str,
+    kdf_iter: int = DATABASE_KDF_ITER,
+    cipher_page_size: int = DATABASE_CIPHER_PAGE_SIZE,
+    cache_size: int = DATABASE_CACHE_SIZE,
+) -> List[str]:
+    """Pragmas that set up a new connection, the key has to be set before anything else"""
+    quoted_key = key.replace("'", "''")
+    return [
+        f"PRAGMA key = '{quoted_key}'",
+        f"PRAGMA kdf_iter = {kdf_iter}",
+        f"PRAGMA cipher_page_size = {cipher_page_size}",
+        f"PRAGMA cache_size = {cache_size}",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+
 @event.listens_for(Engine, "connect")
 def do_connect(dbapi_connection, connection_record):
     """Disable pysqlite's emitting of the BEGIN statement entirely
@@ -37,13 +117,151 @@ def do_begin(conn):
 def set_sqlite_pragma(dbapi_connection, connection_record):
     """Event that sets SQLite paramas for each database connection"""
     cursor = dbapi_connection.cursor()
-    cursor.execute('PRAGMA key = "{DATABASE_PASSPHRASE}";')
-    cursor.execute("PRAGMA synchronous=NORMAL")
-    cursor.execute("PRAGMA journal_mode=WAL")
-    cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma in connection_pragmas(database_key()):
+        cursor.execute(pragma)
     cursor.close()
 
 
+@event.listens_for(Engine, "connect")
+def register_functions(dbapi_connection, connection_record):
+    """Register the Python functions that triggers call, so they work on every connection"""
+    for name, num_params, function in SQL_FUNCTIONS:
+        dbapi_connection.create_function(name, num_params, function, deterministic=True)
+
+
+@contextmanager
+def file_lock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive lock shared between processes, yielding whether it was acquired
+
+    Blocks until any other holder has released the lock, unless not blocking in which case it isn't acquired.
+    """
+    with open(path, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def startup_lock(path: Path = DATABASE_LOCK):
+    """Hold the lock for setting up the database, blocking until any other worker has finished with it"""
+    with file_lock(path):
+        yield
+
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def set_schema_version(engine: Engine = engine, version: int = SCHEMA_VERSION):
+    """Record the schema version in a database that has just been created with the current schema"""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+# Functions that upgrade the schema to each version from the version before it
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {}
+
+
+def migration(version: int):
+    """Register a function as the migration to a schema version"""
+
+    def register(function: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS[version] = function
+        return function
+
+    return register
+
+
+@migration(1)
+def create_missing_tables(connection: Connection):
+    """Add the tables, indexes and triggers added before the schema was versioned"""
+    SQLModel.metadata.create_all(connection)
+
+
+def migrate_database(engine: Engine = engine, version: int = SCHEMA_VERSION) -> int:
+    """Run the migrations a database hasn't had, returning the schema version it is left at
+
+    Each migration runs in a transaction along with recording its version, so the version only changes once the
+    migration has been applied. The database is left behind if a version has no migration, and a database from a
+    newer version is left as it is, so either is reported as not ready.
+    """
+    with engine.connect() as connection:
+        current = get_schema_version(connection)
+    if current > version:
+        log.error(f"Database schema version {current} is newer than this version's {version}")
+    for target in range(current + 1, version + 1):
+        if target not in MIGRATIONS:
+            log.error(f"No migration to database schema version {target}")
+            break
+        with engine.begin() as connection:
+            MIGRATIONS[target](connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {int(target)}")
+        log.info(f"Migrated database to schema version {target}")
+        current = target
+    return current
+
+
+def warm_pool(engine: Engine = engine):
+    """Open all of the pool's connections up front, so requests don't pay for key derivation"""
+    connections = [engine.connect() for _ in range(engine.pool.size())]
+    for connection in connections:
+        connection.close()
+    log.info(f"Opened {len(connections)} database connections")
+
+
+def _can_open(key: str) -> bool:
+    connection = sqlcipher_driver.connect(str(DATABASE))
+    try:
+        for pragma in connection_pragmas(key)[:3]:
+            connection.execute(pragma)
+        connection.execute("SELECT count(*) FROM sqlite_master")
+        return True
+    except sqlcipher_driver.DatabaseError:
+        return False
+    finally:
+        connection.close()
+
+
+def previous_keys() -> List[str]:
+    """Keys the database may have been encrypted with before the current configuration"""
+    keys = [LEGACY_KEY]
+    if DATABASE_RAW_KEY:
+        keys.insert(0, str(DATABASE_PASSPHRASE))
+    return keys
+
+
+def rekey_database():
+    """Re-encrypt the database with the configured key, if it was encrypted with a previous key
+
+    Older versions encrypted the database with the literal text of the key pragma rather than the passphrase, and
+    switching to a raw key changes the key for databases encrypted with the passphrase.
+    """
+    if not DATABASE.exists() or _can_open(database_key()):
+        return
+
+    old_key = next((key for key in previous_keys() if _can_open(key)), None)
+    if old_key is None:
+        return
+
+    connection = sqlcipher_driver.connect(str(DATABASE))
+    try:
+        for pragma in connection_pragmas(old_key)[:3]:
+            connection.execute(pragma)
+        # SQLCipher can't rekey a database in WAL mode, the connection pragmas switch it back
+        connection.execute("PRAGMA journal_mode=DELETE")
+        new_key = database_key().replace("'", "''")
+        connection.execute(f"PRAGMA rekey = '{new_key}'")
+    finally:
+        connection.close()
+    log.warning("Re-encrypted database with the configured key")
+
+
 SessionLocal = sessionmaker(class_=SQLModelSession, autocommit=False, autoflush=False, bind=engine)
 
 
@@ -55,6 +273,18 @@ def get_session():
 Session = Annotated[SQLModelSession, Depends(get_session)]
 
 
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_missing_indexes(metadata, connection, tables, **kwargs):
+    """Create indexes that have been added to tables which already existed
+
+    `create_all` only creates indexes along with new tables, so this adds them to databases created by older versions.
+    """
+    for table in metadata.sorted_tables:
+        if table not in tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
 def get_table_names():
     """Fetch a list of all table names in the database."""
     table_names = inspect(engine, raiseerr=False).get_table_names()
@@ -0,0 +1,192 @@
+"""
+Bulk export of reviews joined with their reviewer
+
+Rows are streamed from the database in batches, so memory use stays constant regardless of how many reviews
+are exported. CSV exports use the same column layout as the ingest file, so an export can be loaded back in
+with `load_database_from_csv`.
+
+Run from the command line with `python -m src.export --output reviews.csv`
+"""
+
+import argparse
+import csv
+import io
+import logging
+import sys
+from enum import Enum
+from typing import Iterator, List
+
+from sqlmodel import Session, select
+
+from .config import EXPORT_BATCH_SIZE, LOG_FORMAT, LOG_LEVEL
+from .database import SessionLocal
+from .filters import FilterError, FilterSet
+from .ingest import CSV_COLUMNS
+from .reviewers.models import Reviewer
+from .reviews.dependencies import ReviewFilterSet
+from .reviews.models import Review
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa, pq = None, None
+
+log = logging.getLogger(__name__)
+
+CSV_DATE_FORMAT = "%Y-%m-%d"
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+
+def export_query(filters: FilterSet):
+    """Select reviews joined with their reviewer, in the ingest file's column order"""
+    return (
+        select(
+            Reviewer.name,
+            Review.title,
+            Review.rating,
+            Review.content,
+            Reviewer.email,
+            Reviewer.country,
+            Review.created_at,
+        )
+        .join(Reviewer, Review.reviewer_id == Reviewer.id)
+        .where(*filters.clauses)
+        .order_by(Review.id)
+    )
+
+
+def iter_batches(session: Session, filters: FilterSet, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield batches of export rows, fetched from the database with a streaming cursor"""
+    query = export_query(filters).execution_options(yield_per=batch_size)
+    result = session.execute(query)
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def stream_csv(session: Session, filters: FilterSet, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Stream the export as CSV text, one chunk per batch of rows
+
+    The session is closed once the export has finished.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        writer.writerow(CSV_COLUMNS)
+        for batch in iter_batches(session, filters, batch_size):
+            writer.writerows(
+                (name, title, rating, content, email, country, created_at.strftime(CSV_DATE_FORMAT))
+                for name, title, rating, content, email, country, created_at in batch
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        session.close()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects bytes until they are drained"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_parquet(
+    session: Session, filters: FilterSet, batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Stream the export as a Parquet file, with one row group per batch of rows
+
+    The session is closed once the export has finished.
+    """
+    if pq is None:
+        raise RuntimeError("Parquet exports require pyarrow to be installed")
+
+    schema = pa.schema(
+        [
+            ("Reviewer Name", pa.string()),
+            ("Review Title", pa.string()),
+            ("Review Rating", pa.int8()),
+            ("Review Content", pa.string()),
+            ("Email Address", pa.string()),
+            ("Country", pa.string()),
+            ("Review Date", pa.timestamp("us")),
+        ]
+    )
+    sink = _ChunkSink()
+    try:
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in iter_batches(session, filters, batch_size):
+                columns = list(zip(*batch))
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        session.close()
+
+
+STREAMERS = {
+    ExportFormat.csv: stream_csv,
+    ExportFormat.parquet: stream_parquet,
+}
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Export reviews joined with their reviewer")
+    parser.add_argument("--format", type=ExportFormat, choices=list(ExportFormat), default=ExportFormat.csv)
+    parser.add_argument("--output", default="-", help="File to write the export to, defaults to stdout")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    filter_options = parser.add_argument_group(
+        "filters", "Filters take the same values as the API, e.g. `--rating gte:4`, and can be repeated"
+    )
+    for name in ReviewFilterSet.fields:
+        filter_options.add_argument(f"--{name.replace('_', '-')}", dest=name, action="append")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, stream=sys.stderr)
+
+    try:
+        filters = ReviewFilterSet.parse({name: getattr(args, name) for name in ReviewFilterSet.fields})
+    except FilterError as err:
+        parser.error(str(err))
+    chunks = STREAMERS[args.format](SessionLocal(), filters, args.batch_size)
+
+    if args.output == "-":
+        output = sys.stdout if args.format == ExportFormat.csv else sys.stdout.buffer
+        for chunk in chunks:
+            output.write(chunk)
+    else:
+        mode, encoding = ("w", "utf-8") if args.format == ExportFormat.csv else ("wb", None)
+        with open(args.output, mode=mode, encoding=encoding, newline="" if encoding else None) as output:
+            for chunk in chunks:
+                output.write(chunk)
+        log.info(f"Exported reviews to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
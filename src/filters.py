@@ -0,0 +1,269 @@
+"""
+Declarative query filters for list endpoints
+
+A filter set declares which columns of a model can be filtered on. Each filter is a query parameter which takes
+a value, for an exact match, or an operator followed by a value, like `rating=gte:4`. Parameters can be repeated
+to combine conditions, so `rating=gte:2&rating=lte:4` is a range, and `in:` takes a comma separated list of values.
+
+Requests with the same filter shape, the same operators on the same columns, share a statement that is built once
+and cached, with the values passed as bound parameters.
+"""
+
+import inspect
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import cached_property, lru_cache
+from typing import Annotated, Any, Callable, ClassVar, Dict, FrozenSet, List, Mapping, Sequence, Tuple
+
+from fastapi import Query
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import ColumnElement, and_, bindparam, or_
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlmodel import SQLModel, func, select
+from sqlmodel.sql.expression import Select, SelectOfScalar
+
+from .utils import OPERATOR_MAPPING
+
+OPERATORS: Dict[str, Callable[[Any, Any], ColumnElement[bool]]] = {
+    **OPERATOR_MAPPING,
+    "in": lambda column, values: column.in_(values),
+}
+ALL_OPERATORS = frozenset(OPERATORS)
+EQUALITY_OPERATORS = frozenset(("eq", "ne", "in"))
+COMPARISON_OPERATORS = ALL_OPERATORS - {"in"}
+
+LIST_SEPARATOR = ","
+
+# Number of filter shapes with a cached statement for each filter set
+STATEMENT_CACHE_SIZE = 256
+
+
+class FilterError(ValueError):
+    def __init__(self, name: str, value: str, message: str):
+        super().__init__(f"Invalid filter {name}={value}: {message}")
+        self.name = name
+        self.value = value
+        self.message = message
+
+
+@dataclass(frozen=True)
+class FilterField:
+    """A filterable column, with the type its values are parsed as"""
+
+    column: InstrumentedAttribute
+    type: Any
+    operators: FrozenSet[str] = ALL_OPERATORS
+    alias: str | None = None
+    description: str = ""
+
+    @cached_property
+    def adapter(self) -> TypeAdapter:
+        return TypeAdapter(self.type)
+
+    def bind_names(self, operator: str) -> Tuple[str, ...]:
+        """Names of the values a condition with this operator binds"""
+        return ("value",)
+
+    def bind_values(self, operator: str, value: Any) -> Dict[str, Any]:
+        """Values a condition binds, keyed by their names"""
+        return {"value": value}
+
+    def clause(self, operator: str, values: Dict[str, Any]) -> ColumnElement[bool]:
+        """Where clause for a condition, from its bound values or parameters"""
+        return OPERATORS[operator](self.column, values["value"])
+
+
+@dataclass(frozen=True)
+class DayFilterField(FilterField):
+    """Filter on a timestamp column by UTC day
+
+    Each day is matched as the half open range `[day, next day)`, so any time during the day matches and the
+    column's index can be used, rather than comparing the date part of every timestamp.
+    """
+
+    type: Any = date
+    operators: FrozenSet[str] = COMPARISON_OPERATORS
+
+    BOUNDS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "eq": ("start", "end"),
+        "ne": ("start", "end"),
+        "gt": ("end",),
+        "gte": ("start",),
+        "lt": ("start",),
+        "lte": ("end",),
+    }
+
+    def bind_names(self, operator: str) -> Tuple[str, ...]:
+        return self.BOUNDS[operator]
+
+    def bind_values(self, operator: str, value: date) -> Dict[str, Any]:
+        start = datetime.combine(value, time.min)
+        bounds = {"start": start, "end": start + timedelta(days=1)}
+        return {name: bounds[name] for name in self.BOUNDS[operator]}
+
+    def clause(self, operator: str, values: Dict[str, Any]) -> ColumnElement[bool]:
+        if operator == "eq":
+            return and_(self.column >= values["start"], self.column < values["end"])
+        if operator == "ne":
+            return or_(self.column < values["start"], self.column >= values["end"])
+        if operator in ("gt", "gte"):
+            return self.column >= values[self.BOUNDS[operator][0]]
+        return self.column < values[self.BOUNDS[operator][0]]
+
+
+@dataclass(frozen=True)
+class Condition:
+    field: str
+    operator: str
+    value: Any
+
+
+def operator_help(field: FilterField) -> str:
+    operators = ", ".join(f"`{operator}:`" for operator in OPERATORS if operator in field.operators)
+    return (
+        "Either an exact value or an operator followed by a value. "
+        f"Valid operators are {operators}, where `in:` takes a comma separated list of values. "
+        "Repeat the parameter to combine conditions, like a range."
+    )
+
+
+class FilterSet:
+    """Filters for a model, declared by subclassing and adding a `FilterField` attribute for each filter"""
+
+    model: ClassVar[type[SQLModel]]
+    fields: ClassVar[Dict[str, FilterField]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = {name: value for name, value in vars(cls).items() if isinstance(value, FilterField)}
+
+    def __init__(self, conditions: Sequence[Condition] = ()):
+        # Conditions are kept in a fixed order, so the same filters always have the same shape
+        self.conditions: Tuple[Condition, ...] = tuple(
+            sorted(conditions, key=lambda condition: (condition.field, condition.operator))
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.conditions)
+
+    @classmethod
+    def parse_value(cls, name: str, raw: str) -> Condition:
+        """Parse a filter value, with an optional operator prefix, into a condition"""
+        field = cls.fields[name]
+        prefix, separator, value = raw.partition(":")
+        operator = prefix if separator and prefix in OPERATORS else "eq"
+        if operator == "eq" and not (separator and prefix == "eq"):
+            value = raw
+
+        if operator not in field.operators:
+            raise FilterError(name, raw, f"Operator `{operator}` is not supported")
+
+        try:
+            if operator == "in":
+                parsed = tuple(field.adapter.validate_python(item) for item in value.split(LIST_SEPARATOR))
+            else:
+                parsed = field.adapter.validate_python(value)
+        except ValidationError as err:
+            raise FilterError(name, raw, err.errors()[0]["msg"]) from err
+        return Condition(name, operator, parsed)
+
+    @classmethod
+    def parse(cls, values: Mapping[str, Sequence[str] | None]):
+        """Filters from the raw values of each filter, keyed by filter name"""
+        conditions = []
+        for name, raws in values.items():
+            for raw in raws or []:
+                conditions.append(cls.parse_value(name, raw))
+        return cls(conditions)
+
+    @classmethod
+    def dependency(cls) -> Callable:
+        """FastAPI dependency which parses the filters from query parameters, that can each be repeated"""
+        parameters = [
+            inspect.Parameter(
+                name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=None,
+                annotation=Annotated[
+                    List[str] | None,
+                    Query(
+                        alias=field.alias or name, description=f"{field.description} {operator_help(field)}"
+                    ),
+                ],
+            )
+            for name, field in cls.fields.items()
+        ]
+
+        def filters(**values: List[str] | None):
+            try:
+                return cls.parse(values)
+            except FilterError as err:
+                alias = cls.fields[err.name].alias or err.name
+                raise RequestValidationError(
+                    [{"type": "value_error", "loc": ("query", alias), "msg": err.message, "input": err.value}]
+                )
+
+        filters.__signature__ = inspect.Signature(parameters, return_annotation=cls)
+        return filters
+
+    def on(self, name: str) -> List[Condition]:
+        """Conditions on a single filter"""
+        return [condition for condition in self.conditions if condition.field == name]
+
+    @property
+    def shape(self) -> Tuple[Tuple[str, str], ...]:
+        return tuple((condition.field, condition.operator) for condition in self.conditions)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Values for the bound parameters of the cached statements"""
+        params = {}
+        for n, condition in enumerate(self.conditions):
+            field = self.fields[condition.field]
+            for name, value in field.bind_values(condition.operator, condition.value).items():
+                params[f"{condition.field}_{n}_{name}"] = value
+        return params
+
+    @property
+    def clauses(self) -> List[ColumnElement[bool]]:
+        """Where clauses with the filter values, for adding to other queries"""
+        return [
+            self.fields[condition.field].clause(
+                condition.operator,
+                self.fields[condition.field].bind_values(condition.operator, condition.value),
+            )
+            for condition in self.conditions
+        ]
+
+    def statement(self) -> SelectOfScalar:
+        """Cached statement selecting the filtered rows, to be executed with `params`"""
+        return _compile_statement(type(self), self.shape)
+
+    def count_statement(self) -> Select:
+        """Cached statement counting the filtered rows, to be executed with `params`"""
+        return _compile_count_statement(type(self), self.shape)
+
+
+def _parameterised_clauses(filter_set: type[FilterSet], shape: Tuple[Tuple[str, str], ...]):
+    clauses = []
+    for n, (name, operator) in enumerate(shape):
+        field = filter_set.fields[name]
+        params = {
+            bind_name: bindparam(f"{name}_{n}_{bind_name}", expanding=operator == "in")
+            for bind_name in field.bind_names(operator)
+        }
+        clauses.append(field.clause(operator, params))
+    return clauses
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_statement(filter_set: type[FilterSet], shape: Tuple[Tuple[str, str], ...]) -> SelectOfScalar:
+    return select(filter_set.model).where(*_parameterised_clauses(filter_set, shape))
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_count_statement(filter_set: type[FilterSet], shape: Tuple[Tuple[str, str], ...]) -> Select:
+    return (
+        select(func.count()).select_from(filter_set.model).where(*_parameterised_clauses(filter_set, shape))
+    )
@@ -0,0 +1,33 @@
+from datetime import datetime
+from enum import Enum
+
+from sqlmodel import SQLModel
+
+
+class SeedStatus(str, Enum):
+    not_needed = "not_needed"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class HealthResponce(SQLModel):
+    status: str = "ok"
+
+
+class SeedResponce(SQLModel):
+    status: SeedStatus
+    progress: float = 0.0
+    rows: int = 0
+    rejected_rows: int = 0
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+
+
+class ReadinessResponce(SQLModel):
+    ready: bool
+    database: bool
+    schema_version: int | None = None
+    expected_schema_version: int
+    seed: SeedResponce | None = None
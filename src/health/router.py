@@ -0,0 +1,35 @@
+from fastapi import APIRouter, status
+
+from ..database import Session
+from ..responses import NegotiatedResponse
+from .models import HealthResponce, ReadinessResponce
+from .service import check_readiness, seeder
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/healthz", response_model=HealthResponce)
+def get_health():
+    """## Check the API is alive
+
+    Doesn't need an API key, and doesn't touch the database, so it only fails when the API can't handle requests at all.
+    """
+    return HealthResponce()
+
+
+@router.get(
+    "/readyz",
+    response_model=ReadinessResponce,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessResponce}},
+)
+def get_readiness(session: Session):
+    """## Check the API is ready to handle requests
+
+    Doesn't need an API key. Responds with a `503` until the database can be queried, its schema is up to date and any seed data has loaded, along with the progress of the seeding.
+    """
+    readiness = check_readiness(session, seeder)
+    if not readiness.ready:
+        return NegotiatedResponse(
+            readiness.model_dump(mode="json"), status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return readiness
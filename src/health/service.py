@@ -0,0 +1,133 @@
+"""
+Seeding a new database and checking whether the API is ready
+
+A new database is seeded from the bundled CSV file. This runs either before the API starts listening, or in the
+background so the API starts straight away and reports itself as not ready until the data has loaded. The seed
+lock is held while the data loads, so workers that aren't seeding can also tell the database isn't ready yet.
+"""
+
+import logging
+import threading
+from contextlib import AbstractContextManager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session
+
+from ..config import INGEST_PATH
+from ..database import SCHEMA_VERSION, SEED_LOCK, file_lock, get_schema_version
+from ..ingest import IngestStats, load_database_from_csv
+from .models import ReadinessResponce, SeedResponce, SeedStatus
+
+log = logging.getLogger(__name__)
+
+SEED_FILE = Path("./data/dataops_tp_reviews.csv")
+
+
+class Seeder:
+    """Loads the seed data into a new database, keeping track of its progress"""
+
+    def __init__(
+        self,
+        path: Path = SEED_FILE,
+        rejects_path: Path = INGEST_PATH / "dataops_tp_reviews.rejects.jsonl",
+        lock_path: Path = SEED_LOCK,
+        session_factory: sessionmaker | None = None,
+    ):
+        self.path = path
+        self.rejects_path = rejects_path
+        self.lock_path = lock_path
+        self.session_factory = session_factory
+        self.status = SeedStatus.not_needed
+        self.stats = IngestStats()
+        self.bytes_total = 0
+        self.error: str | None = None
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self._lock: AbstractContextManager | None = None
+
+    def start(self, background: bool = False):
+        """Load the seed data, in a background thread or blocking until it is loaded
+
+        The seed lock is taken before returning, so other workers see the database is being seeded as soon as the
+        tables have been created.
+        """
+        self._lock = file_lock(self.lock_path)
+        self._lock.__enter__()
+        self.status = SeedStatus.running
+        self.bytes_total = self.path.stat().st_size
+        self.started_at = datetime.now(timezone.utc)
+        if background:
+            threading.Thread(target=self._run, name="seed", daemon=True).start()
+        else:
+            self._run()
+
+    def _run(self):
+        try:
+            load_database_from_csv(
+                str(self.path),
+                stats=self.stats,
+                rejects_path=self.rejects_path,
+                session_factory=self.session_factory,
+            )
+        except Exception as err:
+            log.exception("Seeding the database failed")
+            self.status = SeedStatus.failed
+            self.error = str(err)
+        else:
+            self.status = SeedStatus.completed
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+            self._lock.__exit__(None, None, None)
+            self._lock = None
+
+    def seeding_elsewhere(self) -> bool:
+        """Whether another worker is seeding the database"""
+        if self.status == SeedStatus.running:
+            return False
+        with file_lock(self.lock_path, blocking=False) as acquired:
+            return not acquired
+
+    @property
+    def progress(self) -> float:
+        if self.status == SeedStatus.completed:
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        return self.stats.bytes_read / self.bytes_total
+
+    def response(self) -> SeedResponce:
+        if self.status == SeedStatus.not_needed and self.seeding_elsewhere():
+            return SeedResponce(status=SeedStatus.running)
+        return SeedResponce(
+            status=self.status,
+            progress=self.progress,
+            rows=self.stats.rows,
+            rejected_rows=self.stats.rejected_rows,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+
+seeder = Seeder()
+
+
+def check_readiness(session: Session, seeder: Seeder) -> ReadinessResponce:
+    """Check the database can be queried, its schema is up to date, and the seed data has loaded"""
+    try:
+        schema_version = get_schema_version(session.connection())
+    except SQLAlchemyError as err:
+        log.warning(f"Readiness check couldn't query the database: {err}")
+        return ReadinessResponce(ready=False, database=False, expected_schema_version=SCHEMA_VERSION)
+
+    seed = seeder.response()
+    return ReadinessResponce(
+        ready=schema_version == SCHEMA_VERSION and seed.status not in (SeedStatus.running, SeedStatus.failed),
+        database=True,
+        schema_version=schema_version,
+        expected_schema_version=SCHEMA_VERSION,
+        seed=seed,
+    )
@@ -0,0 +1,80 @@
+"""
+Related entities embedded in responses
+
+Reviewers can be returned with their reviews and reviews with their reviewer. The related rows for a whole page
+of results are loaded with batched `IN` queries, so the number of queries doesn't grow with the number of results.
+"""
+
+from collections import defaultdict
+from enum import Enum
+from typing import Annotated, List, Sequence
+
+from fastapi import Query
+from sqlmodel import Session, select
+
+from .reviewers.models import Reviewer, ReviewerResponce
+from .reviews.models import Review, ReviewResponce
+from .utils import chunked
+
+
+class ReviewerInclude(str, Enum):
+    reviews = "reviews"
+
+
+class ReviewInclude(str, Enum):
+    reviewer = "reviewer"
+
+
+ReviewerIncludes = Annotated[
+    ReviewerInclude | None,
+    Query(
+        title="Include",
+        description="Embed related entities in the response, `reviews` adds each user's reviews.",
+    ),
+]
+
+ReviewIncludes = Annotated[
+    ReviewInclude | None,
+    Query(
+        title="Include",
+        description="Embed related entities in the response, `reviewer` adds each review's author.",
+    ),
+]
+
+
+class ReviewerWithReviews(ReviewerResponce):
+    reviews: List[ReviewResponce]
+
+
+class ReviewWithReviewer(ReviewResponce):
+    reviewer: ReviewerResponce
+
+
+def with_reviews(session: Session, reviewers: Sequence[Reviewer]) -> List[ReviewerWithReviews]:
+    """Embed each reviewer's reviews"""
+    reviews_by_reviewer = defaultdict(list)
+    reviewer_ids = [reviewer.id for reviewer in reviewers]
+    for ids in chunked(reviewer_ids):
+        for review in session.exec(select(Review).where(Review.reviewer_id.in_(ids)).order_by(Review.id)):
+            reviews_by_reviewer[review.reviewer_id].append(review)
+
+    return [
+        ReviewerWithReviews.model_validate(
+            {**reviewer.model_dump(), "reviews": reviews_by_reviewer[reviewer.id]}
+        )
+        for reviewer in reviewers
+    ]
+
+
+def with_reviewer(session: Session, reviews: Sequence[Review]) -> List[ReviewWithReviewer]:
+    """Embed the reviewer of each review"""
+    reviewers = {}
+    reviewer_ids = list({review.reviewer_id for review in reviews})
+    for ids in chunked(reviewer_ids):
+        for reviewer in session.exec(select(Reviewer).where(Reviewer.id.in_(ids))):
+            reviewers[reviewer.id] = reviewer
+
+    return [
+        ReviewWithReviewer.model_validate({**review.model_dump(), "reviewer": reviewers[review.reviewer_id]})
+        for review in reviews
+    ]
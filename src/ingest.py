@@ -1,19 +1,83 @@
+"""
+Loading reviews and their reviewers from files
+
+Records are streamed from a source, a file or stdin, as CSV or JSON Lines that may be gzip or zstd compressed. Each
+record is mapped onto the CSV columns and loaded with `load_row`, so every source is validated the same way.
+Compressed sources are decompressed as they are read, so memory use doesn't grow with the size of the source.
+
+Run from the command line with `python -m src.ingest reviews.jsonl.gz`, or `-` to read from stdin
+"""
+
+import argparse
 import csv
+import gzip
+import io
+import json
 import logging
+import sys
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Tuple
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, TextIO, Tuple
 
 from pycountry import countries
 from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, select
 
-from .database import SessionLocal
+from .config import INGEST_LOG_INTERVAL, LOG_FORMAT, LOG_LEVEL
+from .database import SessionLocal, get_table_names
 from .reviewers.models import Reviewer, ReviewerCreate
 from .reviews.models import Review, ReviewCreate
 
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
 log = logging.getLogger(__name__)
 
+# Column layout of the review CSV files
+CSV_COLUMNS = [
+    "Reviewer Name",
+    "Review Title",
+    "Review Rating",
+    "Review Content",
+    "Email Address",
+    "Country",
+    "Review Date",
+]
+
+# Path of a source that reads from stdin
+STDIN = "-"
+
+
+class SourceFormat(str, Enum):
+    csv = "csv"
+    jsonl = "jsonl"
+
+
+class Compression(str, Enum):
+    none = "none"
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+# Leading bytes of compressed sources, so the compression can be detected whatever the file is called
+MAGIC_NUMBERS = {Compression.gzip: b"\x1f\x8b", Compression.zstd: b"\x28\xb5\x2f\xfd"}
+
+COMPRESSION_EXTENSIONS = {".gz", ".zst"}
+
+FORMAT_EXTENSIONS = {".csv": SourceFormat.csv, ".jsonl": SourceFormat.jsonl, ".ndjson": SourceFormat.jsonl}
+
+
+class SourceError(ValueError):
+    pass
+
+
 # Add "UK" as an alternative code for United Kingdom
 countries.add_entry(
     alt_code="UK",
@@ -35,15 +99,201 @@ def get_iso_country_code(country: str) -> str:
     return matched_country.alpha_3
 
 
-def load_row(row_number: int, row: dict, session: Session) -> Tuple[bool]:
+class RejectSink:
+    """Writes rejected rows to a JSON Lines file, one line per row with its row number, data and errors
+
+    The file is only created once a row is rejected.
+    """
+
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.count = 0
+        self._file: TextIO | None = None
+
+    def write(self, row_number: int, row: dict, entity: str, errors: List[dict]):
+        self.count += 1
+        if self.path is None:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, mode="w", encoding="utf-8")
+        record = {"row": row_number, "entity": entity, "data": row, "errors": errors}
+        self._file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RateLimitedLog:
+    """Logs a warning at most once per interval, counting the messages that were dropped in between"""
+
+    def __init__(self, logger: logging.Logger, interval: float = INGEST_LOG_INTERVAL):
+        self.logger = logger
+        self.interval = interval
+        self.suppressed = 0
+        self._last = -interval
+
+    def warning(self, message: str):
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            message = f"{message} ({self.suppressed} similar messages suppressed)"
+        self.logger.warning(message)
+        self._last = now
+        self.suppressed = 0
+
+
+class _CountingReader(io.RawIOBase):
+    """Counts the bytes read from a file, before they are decompressed"""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.file.readinto(buffer)
+        self.bytes_read += size
+        return size
+
+
+@dataclass(frozen=True)
+class InvalidRecord:
+    """A record that couldn't be parsed, such as a line of JSON Lines that isn't a JSON object"""
+
+    data: dict
+    error: str
+
+
+@dataclass
+class IngestSource:
+    """Records to load from a file, or stdin when the path is `-`
+
+    The format is taken from the file extension, defaulting to CSV, and the compression is detected from the
+    leading bytes, unless they are given. `columns` maps CSV column names to the source's names for them, where
+    they differ. Fields missing from a record are empty, so the record is rejected by `load_row`.
+    """
+
+    path: str | Path
+    format: SourceFormat | None = None
+    compression: Compression | None = None
+    columns: Dict[str, str] = field(default_factory=dict)
+    # Bytes read from the source so far, before they are decompressed
+    bytes_read: int = 0
+
+    def __post_init__(self):
+        unknown = set(self.columns) - set(CSV_COLUMNS)
+        if unknown:
+            raise SourceError(
+                f"Unknown columns {', '.join(sorted(unknown))}, columns are {', '.join(CSV_COLUMNS)}"
+            )
+        if self.format is None:
+            suffixes = [suffix for suffix in Path(self.path).suffixes if suffix not in COMPRESSION_EXTENSIONS]
+            self.format = FORMAT_EXTENSIONS.get(suffixes[-1] if suffixes else "", SourceFormat.csv)
+
+    def __str__(self) -> str:
+        return "stdin" if self.path == STDIN else str(self.path)
+
+    def _decompressed(self, file: io.BufferedReader, counter: _CountingReader) -> BinaryIO:
+        compression = self.compression
+        if compression is None:
+            leading_bytes = file.peek(4)
+            compression = next(
+                (name for name, magic in MAGIC_NUMBERS.items() if leading_bytes.startswith(magic)),
+                Compression.none,
+            )
+        if compression == Compression.gzip:
+            return gzip.GzipFile(fileobj=counter, mode="rb")
+        if compression == Compression.zstd:
+            if zstandard is None:
+                raise SourceError("Loading zstd compressed sources needs the zstandard package")
+            return zstandard.ZstdDecompressor().stream_reader(counter)
+        return io.BufferedReader(counter)
+
+    def _mapped(self, record: dict) -> dict:
+        row = {}
+        for column in CSV_COLUMNS:
+            value = record.get(self.columns.get(column, column))
+            row[column] = "" if value is None else str(value)
+        return row
+
+    def _jsonl_records(self, text: TextIO) -> Iterator[dict | InvalidRecord]:
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as err:
+                yield InvalidRecord({"line": line.rstrip("\n")}, f"Invalid JSON: {err}")
+                continue
+            if not isinstance(record, dict):
+                yield InvalidRecord({"line": line.rstrip("\n")}, "Record isn't a JSON object")
+                continue
+            yield self._mapped(record)
+
+    def records(self) -> Iterator[dict | InvalidRecord]:
+        """Stream the source's records, each mapped onto the CSV columns, updating `bytes_read` as they are read"""
+        file = sys.stdin.buffer if self.path == STDIN else open(self.path, mode="rb")
+        try:
+            counter = _CountingReader(file)
+            with (
+                self._decompressed(file, counter) as binary,
+                io.TextIOWrapper(binary, encoding="utf-8") as text,
+            ):
+                if self.format == SourceFormat.jsonl:
+                    records = self._jsonl_records(text)
+                else:
+                    records = (self._mapped(row) for row in csv.DictReader(text))
+                for record in records:
+                    self.bytes_read = counter.bytes_read
+                    yield record
+                self.bytes_read = counter.bytes_read
+        finally:
+            if file is not sys.stdin.buffer:
+                file.close()
+
+
+@dataclass
+class IngestStats:
+    """Counts of the rows loaded from a file, updated as each row is loaded"""
+
+    rows: int = 0
+    bytes_read: int = 0
+    reviewers_loaded: int = 0
+    reviewers_skipped: int = 0
+    reviews_loaded: int = 0
+    reviews_skipped: int = 0
+    rejected_rows: int = 0
+
+
+def _validation_errors(err: Exception) -> List[dict]:
+    if isinstance(err, ValidationError):
+        return err.errors(include_url=False)
+    return [{"msg": str(err)}]
+
+
+def load_row(row_number: int, row: dict, session: Session, rejects: RejectSink | None = None) -> Tuple[bool]:
     """Take a single row of data and load into database
 
+    Invalid rows are written to the reject sink, when one is given.
     Returns two boolean values, that show if the row's Reviewer and Review were successfully loaded
     """
     reviewer_loaded, review_loaded = False, False
 
-    iso_country_code = get_iso_country_code(row["Country"])
     try:
+        iso_country_code = get_iso_country_code(row["Country"])
         reviewer = ReviewerCreate(
             email=row["Email Address"],
             name=row["Reviewer Name"],
@@ -57,15 +307,13 @@ def load_row(row_number: int, row: dict, session: Session) -> Tuple[bool]:
         )
         session.add(db_reviewer)
         session.commit()
-    except ValidationError as err:
+    except (ValidationError, LookupError) as err:
         # If invalid reviewer then skip record
-        log.warning(f"Reviewer Validation error on row {row_number}: {err}")
-        log.warning(f"Invalid Reviewer data, skipping row {row_number}")
+        if rejects:
+            rejects.write(row_number, row, "reviewer", _validation_errors(err))
         return reviewer_loaded, review_loaded
     except IntegrityError:
         # If reviewer already exists in database then continue using existing reviewer record
-        log.warning(f"Reviewer from row {row_number} already exists")
-        log.info("Continuing to load review with existing reviewer")
         session.rollback()
         reviewer_id = session.exec(select(Reviewer.id).where(Reviewer.email == row["Email Address"])).first()
         db_reviewer = session.get(Reviewer, reviewer_id)
@@ -88,8 +336,8 @@ def load_row(row_number: int, row: dict, session: Session) -> Tuple[bool]:
         )
     except (ValidationError, ValueError) as err:
         # If invalid review then skip review
-        log.warning(f"Review Validation error on row {row_number}: {err}")
-        log.warning(f"Invalid Review data, skipping review from row {row_number}")
+        if rejects:
+            rejects.write(row_number, row, "review", _validation_errors(err))
         return reviewer_loaded, review_loaded
     session.add(db_review)
     session.commit()
@@ -98,24 +346,110 @@ def load_row(row_number: int, row: dict, session: Session) -> Tuple[bool]:
     return reviewer_loaded, review_loaded
 
 
-def load_database_from_csv(file_path: str):
-    reviewers_loaded = []
-    reviews_loaded = []
+def load_database(
+    source: IngestSource,
+    stats: IngestStats | None = None,
+    rejects_path: Path | None = None,
+    session_factory: sessionmaker | None = None,
+) -> IngestStats:
+    """Load the reviewers and reviews from a source
 
-    with SessionLocal() as session:
-        log.info(f"Loading data from csv {file_path}")
-        with open(file_path, mode="r", encoding="utf-8") as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row_number, row in enumerate(reader):
-                reviewer_loaded, review_loaded = load_row(row_number, row, session)
-                reviewers_loaded.append(reviewer_loaded)
-                reviews_loaded.append(review_loaded)
+    The counts in `stats` are updated as each row is loaded, so they can be read for progress while the source is
+    loading. Rows with invalid data are written to `rejects_path` as JSON Lines.
+    """
+    stats = stats if stats is not None else IngestStats()
+    skipped_log = RateLimitedLog(log)
 
-    loaded_reviewers = sum(reviewers_loaded)
-    skipped_reviewers = len(reviewers_loaded) - loaded_reviewers
-    loaded_reviews = sum(reviews_loaded)
-    skipped_reviews = len(reviews_loaded) - loaded_reviews
+    with (session_factory or SessionLocal)() as session, RejectSink(rejects_path) as rejects:
+        log.info(f"Loading {source.format.value} data from {source}")
+        for row_number, row in enumerate(source.records()):
+            rejected = rejects.count
+            if isinstance(row, InvalidRecord):
+                rejects.write(row_number, row.data, "record", [{"msg": row.error}])
+                reviewer_loaded, review_loaded = False, False
+            else:
+                reviewer_loaded, review_loaded = load_row(row_number, row, session, rejects)
+            stats.rows += 1
+            stats.bytes_read = source.bytes_read
+            stats.reviewers_loaded += reviewer_loaded
+            stats.reviewers_skipped += not reviewer_loaded
+            stats.reviews_loaded += review_loaded
+            stats.reviews_skipped += not review_loaded
+            if rejects.count > rejected:
+                stats.rejected_rows += 1
+                skipped_log.warning(f"Invalid data, skipping row {row_number}")
+        stats.bytes_read = source.bytes_read
 
     log.info("Database loading complete")
-    log.info(f"{loaded_reviewers} Reviewers succesfully loaded, {skipped_reviewers} Reviewers skipped")
-    log.info(f"{loaded_reviews} Reviews succesfully loaded, {skipped_reviews} Reviews skipped")
+    log.info(
+        f"{stats.reviewers_loaded} Reviewers succesfully loaded, {stats.reviewers_skipped} Reviewers skipped"
+    )
+    log.info(f"{stats.reviews_loaded} Reviews succesfully loaded, {stats.reviews_skipped} Reviews skipped")
+    if stats.rejected_rows:
+        destination = f", written to {rejects_path}" if rejects_path else ""
+        log.warning(f"{stats.rejected_rows} rows had invalid data{destination}")
+    return stats
+
+
+def load_database_from_csv(
+    file_path: str,
+    stats: IngestStats | None = None,
+    rejects_path: Path | None = None,
+    session_factory: sessionmaker | None = None,
+) -> IngestStats:
+    """Load the reviewers and reviews from a CSV file, which may be gzip or zstd compressed"""
+    source = IngestSource(file_path, format=SourceFormat.csv)
+    return load_database(source, stats=stats, rejects_path=rejects_path, session_factory=session_factory)
+
+
+def parse_column(value: str) -> Tuple[str, str]:
+    """Parse a `--column` option, the CSV column name and the source's name for it, like `Country=country_code`"""
+    column, separator, name = value.partition("=")
+    if not separator or column not in CSV_COLUMNS:
+        raise argparse.ArgumentTypeError(
+            f"Expected COLUMN=NAME, where COLUMN is one of {', '.join(CSV_COLUMNS)}"
+        )
+    return column, name
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Load reviews and their reviewers into the database")
+    parser.add_argument("source", help="File to load, or `-` to read from stdin")
+    parser.add_argument(
+        "--format",
+        type=SourceFormat,
+        choices=list(SourceFormat),
+        help="Format of the source, defaults to the file extension or csv",
+    )
+    parser.add_argument(
+        "--compression",
+        type=Compression,
+        choices=list(Compression),
+        help="Compression of the source, detected from its leading bytes by default",
+    )
+    parser.add_argument(
+        "--column",
+        type=parse_column,
+        action="append",
+        default=[],
+        metavar="COLUMN=NAME",
+        help="Name of a CSV column in the source, can be repeated, e.g. `--column 'Review Rating=stars'`",
+    )
+    parser.add_argument("--rejects", type=Path, help="File to write rows with invalid data to, as JSON Lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, stream=sys.stderr)
+
+    if not get_table_names():
+        parser.error("The database hasn't been created, start the API to create it")
+    source = IngestSource(
+        args.source, format=args.format, compression=args.compression, columns=dict(args.column)
+    )
+    try:
+        load_database(source, rejects_path=args.rejects)
+    except SourceError as err:
+        parser.error(str(err))
+
+
+if __name__ == "__main__":
+    main()
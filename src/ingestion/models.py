@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from pathlib import Path
+
+from sqlmodel import SQLModel
+
+from ..ingest import IngestStats
+
+
+class IngestStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+@dataclass(kw_only=True)
+class IngestJob(IngestStats):
+    """An uploaded file being loaded, its counts are updated by `load_database_from_csv` as it loads"""
+
+    id: str
+    path: Path
+    rejects_path: Path
+    bytes_total: int
+    created_at: datetime
+    status: IngestStatus = IngestStatus.pending
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == IngestStatus.completed:
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        return self.bytes_read / self.bytes_total
+
+    @property
+    def rows_per_second(self) -> float:
+        if not self.started_at:
+            return 0.0
+        elapsed = ((self.finished_at or datetime.now(timezone.utc)) - self.started_at).total_seconds()
+        return self.rows / elapsed if elapsed else 0.0
+
+
+class IngestJobResponce(SQLModel):
+    id: str
+    status: IngestStatus
+    progress: float
+    bytes_total: int
+    bytes_read: int
+    rows: int
+    rows_per_second: float
+    reviewers_loaded: int
+    reviewers_skipped: int
+    reviews_loaded: int
+    reviews_skipped: int
+    rejected_rows: int
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+    error: str | None
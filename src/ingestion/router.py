@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse
+
+from .models import IngestJobResponce
+from .service import IngestQueueFull, UploadTooLarge, ingest_manager
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+
+@router.post(
+    "/",
+    response_model=IngestJobResponce,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"text/csv": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def create_ingest_job(request: Request):
+    """## Load Reviewers and Reviews from a CSV file
+
+    The request body is the CSV file, with the columns `Reviewer Name`, `Review Title`, `Review Rating`, `Review Content`, `Email Address`, `Country` and `Review Date`. It is saved to disk as it is uploaded, then loaded in the background with invalid rows skipped. Poll the returned job for its progress.
+    """
+    try:
+        job = await ingest_manager.start(request.stream())
+    except IngestQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many files waiting to be loaded, try again later",
+            headers={"Retry-After": "60"},
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Files can be at most {ingest_manager.max_upload_size} bytes",
+        )
+    return IngestJobResponce.model_validate(job)
+
+
+@router.get("/{job_id}", response_model=IngestJobResponce)
+def get_ingest_job(job_id: str):
+    """## Retrieve the progress of loading a CSV file"""
+    job = ingest_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingest job not found")
+    return IngestJobResponce.model_validate(job)
+
+
+@router.get(
+    "/{job_id}/rejects",
+    response_class=FileResponse,
+    responses={status.HTTP_200_OK: {"content": {"application/x-ndjson": {}}}},
+)
+def get_ingest_job_rejects(job_id: str):
+    """## Retrieve the rows of a CSV file that had invalid data
+
+    Returned as JSON Lines, with the row number, the row's data and its validation errors on each line.
+    """
+    job = ingest_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingest job not found")
+    if not job.rejects_path.exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ingest job has no rejected rows")
+    return FileResponse(job.rejects_path, media_type="application/x-ndjson")
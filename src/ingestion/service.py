@@ -0,0 +1,168 @@
+"""
+Background loading of uploaded CSV files, which may be gzip or zstd compressed
+
+Uploads are written to a file in the ingest directory as they are received, so a large file is never held in
+memory, then loaded with `load_database_from_csv` in a small thread pool. Requests are handled as normal while
+files are loaded, and the job's progress is tracked so it can be polled. Rows with invalid data are written to a
+rejects file next to the upload, which is kept after the upload has been loaded and removed.
+
+Finished jobs are forgotten, and their rejects file deleted, once they are older than `INGEST_JOB_TTL` seconds or
+there are more than `INGEST_MAX_FINISHED_JOBS` of them.
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from ..config import (
+    INGEST_CONCURRENCY,
+    INGEST_JOB_TTL,
+    INGEST_MAX_FINISHED_JOBS,
+    INGEST_MAX_QUEUED,
+    INGEST_MAX_UPLOAD_SIZE,
+    INGEST_PATH,
+)
+from ..database import SessionLocal
+from ..ingest import load_database_from_csv
+from .models import IngestJob, IngestStatus
+
+log = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestManager:
+    """Loads uploaded files in a background thread pool, keeping track of their progress
+
+    Jobs are tracked in memory, so with multiple workers a job's progress is only known to the worker loading it.
+    """
+
+    def __init__(
+        self,
+        ingest_path: Path = INGEST_PATH,
+        session_factory: sessionmaker = SessionLocal,
+        concurrency: int = INGEST_CONCURRENCY,
+        max_queued: int = INGEST_MAX_QUEUED,
+        max_upload_size: int = INGEST_MAX_UPLOAD_SIZE,
+        job_ttl: float = INGEST_JOB_TTL,
+        max_finished_jobs: int = INGEST_MAX_FINISHED_JOBS,
+    ):
+        self.ingest_path = ingest_path
+        self.session_factory = session_factory
+        self.max_queued = max_queued
+        self.max_upload_size = max_upload_size
+        self.job_ttl = timedelta(seconds=job_ttl)
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: Dict[str, IngestJob] = {}
+        # Uploads that have a place in the queue but are still being received
+        self.uploading = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest")
+
+    @property
+    def queued(self) -> int:
+        return sum(job.status == IngestStatus.pending for job in self.jobs.values()) + self.uploading
+
+    def get(self, job_id: str) -> IngestJob | None:
+        self.evict()
+        return self.jobs.get(job_id)
+
+    def evict(self) -> List[IngestJob]:
+        """Forget finished jobs that have expired or are over the limit, oldest first, deleting their rejects files"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            finished = sorted(
+                (job for job in self.jobs.values() if job.finished_at), key=lambda job: job.finished_at
+            )
+            expired = [job for job in finished if now - job.finished_at >= self.job_ttl]
+            kept = finished[len(expired) :]
+            evicted = expired + kept[: max(0, len(kept) - self.max_finished_jobs)]
+            for job in evicted:
+                del self.jobs[job.id]
+        for job in evicted:
+            job.rejects_path.unlink(missing_ok=True)
+        return evicted
+
+    async def start(self, chunks: AsyncIterator[bytes]) -> IngestJob:
+        """Save an upload to the ingest directory and queue it to be loaded
+
+        Raises `IngestQueueFull` when too many jobs are waiting, and `UploadTooLarge` when the upload is over the
+        max upload size.
+        """
+        self.evict()
+        # The place in the queue is taken before the upload is received, so concurrent uploads can't go over it
+        with self._lock:
+            if self.queued >= self.max_queued:
+                raise IngestQueueFull()
+            self.uploading += 1
+
+        job_id = uuid.uuid4().hex
+        path = self.ingest_path / f"{job_id}.csv"
+        try:
+            size = await self._save(chunks, path)
+        except BaseException:
+            with self._lock:
+                self.uploading -= 1
+            path.unlink(missing_ok=True)
+            raise
+
+        job = IngestJob(
+            id=job_id,
+            path=path,
+            rejects_path=self.ingest_path / f"{job_id}.rejects.jsonl",
+            bytes_total=size,
+            created_at=datetime.now(timezone.utc),
+        )
+        with self._lock:
+            self.uploading -= 1
+            self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    async def _save(self, chunks: AsyncIterator[bytes], path: Path) -> int:
+        """Write an upload to a file as it is received, returning its size"""
+        await run_in_threadpool(self.ingest_path.mkdir, parents=True, exist_ok=True)
+        file = await run_in_threadpool(open, path, "wb")
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_upload_size:
+                    raise UploadTooLarge()
+                await run_in_threadpool(file.write, chunk)
+        finally:
+            file.close()
+        return size
+
+    def _run(self, job: IngestJob):
+        job.status = IngestStatus.running
+        job.started_at = datetime.now(timezone.utc)
+        try:
+            load_database_from_csv(
+                str(job.path), stats=job, rejects_path=job.rejects_path, session_factory=self.session_factory
+            )
+        except Exception as err:
+            log.exception(f"Ingest job {job.id} failed")
+            job.status = IngestStatus.failed
+            job.error = str(err)
+        else:
+            job.status = IngestStatus.completed
+        finally:
+            job.path.unlink(missing_ok=True)
+        job.finished_at = datetime.now(timezone.utc)
+
+
+ingest_manager = IngestManager()
@@ -0,0 +1,201 @@
+"""
+Background database maintenance
+
+In WAL mode writes are appended to the WAL file, and SQLite's automatic checkpoints copy them back into the
+database without ever shrinking the file. Automatic checkpoints also can't finish while readers are using the WAL,
+so under sustained writes it keeps growing and readers have to search more of it. Deletes leave free pages in the
+database file that are only reused by later inserts.
+
+The maintenance scheduler checks the database periodically:
+
+- When the WAL file is larger than `WAL_CHECKPOINT_SIZE`, a passive checkpoint copies as much as it can back into
+  the database without waiting for readers or writers.
+- When there have been no writes for `MAINTENANCE_IDLE_SECONDS`, a truncate checkpoint empties the WAL file, and
+  free pages are released with an incremental vacuum.
+
+With multiple workers only one of them runs maintenance at a time. Every commit appends to the WAL file, so the
+time of the last write by any worker is the WAL file's modification time, rather than the commits this worker has
+seen.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+from sqlalchemy import Engine
+
+from .config import (
+    MAINTENANCE_IDLE_SECONDS,
+    MAINTENANCE_INTERVAL,
+    VACUUM_FREELIST_PAGES,
+    VACUUM_PAGES_PER_RUN,
+    WAL_CHECKPOINT_SIZE,
+)
+from .database import DATABASE, engine, file_lock, wal_path
+from .metrics import MetricsRegistry, metrics
+
+log = logging.getLogger(__name__)
+
+# `PRAGMA auto_vacuum` value for incremental vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@dataclass
+class DatabaseStats:
+    page_size: int
+    page_count: int
+    freelist_pages: int
+    wal_size_bytes: int
+
+    def as_metrics(self) -> Dict[str, float]:
+        return {
+            "database.page_size": self.page_size,
+            "database.page_count": self.page_count,
+            "database.freelist_pages": self.freelist_pages,
+            "database.wal_size_bytes": self.wal_size_bytes,
+        }
+
+
+def last_write_time(database: Path) -> float:
+    """When any connection last wrote to the database, as a Unix timestamp"""
+    wal = wal_path(database)
+    return (wal if wal.exists() else database).stat().st_mtime
+
+
+def _pragma(engine: Engine, pragma: str):
+    """Run a pragma on a pooled connection outside of a transaction, returning all its rows"""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        rows = cursor.execute(f"PRAGMA {pragma}").fetchall()
+        cursor.close()
+        return rows
+    finally:
+        connection.close()
+
+
+def database_stats(engine: Engine = engine, database: Path = DATABASE) -> DatabaseStats:
+    wal = wal_path(database)
+    return DatabaseStats(
+        page_size=_pragma(engine, "page_size")[0][0],
+        page_count=_pragma(engine, "page_count")[0][0],
+        freelist_pages=_pragma(engine, "freelist_count")[0][0],
+        wal_size_bytes=wal.stat().st_size if wal.exists() else 0,
+    )
+
+
+def enable_incremental_vacuum(engine: Engine = engine):
+    """Switch the database to incremental auto vacuum
+
+    Databases created without it need a full `VACUUM` to switch, which is done once when the API starts.
+    """
+    if _pragma(engine, "auto_vacuum")[0][0] == AUTO_VACUUM_INCREMENTAL:
+        return
+    _pragma(engine, "auto_vacuum = INCREMENTAL")
+    log.info("Vacuuming database to enable incremental auto vacuum")
+    connection = engine.raw_connection()
+    try:
+        connection.cursor().execute("VACUUM")
+    finally:
+        connection.close()
+
+
+class MaintenanceScheduler:
+    def __init__(
+        self,
+        engine: Engine = engine,
+        database: Path = DATABASE,
+        interval: float = MAINTENANCE_INTERVAL,
+        idle_seconds: float = MAINTENANCE_IDLE_SECONDS,
+        checkpoint_size: int = WAL_CHECKPOINT_SIZE,
+        vacuum_freelist_pages: int = VACUUM_FREELIST_PAGES,
+        vacuum_pages: int = VACUUM_PAGES_PER_RUN,
+        metrics: MetricsRegistry = metrics,
+    ):
+        self.engine = engine
+        self.database = database
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.checkpoint_size = checkpoint_size
+        self.vacuum_freelist_pages = vacuum_freelist_pages
+        self.vacuum_pages = vacuum_pages
+        self.metrics = metrics
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def idle(self) -> bool:
+        """Whether no worker has written to the database for `idle_seconds`"""
+        return time.time() - last_write_time(self.database) >= self.idle_seconds
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start running maintenance in a background thread"""
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+        log.info("Database maintenance started")
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        log.info("Database maintenance stopped")
+
+    def _run(self):
+        lock_path = self.database.with_name(f"{self.database.name}.maintenance.lock")
+        while not self._stopped.wait(self.interval):
+            try:
+                with file_lock(lock_path, blocking=False) as acquired:
+                    if acquired:
+                        self.run_once()
+            except Exception:
+                log.exception("Database maintenance failed")
+
+    def checkpoint(self, mode: str) -> bool:
+        """Run a checkpoint, returning whether it copied the whole WAL back into the database"""
+        busy, wal_frames, checkpointed_frames = _pragma(self.engine, f"wal_checkpoint({mode})")[0]
+        self.metrics.increment(f"maintenance.checkpoints.{mode.lower()}")
+        complete = not busy and wal_frames == checkpointed_frames
+        if not complete:
+            self.metrics.increment("maintenance.checkpoints.incomplete")
+        return complete
+
+    def vacuum(self, pages: int) -> int:
+        """Release up to a number of free pages, returning how many were released"""
+        before = _pragma(self.engine, "freelist_count")[0][0]
+        _pragma(self.engine, f"incremental_vacuum({pages})")
+        released = before - _pragma(self.engine, "freelist_count")[0][0]
+        self.metrics.increment("maintenance.vacuumed_pages", released)
+        return released
+
+    def run_once(self):
+        """Check the database and run whichever maintenance is due"""
+        stats = database_stats(self.engine, self.database)
+        idle = self.idle
+        if idle and stats.wal_size_bytes:
+            self.checkpoint("TRUNCATE")
+        elif stats.wal_size_bytes >= self.checkpoint_size:
+            self.checkpoint("PASSIVE")
+
+        if idle and stats.freelist_pages >= self.vacuum_freelist_pages:
+            released = self.vacuum(self.vacuum_pages)
+            log.info(f"Released {released} free pages")
+        self.metrics.increment("maintenance.runs")
+
+    def collect(self) -> Dict[str, float]:
+        """Current database stats as metrics"""
+        return database_stats(self.engine, self.database).as_metrics()
+
+
+maintenance_scheduler = MaintenanceScheduler()
@@ -0,0 +1,48 @@
+"""
+In process metrics
+
+Counters and gauges are recorded by name, like `maintenance.checkpoints.passive`. Collectors can be registered
+for values that are read when the metrics are requested, such as the size of the WAL file. With multiple workers
+each one has its own metrics.
+"""
+
+import threading
+from typing import Callable, Dict
+
+# Returns current values of metrics, keyed by name
+Collector = Callable[[], Dict[str, float]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._values: Dict[str, float] = {}
+        self._collectors: Dict[str, Collector] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def set(self, name: str, value: float):
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name: str, default: float = 0) -> float:
+        """Current value of a recorded metric, not including the collected ones"""
+        with self._lock:
+            return self._values.get(name, default)
+
+    def register_collector(self, name: str, collector: Collector):
+        """Add a collector, replacing any collector already registered with the name"""
+        self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current value of every metric, including the collected ones"""
+        with self._lock:
+            values = dict(self._values)
+        for collector in self._collectors.values():
+            values.update(collector())
+        return dict(sorted(values.items()))
+
+
+metrics = MetricsRegistry()
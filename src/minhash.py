@@ -0,0 +1,95 @@
+"""
+MinHash signatures and locality sensitive hashing of text
+
+A text is split into shingles, runs of consecutive words, and its signature is the smallest hash of its shingles
+under each of a fixed set of hash functions. The fraction of two signatures' values that are equal estimates the
+Jaccard similarity of the texts' shingles, so near-duplicates, such as the same review with a few words changed,
+have mostly equal signatures.
+
+Signatures are split into bands, and each band is hashed to a bucket. Texts with a similarity above roughly
+`(1 / BANDS) ** (1 / ROWS_PER_BAND)` are very likely to share a bucket in at least one band, so candidates are
+found by looking up a text's buckets rather than comparing it with every other text.
+
+Only the standard library is used, and the hash functions are seeded so signatures are the same in every process.
+"""
+
+import hashlib
+import json
+import random
+import re
+import struct
+from typing import Callable, List, Sequence, Set, Tuple
+
+# Number of words in each shingle
+SHINGLE_SIZE = 3
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+
+# Hash functions are `(a * x + b) % MERSENNE_PRIME`, truncated to 32 bits, with fixed `a` and `b`
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_random = random.Random(1)
+HASH_PARAMETERS: List[Tuple[int, int]] = [
+    (_random.randint(1, MERSENNE_PRIME - 1), _random.randint(0, MERSENNE_PRIME - 1))
+    for _ in range(NUM_HASHES)
+]
+
+SIGNATURE_FORMAT = struct.Struct(f"<{NUM_HASHES}I")
+BAND_SIZE = ROWS_PER_BAND * 4
+
+WORD = re.compile(r"\w+")
+
+
+def shingles(text: str) -> Set[str]:
+    """Runs of `SHINGLE_SIZE` words, ignoring case and punctuation. Shorter texts are a single shingle"""
+    words = WORD.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _hash(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "little")
+
+
+def signature(text: str) -> bytes:
+    """MinHash signature of a text, packed as `NUM_HASHES` 32 bit values"""
+    hashes = [_hash(shingle.encode()) for shingle in shingles(text)]
+    return SIGNATURE_FORMAT.pack(
+        *(min((a * x + b) % MERSENNE_PRIME for x in hashes) & MAX_HASH for a, b in HASH_PARAMETERS)
+    )
+
+
+def bands(signature: bytes) -> List[int]:
+    """Bucket of each band of a signature, as signed 64 bit integers so they can be stored in SQLite"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(signature[offset : offset + BAND_SIZE], digest_size=8).digest(),
+            "little",
+            signed=True,
+        )
+        for offset in range(0, BANDS * BAND_SIZE, BAND_SIZE)
+    ]
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of the texts two signatures were made from"""
+    matching = sum(a == b for a, b in zip(SIGNATURE_FORMAT.unpack(first), SIGNATURE_FORMAT.unpack(second)))
+    return matching / NUM_HASHES
+
+
+def _bands_json(signature: bytes | None) -> str | None:
+    return json.dumps(bands(signature)) if signature is not None else None
+
+
+def _signature_or_null(text: str | None) -> bytes | None:
+    return signature(text) if text is not None else None
+
+
+# Functions registered on every database connection, for the triggers that index review content
+SQL_FUNCTIONS: Sequence[Tuple[str, int, Callable]] = (
+    ("minhash", 1, _signature_or_null),
+    ("minhash_bands", 1, _bands_json),
+)
@@ -0,0 +1,163 @@
+"""
+Sampling profiler for the running API
+
+Samples the Python stack of every thread at a fixed interval, so the handlers running in the threadpool and the
+event loop are profiled together without instrumenting any code. The overhead is one walk of each thread's stack
+per interval. Threads that are waiting for work, such as idle threadpool workers, are left out by default.
+
+Profiles are returned either as collapsed stacks, one line per stack with the number of times it was sampled, which
+can be turned into a flame graph with `flamegraph.pl`, or in the [speedscope](https://www.speedscope.app) format.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from types import CodeType, FrameType
+from typing import Dict, FrozenSet, List, Tuple
+
+# A frame is identified by its module, function name, file and the line the function starts on
+Frame = Tuple[str, str, str, int]
+
+# Functions that threads block in while they have nothing to do, by module and function name
+IDLE_FUNCTIONS: FrozenSet[Tuple[str, str]] = frozenset(
+    (
+        ("threading", "wait"),
+        ("threading", "_wait_for_tstate_lock"),
+        ("selectors", "select"),
+        ("queue", "get"),
+    )
+)
+
+
+class ProfileFormat(str, Enum):
+    collapsed = "collapsed"
+    speedscope = "speedscope"
+
+
+def _frame(frame: FrameType) -> Frame:
+    code = frame.f_code
+    return (
+        frame.f_globals.get("__name__", "?"),
+        getattr(code, "co_qualname", code.co_name),
+        code.co_filename,
+        code.co_firstlineno,
+    )
+
+
+def _stack(frame: FrameType) -> List[FrameType]:
+    """Frames of a thread's stack, from the outermost call to the innermost"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+@dataclass
+class Profile:
+    interval: float
+    duration: float = 0.0
+    # Number of times each stack was sampled, keyed by thread name and stack
+    samples: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, each line is the thread and frames separated by `;` then the sample count"""
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            frames = ";".join(f"{module}:{function}" for module, function, _, _ in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """Profile in speedscope's file format, with a sampled profile for each thread"""
+        frame_indexes: Dict[Frame, int] = {}
+        frames = []
+        threads: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        for (thread_name, stack), count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_indexes:
+                    frame_indexes[frame] = len(frames)
+                    module, function, file, line = frame
+                    frames.append({"name": f"{module}:{function}", "file": file, "line": line})
+                indexes.append(frame_indexes[frame])
+            samples, weights = threads.setdefault(thread_name, ([], []))
+            samples.append(indexes)
+            weights.append(count * self.interval)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+                for thread_name, (samples, weights) in sorted(threads.items())
+            ],
+            "name": "trustpilot-reviews-api",
+            "exporter": "src.profiler",
+        }
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads, except its own, for a number of seconds
+
+    When `codes` are given only stacks that include one of those functions are kept, such as the endpoints of a
+    route. So only the time spent handling matching requests is profiled.
+    """
+
+    def __init__(
+        self, interval: float = 0.005, codes: FrozenSet[CodeType] | None = None, include_idle: bool = False
+    ):
+        self.interval = interval
+        self.codes = codes
+        self.include_idle = include_idle
+
+    def _keep(self, frames: List[FrameType]) -> bool:
+        if not frames:
+            return False
+        leaf = frames[-1]
+        if not self.include_idle and (leaf.f_globals.get("__name__"), leaf.f_code.co_name) in IDLE_FUNCTIONS:
+            return False
+        if self.codes is not None:
+            return any(frame.f_code in self.codes for frame in frames)
+        return True
+
+    def sample(self, profile: Profile):
+        own_thread = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            frames = _stack(frame)
+            if self._keep(frames):
+                stack = tuple(_frame(frame) for frame in frames)
+                profile.samples[(thread_names.get(thread_id, str(thread_id)), stack)] += 1
+
+    def run(self, seconds: float) -> Profile:
+        """Sample for a number of seconds, blocking the calling thread"""
+        profile = Profile(interval=self.interval)
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_sample = start
+        while time.perf_counter() < deadline:
+            self.sample(profile)
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Sampling took longer than the interval, carry on from now rather than catching up
+                next_sample = time.perf_counter()
+        profile.duration = time.perf_counter() - start
+        return profile
@@ -0,0 +1,133 @@
+"""
+Per API key rate limiting
+
+Each API key has a token bucket which refills at a steady rate up to a burst size. Every request takes tokens from
+its key's bucket, more for writes and heavy list queries than for cheap reads, and once the bucket is empty
+requests are rejected with a `429` until it has refilled. So one client polling in a tight loop is slowed down
+without affecting anyone else. Responses have `RateLimit-Limit`, `RateLimit-Remaining` and `RateLimit-Reset`
+headers, so clients can pace themselves.
+
+Buckets are held by a store. The default store keeps them in the worker's memory, so with multiple workers each
+worker limits its share of a key's requests. A store shared between workers can be used instead by implementing
+`RateLimitStore`.
+"""
+
+import math
+import time
+from typing import Dict, List, Protocol, Tuple
+
+from fastapi import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .admission import EXEMPT_PREFIXES, RequestClass, classify, route_path
+from .metrics import MetricsRegistry, metrics
+from .responses import NegotiatedResponse, request_media_type
+
+API_KEY_HEADER = b"x-api-key"
+
+
+class RateLimitStore(Protocol):
+    def take(self, key: str, cost: float, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        """Take tokens from a key's bucket if it has enough, returning whether they were taken and the tokens left"""
+
+
+class MemoryStore:
+    """Buckets held in this worker's memory, only used from the event loop so it doesn't need a lock
+
+    Once there are `max_keys` buckets, buckets that have refilled are dropped, as they are the same as a new one.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # Tokens in each key's bucket, and when they were counted
+        self.buckets: Dict[str, List[float]] = {}
+
+    def take(self, key: str, cost: float, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._prune(rate, burst, now)
+            bucket = self.buckets[key] = [burst, now]
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        bucket[0], bucket[1] = tokens, now
+        return allowed, tokens
+
+    def _prune(self, rate: float, burst: float, now: float):
+        full = [
+            key for key, (tokens, counted) in self.buckets.items() if tokens + (now - counted) * rate >= burst
+        ]
+        for key in full:
+            del self.buckets[key]
+        if len(self.buckets) >= self.max_keys:
+            # Every bucket is in use, drop the oldest
+            del self.buckets[next(iter(self.buckets))]
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate: float,
+        burst: float,
+        costs: Dict[RequestClass, float],
+        store: RateLimitStore | None = None,
+        metrics: MetricsRegistry = metrics,
+    ):
+        self.app = app
+        self.rate = rate
+        # The bucket has to hold enough tokens for the most expensive request
+        self.burst = max(burst, *costs.values())
+        self.costs = costs
+        self.store = store if store is not None else MemoryStore()
+        self.metrics = metrics
+
+    def _headers(self, tokens: float) -> List[Tuple[bytes, bytes]]:
+        reset = math.ceil((self.burst - tokens) / self.rate)
+        return [
+            (b"ratelimit-limit", str(int(self.burst)).encode()),
+            (b"ratelimit-remaining", str(int(tokens)).encode()),
+            (b"ratelimit-reset", str(reset).encode()),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        api_key = next((value for name, value in scope["headers"] if name == API_KEY_HEADER), None)
+        path = route_path(scope)
+        # Requests without a key are rejected by authentication, so aren't metered
+        if api_key is None or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        cost = self.costs[classify(scope["method"], path)]
+        allowed, tokens = self.store.take(
+            api_key.decode("latin-1"), cost, self.rate, self.burst, time.monotonic()
+        )
+        headers = self._headers(tokens)
+
+        if not allowed:
+            self.metrics.increment("ratelimit.limited")
+            retry_after = math.ceil((cost - tokens) / self.rate)
+            # Runs before content negotiation, so the response is negotiated here
+            response = NegotiatedResponse(
+                {"detail": "Rate limit exceeded, try again later"},
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after), "Vary": "Accept"},
+                media_type=request_media_type(scope),
+            )
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,79 @@
+"""
+Content negotiation for API responses
+
+Responses are JSON by default. Clients that send `Accept: application/msgpack` get the same content encoded as
+[MessagePack](https://msgpack.org/), which is smaller and cheaper to encode. Error responses are negotiated the same
+way. MessagePack is only offered when the `msgpack` package is installed.
+"""
+
+from contextvars import ContextVar
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .utils import parse_quality_values
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Media type negotiated for the current request
+negotiated_media_type: ContextVar[str] = ContextVar("negotiated_media_type", default=JSON_MEDIA_TYPE)
+
+
+def select_media_type(accept: str) -> str:
+    """Pick MessagePack if the `Accept` header prefers it over JSON, otherwise JSON"""
+    if msgpack is None or not accept:
+        return JSON_MEDIA_TYPE
+    qualities = parse_quality_values(accept)
+    msgpack_quality = max(qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    json_quality = qualities.get(JSON_MEDIA_TYPE, qualities.get("application/*", qualities.get("*/*", 0.0)))
+    return MSGPACK_MEDIA_TYPE if msgpack_quality > json_quality else JSON_MEDIA_TYPE
+
+
+def request_media_type(scope: Scope) -> str:
+    """Media type negotiated from a request's `Accept` header"""
+    return select_media_type(Headers(scope=scope).get("Accept", ""))
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that is encoded as MessagePack when that was negotiated for the request"""
+
+    def __init__(self, content: Any, *args, media_type: str | None = None, **kwargs):
+        if media_type is None:
+            media_type = negotiated_media_type.get()
+        super().__init__(content, *args, media_type=media_type, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack.packb(content)
+        return super().render(content)
+
+
+class ContentNegotiationMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = negotiated_media_type.set(request_media_type(scope))
+
+        async def send_with_vary(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).add_vary_header("Accept")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            negotiated_media_type.reset(token)
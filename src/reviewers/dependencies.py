@@ -0,0 +1,50 @@
+from typing import Annotated
+
+from fastapi import Depends
+from pydantic import Field
+from pydantic_extra_types.country import CountryAlpha3
+
+from ..filters import EQUALITY_OPERATORS, FilterField, FilterSet
+from ..sorting import SortSet
+from ..utils import UtcDatetime
+from .models import Reviewer
+
+
+class ReviewerFilterSet(FilterSet):
+    """Filters for querying reviewers"""
+
+    model = Reviewer
+
+    id = FilterField(Reviewer.id, Annotated[int, Field(gt=0)], description="Filter users by their id.")
+    email = FilterField(Reviewer.email, str, EQUALITY_OPERATORS, description="Filter users by their email.")
+    name = FilterField(Reviewer.name, str, EQUALITY_OPERATORS, description="Filter users by their name.")
+    country = FilterField(
+        Reviewer.country,
+        CountryAlpha3,
+        EQUALITY_OPERATORS,
+        description="Filter users by their country, using valid [ISO 3166 three letter country codes](https://en.wikipedia.org/wiki/ISO_3166-1_alpha-3).",
+    )
+    created_at = FilterField(
+        Reviewer.created_at,
+        UtcDatetime,
+        description="Filter users by when they were created, in [ISO 8601](https://en.wikipedia.org/wiki/ISO_8601) format.",
+    )
+    updated_at = FilterField(
+        Reviewer.updated_at,
+        UtcDatetime,
+        description="Filter users by when they were last updated, in [ISO 8601](https://en.wikipedia.org/wiki/ISO_8601) format.",
+    )
+
+
+ReviewerFilters = Annotated[ReviewerFilterSet, Depends(ReviewerFilterSet.dependency())]
+
+
+class ReviewerSortSet(SortSet):
+    """Orders reviewers can be sorted in"""
+
+    model = Reviewer
+
+    orders = ("id", "email", "country")
+
+
+ReviewerSort = Annotated[ReviewerSortSet, Depends(ReviewerSortSet.dependency())]
@@ -1,9 +1,12 @@
 from datetime import datetime, timezone
+from typing import List
 
 from pydantic import EmailStr
 from pydantic_extra_types.country import CountryAlpha3
 from sqlmodel import Field, SQLModel
 
+from ..utils import IdBatch, PartialUpdate
+
 
 class ReviewerBase(SQLModel):
     email: EmailStr
@@ -14,6 +17,7 @@ class ReviewerBase(SQLModel):
 class Reviewer(ReviewerBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
     email: EmailStr = Field(unique=True)
+    country: CountryAlpha3 = Field(nullable=False, index=True)
     created_at: datetime | None = Field(
         default_factory=lambda: datetime.now(timezone.utc), nullable=True
     )  # Nullable because instantiation data doesn't have reviewer created data, so if null means legacy user
@@ -26,7 +30,7 @@ class ReviewerCreate(ReviewerBase):
     pass
 
 
-class ReviewerUpdate(SQLModel):
+class ReviewerUpdate(PartialUpdate):
     email: EmailStr | None = None
     name: str | None = Field(default=None, min_length=2)
     country: CountryAlpha3 | None = None
@@ -34,3 +38,18 @@ class ReviewerUpdate(SQLModel):
 
 class ReviewerResponce(ReviewerBase):
     id: int
+
+
+class ReviewerBulkDelete(IdBatch):
+    cascade: bool = False
+
+
+class ReviewerBulkDeleteResponce(SQLModel):
+    deleted: List[int]
+    not_found: List[int]
+    reviews_deleted: int
+
+
+class ReviewerBatchGetResponce(SQLModel):
+    reviewers: List[ReviewerResponce]
+    not_found: List[int]
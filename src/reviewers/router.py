@@ -1,97 +1,175 @@
 from typing import Annotated, List
 
-from fastapi import APIRouter, HTTPException, Query, status
-from pydantic_extra_types.country import CountryAlpha3
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from sqlalchemy import insert, update
 from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session as SQLModelSession
 from sqlmodel import select
 
+from ..counters import TOTAL_COUNT_HEADER, CountResponce, IncludeCount
 from ..database import Session
-from .models import Reviewer, ReviewerCreate, ReviewerResponce, ReviewerUpdate
+from ..includes import ReviewerIncludes, ReviewerWithReviews, with_reviews
+from ..sorting import Limit
+from ..utils import IdBatch, get_by_ids
+from ..writer import Writer
+from .dependencies import ReviewerFilters, ReviewerSort
+from .models import (
+    Reviewer,
+    ReviewerBatchGetResponce,
+    ReviewerBulkDelete,
+    ReviewerBulkDeleteResponce,
+    ReviewerCreate,
+    ReviewerResponce,
+    ReviewerUpdate,
+)
+from .service import count_reviewers, delete_reviewers
 
 router = APIRouter(prefix="/reviewers", tags=["reviewers"])
 
+Cascade = Annotated[
+    bool,
+    Query(title="Cascade", description="Delete the user's reviews along with them."),
+]
 
-@router.get("/", response_model=List[ReviewerResponce])
+
+@router.get("/", response_model=List[ReviewerWithReviews | ReviewerResponce])
 def get_reviewers(
     session: Session,
-    country: Annotated[
-        CountryAlpha3 | None,
-        Query(
-            title="Country Code",
-            description="Filter reviewers from a specific country, using valid [ISO 3166 three letter country code](https://en.wikipedia.org/wiki/ISO_3166-1_alpha-3)",
-        ),
-    ] = None,
+    response: Response,
+    filters: ReviewerFilters,
+    sort: ReviewerSort,
+    limit: Limit = None,
+    count: IncludeCount = False,
+    include: ReviewerIncludes = None,
 ):
     """## Retrieve user information on all users who can authored reviews
 
-    Users can be filtered by their country.
+    Users can be filtered on any of their fields, such as their country. Users can be sorted, like `sort=country`, and the number returned capped with `limit`. The total number of matching users can be returned in the `X-Total-Count` header. Each user's reviews can be included with `include=reviews`.
     """
-    query = select(Reviewer)
-    if country:
-        query = query.where(Reviewer.country == country)
-
-    reviewers = session.exec(query).all()
+    statement = filters.statement().order_by(*sort.order_by).limit(limit)
+    reviewers = session.exec(statement, params=filters.params).all()
+    if count:
+        response.headers[TOTAL_COUNT_HEADER] = str(count_reviewers(session, filters))
+    if include:
+        return with_reviews(session, reviewers)
     return reviewers
 
 
+@router.get("/count", response_model=CountResponce)
+def get_reviewers_count(session: Session, filters: ReviewerFilters):
+    """## Count users who can author reviews
+
+    Accepts the same filters as retrieving all users.
+    """
+    return CountResponce(count=count_reviewers(session, filters))
+
+
+@router.post("/batch-get", response_model=ReviewerBatchGetResponce)
+def batch_get_reviewers(request: IdBatch, session: Session):
+    """## Retrieve many users by their ids
+
+    Up to 1000 users are returned in the order of the requested ids, with any ids that don't exist listed in `not_found`.
+    """
+    reviewers, not_found = get_by_ids(session, Reviewer, request.ids)
+    return ReviewerBatchGetResponce(reviewers=reviewers, not_found=not_found)
+
+
 @router.post("/", response_model=ReviewerResponce, status_code=status.HTTP_201_CREATED)
-def create_reviewer(reviewer: ReviewerCreate, session: Session):
+def create_reviewer(reviewer: ReviewerCreate, writer: Writer):
     """## Create a new user who can author reviews"""
-    db_reviewer = Reviewer.model_validate(reviewer)
-    session.add(db_reviewer)
+
+    def write(session: SQLModelSession) -> ReviewerResponce:
+        values = Reviewer.model_validate(reviewer).model_dump(exclude={"id"})
+        db_reviewer = session.scalars(insert(Reviewer).values(values).returning(Reviewer)).one()
+        return ReviewerResponce.model_validate(db_reviewer)
+
     try:
-        session.commit()
+        return writer(write)
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reviewer email already in use")
-    session.refresh(db_reviewer)
-    return db_reviewer
 
 
-@router.get("/{reviewer_id}", response_model=ReviewerResponce)
-def get_reviewer(reviewer_id: int, session: Session):
-    """## Retrieve a specific user by their id"""
+@router.get("/{reviewer_id}", response_model=ReviewerWithReviews | ReviewerResponce)
+def get_reviewer(reviewer_id: int, session: Session, include: ReviewerIncludes = None):
+    """## Retrieve a specific user by their id
+
+    The user's reviews can be included with `include=reviews`.
+    """
     reviewer = session.get(Reviewer, reviewer_id)
     if not reviewer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
+    if include:
+        return with_reviews(session, [reviewer])[0]
     return reviewer
 
 
 @router.patch("/{reviewer_id}", response_model=ReviewerResponce)
-def update_reviewer(reviewer_id: int, reviewer: ReviewerUpdate, session: Session):
+def update_reviewer(reviewer_id: int, reviewer: ReviewerUpdate, writer: Writer):
     """## Update a specific user
 
     The users name, email and country can be updated. The request body only needs to contain fields that should be changed.
     """
-    db_reviewer = session.get(Reviewer, reviewer_id)
-    if not db_reviewer:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
-    reviewer_update = reviewer.model_dump(exclude_unset=True)
-    db_reviewer.sqlmodel_update(reviewer_update)
-    Reviewer.model_validate(db_reviewer)
-    session.add(db_reviewer)
+
+    def write(session: SQLModelSession) -> ReviewerResponce:
+        reviewer_update = reviewer.model_dump(exclude_unset=True)
+        if reviewer_update:
+            statement = (
+                update(Reviewer).where(Reviewer.id == reviewer_id).values(reviewer_update).returning(Reviewer)
+            )
+        else:
+            statement = select(Reviewer).where(Reviewer.id == reviewer_id)
+        db_reviewer = session.scalars(statement).one_or_none()
+        if not db_reviewer:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
+        return ReviewerResponce.model_validate(db_reviewer)
+
     try:
-        session.commit()
+        return writer(write)
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reviewer email already in use")
-    session.refresh(db_reviewer)
-    return db_reviewer
 
 
 @router.delete("/{reviewer_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
-def delete_reviewer(reviewer_id: int, session: Session):
+def delete_reviewer(reviewer_id: int, writer: Writer, cascade: Cascade = False):
     """## Delete a user
 
-    All of a users reviews must be deleted before the user can be deleted.
+    All of a users reviews must be deleted before the user can be deleted, unless `cascade=true` is set to delete the user's reviews along with them.
 
     ![Trying to Delete](https://i.giphy.com/media/v1.Y2lkPTc5MGI3NjExOTNmOGs5dzFpaGRwOHh2YmY0MGRoNWxwbjFkbHJtNHprNm9kbXV2ZCZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/7ILa7CZLxE0Ew/giphy.gif)
     """
-    reviewer = session.get(Reviewer, reviewer_id)
-    if not reviewer:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
-    session.delete(reviewer)
+
+    def write(session: SQLModelSession):
+        deleted, _ = delete_reviewers(session, [reviewer_id], cascade)
+        if not deleted:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
+
     try:
-        session.commit()
+        writer(write)
     except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Reviewer can't be deleted if it has reviews"
         )
+
+
+@router.post("/bulk-delete", response_model=ReviewerBulkDeleteResponce)
+def bulk_delete_reviewers(request: ReviewerBulkDelete, writer: Writer):
+    """## Delete many users
+
+    All the users are deleted in a single transaction, so if any of them can't be deleted none of them are. Set `cascade` to delete the users' reviews along with them. Ids of users that don't exist are returned in `not_found`.
+    """
+    reviewer_ids = list(dict.fromkeys(request.ids))
+
+    def write(session: SQLModelSession) -> ReviewerBulkDeleteResponce:
+        deleted, reviews_deleted = delete_reviewers(session, reviewer_ids, request.cascade)
+        return ReviewerBulkDeleteResponce(
+            deleted=deleted,
+            not_found=sorted(set(reviewer_ids) - set(deleted)),
+            reviews_deleted=reviews_deleted,
+        )
+
+    try:
+        return writer(write)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Reviewers can't be deleted if they have reviews"
+        )
@@ -0,0 +1,38 @@
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+from ..counters import count_filtered, prune_counters
+from ..reviews.models import Review
+from ..utils import chunked
+from .dependencies import ReviewerFilterSet
+from .models import Reviewer
+
+
+def count_reviewers(session: Session, filters: ReviewerFilterSet) -> int:
+    """Count the reviewers matching the filters
+
+    Counts for all reviewers, or reviewers filtered only by country, are read from the counters.
+    """
+    return count_filtered(session, filters)
+
+
+def delete_reviewers(
+    session: Session, reviewer_ids: Sequence[int], cascade: bool = False
+) -> Tuple[List[int], int]:
+    """Delete reviewers, returning the ids of the reviewers that were deleted and how many reviews were deleted
+
+    With `cascade` the reviewers' reviews are deleted first, with one `DELETE` per batch of reviewers rather than
+    one per review. Otherwise deleting a reviewer who has reviews raises an `IntegrityError`. The counters and
+    change feed are kept up to date by their triggers, which still run for every deleted review, so the write
+    transaction grows with the number of reviews deleted.
+    """
+    deleted, reviews_deleted = [], 0
+    for ids in chunked(reviewer_ids):
+        if cascade:
+            reviews_deleted += session.exec(delete(Review).where(Review.reviewer_id.in_(ids))).rowcount
+        deleted += session.scalars(delete(Reviewer).where(Reviewer.id.in_(ids)).returning(Reviewer.id)).all()
+    if reviews_deleted:
+        prune_counters(session, Review.__table__, Review.__table__.c.reviewer_id, deleted)
+    return deleted, reviews_deleted
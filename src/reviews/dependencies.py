@@ -0,0 +1,55 @@
+from typing import Annotated
+
+from fastapi import Depends
+from pydantic import Field
+
+from ..filters import EQUALITY_OPERATORS, DayFilterField, FilterField, FilterSet
+from ..sorting import SortSet
+from ..utils import UtcDatetime
+from .models import Review
+
+
+class ReviewFilterSet(FilterSet):
+    """Filters for querying reviews"""
+
+    model = Review
+
+    id = FilterField(Review.id, Annotated[int, Field(gt=0)], description="Filter reviews by their id.")
+    reviewer_id = FilterField(
+        Review.reviewer_id,
+        Annotated[int, Field(gt=0)],
+        alias="ReviewerId",
+        description="Filter reviews by the user who wrote them.",
+    )
+    title = FilterField(Review.title, str, EQUALITY_OPERATORS, description="Filter reviews by their title.")
+    rating = FilterField(
+        Review.rating,
+        Annotated[int, Field(ge=1, le=5)],
+        description="Filter reviews by there rating, from 1 to 5.",
+    )
+    content = FilterField(
+        Review.content, str, EQUALITY_OPERATORS, description="Filter reviews by their content."
+    )
+    date = DayFilterField(
+        Review.created_at,
+        description="Filter reviews by the UTC date they were created, any time on the day matches. This is a date in [ISO 8601](https://en.wikipedia.org/wiki/ISO_8601) format: `YYYY-MM-DD`.",
+    )
+    updated_at = FilterField(
+        Review.updated_at,
+        UtcDatetime,
+        description="Filter reviews by when they were last updated, in [ISO 8601](https://en.wikipedia.org/wiki/ISO_8601) format.",
+    )
+
+
+ReviewFilters = Annotated[ReviewFilterSet, Depends(ReviewFilterSet.dependency())]
+
+
+class ReviewSortSet(SortSet):
+    """Orders reviews can be sorted in"""
+
+    model = Review
+
+    orders = ("id", "created_at", "rating", "reviewer_id", "rating,-created_at")
+
+
+ReviewSort = Annotated[ReviewSortSet, Depends(ReviewSortSet.dependency())]
@@ -1,8 +1,10 @@
 from datetime import datetime, timezone
+from typing import List
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
-from ..utils import DemojizedStr
+from ..utils import DemojizedStr, PartialUpdate
 
 
 class ReviewBase(SQLModel):
@@ -14,18 +16,23 @@ class ReviewBase(SQLModel):
 
 class Review(ReviewBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    reviewer_id: int = Field(foreign_key="reviewer.id")
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    reviewer_id: int = Field(foreign_key="reviewer.id", index=True)
+    rating: int = Field(ge=1, le=5, index=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     updated_at: datetime | None = Field(
         default=None, nullable=True, sa_column_kwargs={"onupdate": lambda: datetime.now(timezone.utc)}
     )
 
 
+# Sorts by rating, with the newest reviews first for each rating
+Index("ix_review_rating_created_at", Review.rating, Review.created_at.desc())
+
+
 class ReviewCreate(ReviewBase):
     content: DemojizedStr
 
 
-class ReviewUpdate(SQLModel):
+class ReviewUpdate(PartialUpdate):
     title: str | None = Field(default=None, min_length=2)
     rating: int = Field(default=None, ge=1, le=5)
     content: DemojizedStr | None = Field(default=None, min_length=10)
@@ -34,3 +41,17 @@ class ReviewUpdate(SQLModel):
 class ReviewResponce(ReviewBase):
     id: int
     created_at: datetime
+
+
+class ReviewBatchGetResponce(SQLModel):
+    reviews: List[ReviewResponce]
+    not_found: List[int]
+
+
+class SimilarReviewResponce(ReviewResponce):
+    similarity: float
+
+
+class DuplicateReview(SQLModel):
+    id: int
+    similarity: float
@@ -1,127 +1,244 @@
-from datetime import datetime
 from typing import Annotated, List
 
 from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import delete, insert, update
 from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session as SQLModelSession
 from sqlmodel import select
 
+from ..coalescing import coalesced_response
+from ..config import DUPLICATE_THRESHOLD, SIMILARITY_THRESHOLD
+from ..counters import TOTAL_COUNT_HEADER, CountResponce, IncludeCount
 from ..database import Session
-from ..utils import OPERATOR_MAPPING
-from .models import Review, ReviewCreate, ReviewResponce, ReviewUpdate
+from ..export import MEDIA_TYPES, STREAMERS, ExportFormat, pq
+from ..includes import ReviewIncludes, ReviewWithReviewer, with_reviewer
+from ..minhash import signature
+from ..similarity import find_similar, review_signature
+from ..sorting import Limit
+from ..utils import IdBatch, get_by_ids
+from ..writer import Writer
+from .dependencies import ReviewFilters, ReviewSort
+from .models import (
+    DuplicateReview,
+    Review,
+    ReviewBatchGetResponce,
+    ReviewCreate,
+    ReviewResponce,
+    ReviewUpdate,
+    SimilarReviewResponce,
+)
+from .service import count_reviews
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
+REVIEWS_ADAPTER = TypeAdapter(List[ReviewWithReviewer | ReviewResponce])
+REVIEW_ADAPTER = TypeAdapter(ReviewWithReviewer | ReviewResponce)
 
-@router.get("/", response_model=List[ReviewResponce])
+CheckDuplicates = Annotated[
+    bool,
+    Query(
+        title="Check Duplicates",
+        description="Reject the review with a `409` if its content is a near-duplicate of an existing review.",
+    ),
+]
+
+
+@router.get("/", response_model=List[ReviewWithReviewer | ReviewResponce])
 def get_reviews(
     session: Session,
-    rating: Annotated[
-        str | None,
-        Query(
-            title="Rating",
-            description="Filter reviews by there rating. Either by providing exact rating value or by providing a valid operator followed by a rating value. Valid operators are `eq:`, `gt:`, `gte:`, `lt:` and `lte:`.",
-            pattern="^((eq|gte?|lte?):)?[1-5]$",
-        ),
-    ] = None,
-    date: Annotated[
-        str | None,
-        Query(
-            title="Created Date",
-            description="Filter reviews by there date they were created. Either by providing exact date value or by providing a valid operator followed by a rating value. This is a date in [ISO 8601](https://en.wikipedia.org/wiki/ISO_8601) format: `YYYY-MM-DD`. Valid operators are `eq:`, `gt:`, `gte:`, `lt:` and `lte:`. To filter for a specific date range, provide multiple parameters, one using `gt`/`gte` operator and the other using `lt`/`lte` operator.",
-            pattern="((eq|gte?|lte?):)?(19|20)\d{2}-(0[1-9]|1[0,1,2])-(0[1-9]|[12][0-9]|3[01])$",
-        ),
-    ] = None,
-    reviewer_id: Annotated[
-        int | None,
-        Query(
-            title="Reviewer Id",
-            description="Filter reviews by a specific user.",
-            alias="ReviewerId",
-            gt=0,
-        ),
-    ] = None,
+    filters: ReviewFilters,
+    sort: ReviewSort,
+    limit: Limit = None,
+    count: IncludeCount = False,
+    include: ReviewIncludes = None,
 ):
     """## Retrieve all reviews
 
-    Reviews can be filtered by there rating, creation date and/or the user who wrote them.
+    Reviews can be filtered on any of their fields, such as there rating, creation date and/or the user who wrote them. Filters can be repeated to select a range, like `rating=gte:2&rating=lte:4`. Reviews can be sorted, like `sort=-created_at` for the newest first, and the number returned capped with `limit`. The total number of matching reviews can be returned in the `X-Total-Count` header. The user who wrote each review can be included with `include=reviewer`.
 
     ![Fetch](https://i.giphy.com/media/v1.Y2lkPTc5MGI3NjExM2k3bmV1dmhvajYzODRwd3p1MDR4Z2twcno1bXZxM20zeGhmNTRpMCZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/klPeFHrWqzPDW/giphy.gif)
     """
-    query = select(Review)
-    if rating:
-        if ":" in rating:
-            op, _, value = rating.partition(":")
-            operator = OPERATOR_MAPPING.get(op)
-            query = query.where(operator(Review.rating, value))
-        else:
-            query = query.where(Review.rating == int(rating))
-
-    if date:
-        if ":" in date:
-            op, _, value = date.partition(":")
-            operator = OPERATOR_MAPPING.get(op)
-            query_date = datetime.strptime(value, "%Y-%m-%d")
-            query = query.where(operator(Review.created_at, query_date))
-        else:
-            query_date = datetime.strptime(date, "%Y-%m-%d")
-            query = query.where(Review.created_at == query_date)
 
-    if reviewer_id:
-        query = query.where(Review.reviewer_id == reviewer_id)
+    def load():
+        statement = filters.statement().order_by(*sort.order_by).limit(limit)
+        reviews = session.exec(statement, params=filters.params).all()
+        headers = {TOTAL_COUNT_HEADER: str(count_reviews(session, filters))} if count else {}
+        if include:
+            return with_reviewer(session, reviews), headers
+        return reviews, headers
+
+    return coalesced_response(
+        ("reviews", filters.conditions, sort.key, limit, count, include), load, REVIEWS_ADAPTER
+    )
+
 
-    reviews = session.exec(query).all()
-    return reviews
+@router.get("/count", response_model=CountResponce)
+def get_reviews_count(session: Session, filters: ReviewFilters):
+    """## Count reviews
+
+    Accepts the same filters as retrieving all reviews.
+    """
+    return CountResponce(count=count_reviews(session, filters))
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {"content": {media_type: {} for media_type in MEDIA_TYPES.values()}},
+    },
+)
+def export_reviews(
+    session: Session,
+    filters: ReviewFilters,
+    format: Annotated[
+        ExportFormat,
+        Query(title="Export Format", description="File format of the export, either `csv` or `parquet`."),
+    ] = ExportFormat.csv,
+):
+    """## Export reviews along with their reviewer
+
+    Reviews are streamed as a file, so the whole dataset can be exported without paging. CSV exports use the same columns as the ingest file. Accepts the same filters as retrieving all reviews.
+    """
+    if format == ExportFormat.parquet and pq is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet exports are not available"
+        )
+    return StreamingResponse(
+        STREAMERS[format](session, filters),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="reviews.{format.value}"'},
+    )
+
+
+@router.post("/batch-get", response_model=ReviewBatchGetResponce)
+def batch_get_reviews(request: IdBatch, session: Session):
+    """## Retrieve many reviews by their ids
+
+    Up to 1000 reviews are returned in the order of the requested ids, with any ids that don't exist listed in `not_found`.
+    """
+    reviews, not_found = get_by_ids(session, Review, request.ids)
+    return ReviewBatchGetResponce(reviews=reviews, not_found=not_found)
 
 
 @router.post("/", response_model=ReviewResponce, status_code=status.HTTP_201_CREATED)
-def create_review(review: ReviewCreate, session: Session):
-    """## Create a new review"""
-    db_review = Review.model_validate(review)
-    session.add(db_review)
+def create_review(review: ReviewCreate, writer: Writer, check_duplicates: CheckDuplicates = False):
+    """## Create a new review
+
+    With `check_duplicates=true` the review is rejected if its content is a near-duplicate of an existing review, such as the same text with a few words changed, and the `409` response lists the similar reviews.
+    """
+
+    def write(session: SQLModelSession) -> ReviewResponce:
+        if check_duplicates:
+            duplicates = find_similar(session, signature(review.content), DUPLICATE_THRESHOLD)
+            if duplicates:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={
+                        "msg": "Review is a near-duplicate of existing reviews",
+                        "duplicates": [
+                            DuplicateReview(id=id, similarity=score).model_dump() for id, score in duplicates
+                        ],
+                    },
+                )
+        values = Review.model_validate(review).model_dump(exclude={"id"})
+        db_review = session.scalars(insert(Review).values(values).returning(Review)).one()
+        return ReviewResponce.model_validate(db_review)
+
     try:
-        session.commit()
+        return writer(write)
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviewer not found")
-    session.refresh(db_review)
-    return db_review
 
 
-@router.get("/{review_id}", response_model=ReviewResponce)
-def get_review(review_id: int, session: Session):
-    """## Retrieve a specific review"""
+@router.get("/{review_id}", response_model=ReviewWithReviewer | ReviewResponce)
+def get_review(review_id: int, session: Session, include: ReviewIncludes = None):
+    """## Retrieve a specific review
+
+    The user who wrote the review can be included with `include=reviewer`.
+    """
+
+    def load():
+        review = session.get(Review, review_id)
+        if not review:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+        if include:
+            return with_reviewer(session, [review])[0], {}
+        return review, {}
+
+    return coalesced_response(("review", review_id, include), load, REVIEW_ADAPTER)
+
+
+@router.get("/{review_id}/similar", response_model=List[SimilarReviewResponce])
+def get_similar_reviews(
+    review_id: int,
+    session: Session,
+    threshold: Annotated[
+        float,
+        Query(
+            ge=0,
+            le=1,
+            title="Threshold",
+            description="Lowest estimated similarity of content to return, from 0 to 1.",
+        ),
+    ] = SIMILARITY_THRESHOLD,
+    limit: Limit = None,
+):
+    """## Retrieve reviews with similar content
+
+    Reviews are found from an index of their content, without comparing every review, and returned with their estimated similarity, the most similar first. Similarity is the overlap of the runs of words in the reviews' content, so `1.0` is the same text.
+    """
     review = session.get(Review, review_id)
     if not review:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
-    return review
+
+    matches = find_similar(session, review_signature(session, review), threshold, limit, exclude=review_id)
+    reviews, _ = get_by_ids(session, Review, [id for id, _ in matches])
+    scores = dict(matches)
+    return [
+        SimilarReviewResponce(
+            **ReviewResponce.model_validate(similar).model_dump(), similarity=scores[similar.id]
+        )
+        for similar in reviews
+    ]
 
 
 @router.patch("/{review_id}", response_model=ReviewResponce)
-def update_review(review_id: int, review: ReviewUpdate, session: Session):
+def update_review(review_id: int, review: ReviewUpdate, writer: Writer):
     """## Update a specific review
 
     The reviews title, rating and content can be updated. The request body only needs to contain fields that should be changed.
     """
-    db_review = session.get(Review, review_id)
-    if not db_review:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
-    review_update = review.model_dump(exclude_unset=True)
-    db_review.sqlmodel_update(review_update)
-    Review.model_validate(db_review)
-    session.add(db_review)
-    session.commit()
-    session.refresh(db_review)
-    return db_review
+
+    def write(session: SQLModelSession) -> ReviewResponce:
+        review_update = review.model_dump(exclude_unset=True)
+        if review_update:
+            statement = update(Review).where(Review.id == review_id).values(review_update).returning(Review)
+        else:
+            statement = select(Review).where(Review.id == review_id)
+        db_review = session.scalars(statement).one_or_none()
+        if not db_review:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+        return ReviewResponce.model_validate(db_review)
+
+    return writer(write)
 
 
 @router.delete("/{review_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
-def delete_review(review_id: int, session: Session):
+def delete_review(review_id: int, writer: Writer):
     """## Delete a review
 
 
     ![Delete This](https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjExOG50NDI3Y3dwMmtvZnQxd3dvNm9tY2w5ejJwYWJoMnNuc2Q5aG10eiZlcD12MV9naWZzX3NlYXJjaCZjdD1n/xULW8N9O5WD32L5052/giphy.gif)
     """
-    review = session.get(Review, review_id)
-    if not review:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
-    session.delete(review)
-    session.commit()
+
+    def write(session: SQLModelSession):
+        deleted = session.scalars(
+            delete(Review).where(Review.id == review_id).returning(Review.id)
+        ).one_or_none()
+        if deleted is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
+
+    writer(write)
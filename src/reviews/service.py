@@ -0,0 +1,13 @@
+from sqlmodel import Session
+
+from ..counters import count_filtered
+from .dependencies import ReviewFilterSet
+
+
+def count_reviews(session: Session, filters: ReviewFilterSet) -> int:
+    """Count the reviews matching the filters
+
+    Counts for all reviews, or reviews filtered only by rating or only by reviewer, are read from the counters.
+    Any other combination of filters falls back to an indexed `COUNT(*)`.
+    """
+    return count_filtered(session, filters)
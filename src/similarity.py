@@ -0,0 +1,272 @@
+"""
+Near-duplicate detection for review content
+
+Every review has a MinHash signature of its content, and the bucket of each band of the signature is stored in the
+band table, so reviews with similar content are found with an index lookup per band rather than by comparing every
+pair of reviews. Both are kept up to date by triggers on every insert, update and delete of a review, which call
+the `minhash` functions registered on each connection. So reviews written by the API, loaded by ingest or deleted
+along with their reviewer are all indexed the same way.
+
+Reviews that were written before the tables existed are indexed in batches, in a background thread once the API has
+started, so a large database doesn't hold up startup. They can also be indexed beforehand with:
+
+    python -m src.similarity --batch-size 1000
+"""
+
+import argparse
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import DDL, Engine, Select, and_, event, insert, or_
+from sqlalchemy.engine import Connection
+from sqlmodel import Field, Session, SQLModel, select
+
+from .config import LOG_FORMAT, LOG_LEVEL
+from .database import DATABASE, engine, file_lock, get_table_names
+from .minhash import bands, signature, similarity
+from .reviews.models import Review
+from .utils import chunked
+
+log = logging.getLogger(__name__)
+
+# Most reviews sharing a bucket with a review that are compared with it, so very common content stays fast
+MAX_CANDIDATES = 1000
+
+BACKFILL_BATCH_SIZE = 1000
+# Held by the worker indexing existing reviews, so other workers don't index the same ones
+BACKFILL_LOCK: Path = DATABASE.with_suffix(".similarity.lock")
+
+
+class ReviewSignature(SQLModel, table=True):
+    __tablename__ = "review_signature"
+
+    review_id: int = Field(primary_key=True)
+    signature: bytes
+
+
+class ReviewBand(SQLModel, table=True):
+    __tablename__ = "review_band"
+
+    band: int = Field(primary_key=True)
+    bucket: int = Field(primary_key=True)
+    review_id: int = Field(primary_key=True, index=True)
+
+
+def _index_review(row: str) -> str:
+    return (
+        f"INSERT OR REPLACE INTO {ReviewSignature.__tablename__} (review_id, signature) "
+        f"VALUES ({row}.id, minhash({row}.content)); "
+        f"INSERT INTO {ReviewBand.__tablename__} (band, bucket, review_id) "
+        f"SELECT key, value, {row}.id FROM json_each(minhash_bands("
+        f"(SELECT signature FROM {ReviewSignature.__tablename__} WHERE review_id = {row}.id))); "
+    )
+
+
+def _unindex_review(row: str) -> str:
+    return (
+        f"DELETE FROM {ReviewBand.__tablename__} WHERE review_id = {row}.id; "
+        f"DELETE FROM {ReviewSignature.__tablename__} WHERE review_id = {row}.id; "
+    )
+
+
+def similarity_triggers() -> List[DDL]:
+    """Triggers that keep the signatures and bands of reviews up to date"""
+    table = Review.__tablename__
+    return [
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_insert_similarity AFTER INSERT ON {table} "
+            f"BEGIN {_index_review('NEW')} END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_update_similarity AFTER UPDATE OF content ON {table} "
+            f"BEGIN {_unindex_review('OLD')} {_index_review('NEW')} END"
+        ),
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_delete_similarity AFTER DELETE ON {table} "
+            f"BEGIN {_unindex_review('OLD')} END"
+        ),
+    ]
+
+
+def backfill_batch(connection: Connection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Index a batch of reviews that don't have a signature yet, returning how many were indexed"""
+    indexed = select(ReviewSignature.review_id).where(ReviewSignature.review_id == Review.id).exists()
+    rows = connection.execute(
+        select(Review.id, Review.content).where(~indexed).order_by(Review.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    signatures = [{"review_id": id, "signature": signature(content)} for id, content in rows]
+    connection.execute(insert(ReviewSignature), signatures)
+    connection.execute(
+        insert(ReviewBand),
+        [
+            {"band": band, "bucket": bucket, "review_id": row["review_id"]}
+            for row in signatures
+            for band, bucket in enumerate(bands(row["signature"]))
+        ],
+    )
+    return len(rows)
+
+
+def backfill(connection: Connection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Index every review that doesn't have a signature yet, returning how many were indexed"""
+    total = 0
+    while indexed := backfill_batch(connection, batch_size):
+        total += indexed
+    return total
+
+
+def backfill_in_batches(
+    engine: Engine = engine,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    stopped: threading.Event | None = None,
+) -> int:
+    """Index every review that doesn't have a signature yet, committing each batch in its own transaction
+
+    Returns how many reviews were indexed, stopping early once `stopped` is set.
+    """
+    total = 0
+    while stopped is None or not stopped.is_set():
+        with engine.begin() as connection:
+            indexed = backfill_batch(connection, batch_size)
+        if not indexed:
+            break
+        total += indexed
+        log.info(f"Indexed {total} reviews")
+    return total
+
+
+class SimilarityBackfill:
+    """Indexes reviews written before the similarity index existed, in a background thread"""
+
+    def __init__(
+        self,
+        engine: Engine = engine,
+        lock_path: Path = BACKFILL_LOCK,
+        batch_size: int = BACKFILL_BATCH_SIZE,
+    ):
+        self.engine = engine
+        self.lock_path = lock_path
+        self.batch_size = batch_size
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="similarity-backfill", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        try:
+            with file_lock(self.lock_path, blocking=False) as acquired:
+                if not acquired:
+                    return
+                total = backfill_in_batches(self.engine, self.batch_size, self._stopped)
+                if total:
+                    log.info(f"Finished indexing {total} reviews")
+        except Exception:
+            log.exception("Indexing existing reviews failed")
+
+
+similarity_backfill = SimilarityBackfill()
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_similarity_index(metadata, connection, tables, **kwargs):
+    """Create the similarity triggers, existing reviews are left to `SimilarityBackfill` so creating them stays quick"""
+    for trigger in similarity_triggers():
+        connection.execute(trigger)
+
+
+def candidates_statement(review_signature: bytes) -> Select:
+    """Ids of reviews sharing a bucket with the signature in any band, each band is a lookup of the primary key"""
+    return (
+        select(ReviewBand.review_id)
+        .where(
+            or_(
+                *(
+                    and_(ReviewBand.band == band, ReviewBand.bucket == bucket)
+                    for band, bucket in enumerate(bands(review_signature))
+                )
+            )
+        )
+        .distinct()
+    )
+
+
+def find_similar(
+    session: Session,
+    review_signature: bytes,
+    threshold: float,
+    limit: int | None = None,
+    exclude: int | None = None,
+) -> List[Tuple[int, float]]:
+    """Ids of reviews with an estimated similarity of at least the threshold, most similar first
+
+    Candidates are reviews sharing a bucket in any band, which are then compared by their full signature.
+    """
+    statement = candidates_statement(review_signature)
+    if exclude is not None:
+        statement = statement.where(ReviewBand.review_id != exclude)
+    candidates: Sequence[int] = session.exec(statement.limit(MAX_CANDIDATES)).all()
+
+    matches = []
+    for chunk in chunked(candidates):
+        for review_id, candidate in session.exec(
+            select(ReviewSignature.review_id, ReviewSignature.signature).where(
+                ReviewSignature.review_id.in_(chunk)
+            )
+        ):
+            score = similarity(review_signature, candidate)
+            if score >= threshold:
+                matches.append((review_id, score))
+    matches.sort(key=lambda match: (-match[1], match[0]))
+    return matches[:limit]
+
+
+def review_signature(session: Session, review: Review) -> bytes:
+    """Signature of a review, from the index or computed from its content if it hasn't been indexed yet"""
+    stored = session.get(ReviewSignature, review.id)
+    return stored.signature if stored else signature(review.content)
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Index the content of reviews written before it was indexed")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BACKFILL_BATCH_SIZE,
+        help="Number of reviews indexed in each transaction",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT, stream=sys.stderr)
+
+    if ReviewSignature.__tablename__ not in get_table_names():
+        parser.error("The similarity index hasn't been created, start the API to create it")
+    # Waits for a running API to finish indexing, rather than indexing the same reviews
+    with file_lock(BACKFILL_LOCK):
+        total = backfill_in_batches(engine, args.batch_size)
+    log.info(f"Finished indexing {total} reviews")
+
+
+if __name__ == "__main__":
+    main()
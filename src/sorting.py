@@ -0,0 +1,125 @@
+"""
+Index-backed sorting for list endpoints
+
+A sort set declares the orders a list can be sorted in. Each is a comma separated list of fields, with a `-` prefix
+for descending, like `rating,-created_at`. Only orders that an index already returns rows in are accepted, along
+with their reverse, so a sorted request with a `limit` walks the index and stops after `limit` rows rather than
+sorting every matching row.
+
+Ties are broken by id in the direction of the first field. Every index also stores the row id, so this is the order
+the index is walked in, and results are stable between requests.
+"""
+
+import inspect
+from dataclasses import dataclass
+from typing import Annotated, Callable, ClassVar, Dict, List, Literal, Tuple
+
+from fastapi import Query
+from sqlalchemy import ColumnElement
+from sqlmodel import SQLModel
+
+SORT_SEPARATOR = ","
+DESCENDING_PREFIX = "-"
+
+# Most results that can be requested with `limit`
+MAX_LIMIT = 1000
+
+Limit = Annotated[
+    int | None,
+    Query(
+        ge=1,
+        le=MAX_LIMIT,
+        title="Limit",
+        description=f"Return at most this many results, up to {MAX_LIMIT}. Combine with `sort` for top N queries.",
+    ),
+]
+
+
+@dataclass(frozen=True)
+class SortOrder:
+    # Field names, each with whether it is sorted descending
+    keys: Tuple[Tuple[str, bool], ...]
+
+    @classmethod
+    def parse(cls, value: str) -> "SortOrder":
+        return cls(
+            tuple(
+                (key.removeprefix(DESCENDING_PREFIX), key.startswith(DESCENDING_PREFIX))
+                for key in value.split(SORT_SEPARATOR)
+            )
+        )
+
+    def reverse(self) -> "SortOrder":
+        return SortOrder(tuple((name, not descending) for name, descending in self.keys))
+
+    def __str__(self) -> str:
+        return SORT_SEPARATOR.join(
+            f"{DESCENDING_PREFIX if descending else ''}{name}" for name, descending in self.keys
+        )
+
+
+class SortSet:
+    """Sort orders for a model, declared by subclassing and listing the orders of the model's indexes in `orders`
+
+    Each declared order must start with an ascending field, as indexes are, and is accepted reversed too.
+    """
+
+    model: ClassVar[type[SQLModel]]
+    orders: ClassVar[Tuple[str, ...]] = ()
+    valid: ClassVar[Dict[str, SortOrder]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.valid = {}
+        for value in cls.orders:
+            order = SortOrder.parse(value)
+            for accepted in (order, order.reverse()):
+                cls.valid[str(accepted)] = accepted
+
+    def __init__(self, order: SortOrder | None = None):
+        self.order = order
+
+    def __bool__(self) -> bool:
+        return self.order is not None
+
+    @property
+    def key(self) -> str | None:
+        return str(self.order) if self.order else None
+
+    @property
+    def order_by(self) -> List[ColumnElement]:
+        """Order by clauses for the sort order, ending with the id to break ties"""
+        if not self.order:
+            return []
+        clauses = []
+        for name, descending in self.order.keys:
+            column = getattr(self.model, name)
+            clauses.append(column.desc() if descending else column.asc())
+        primary_key = self.model.__table__.primary_key.columns[0]
+        if primary_key.name not in dict(self.order.keys):
+            clauses.append(primary_key.desc() if self.order.keys[0][1] else primary_key.asc())
+        return clauses
+
+    @classmethod
+    def dependency(cls) -> Callable:
+        """FastAPI dependency which parses the sort order from the `sort` query parameter"""
+        values = ", ".join(f"`{value}`" for value in cls.valid)
+        parameter = inspect.Parameter(
+            "sort",
+            inspect.Parameter.KEYWORD_ONLY,
+            default=None,
+            annotation=Annotated[
+                Literal[tuple(cls.valid)] | None,
+                Query(
+                    title="Sort",
+                    description="Order of the results, as comma separated fields with a `-` prefix for descending. "
+                    f"Only orders backed by an index can be used: {values}.",
+                ),
+            ],
+        )
+
+        def sort(sort: str | None = None):
+            return cls(cls.valid[sort] if sort else None)
+
+        sort.__signature__ = inspect.Signature([parameter], return_annotation=cls)
+        return sort
@@ -1,8 +1,12 @@
 import operator
-from typing import Annotated
+from datetime import datetime, timezone
+from typing import Annotated, Dict, Iterator, List, Sequence, Tuple, TypeVar
 
 import emoji
-from pydantic import AfterValidator
+from pydantic import AfterValidator, field_validator
+from sqlmodel import Field, Session, SQLModel, select
+
+T = TypeVar("T")
 
 OPERATOR_MAPPING = {
     "eq": operator.eq,
@@ -14,6 +18,51 @@ OPERATOR_MAPPING = {
 }
 
 
+# Maximum number of values bound in one `IN` clause, well under SQLite's limit on host parameters
+IN_CLAUSE_BATCH_SIZE = 500
+
+
+def chunked(values: Sequence[T], size: int = IN_CLAUSE_BATCH_SIZE) -> Iterator[Sequence[T]]:
+    """Split values into chunks of at most `size` values"""
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def get_by_ids(session: Session, model: type[T], ids: Sequence[int]) -> Tuple[List[T], List[int]]:
+    """Rows with the ids, in the order the ids are given, along with the ids that don't have a row
+
+    Rows are loaded with a batched `IN` query for each chunk of ids, rather than a query per id.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    rows = {}
+    for chunk in chunked(unique_ids):
+        for row in session.exec(select(model).where(model.id.in_(chunk))):
+            rows[row.id] = row
+    return [rows[id] for id in ids if id in rows], [id for id in unique_ids if id not in rows]
+
+
+def parse_quality_values(header: str) -> Dict[str, float]:
+    """Parse a HTTP header with quality values, like `Accept` or `Accept-Encoding`, into a mapping of value to quality
+
+    e.g. `"gzip;q=0.8, zstd"` is parsed to `{"gzip": 0.8, "zstd": 1.0}`
+    """
+    qualities = {}
+    for item in header.split(","):
+        value, *params = item.strip().split(";")
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, param_value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.strip().lower()] = quality
+    return qualities
+
+
 def demojize_str(text: str) -> str:
     """Convert any unicode emojis to emoji shortcodes"""
     if emoji.emoji_count(text):
@@ -22,3 +71,37 @@ def demojize_str(text: str) -> str:
 
 
 DemojizedStr = Annotated[str, AfterValidator(demojize_str)]
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Convert a datetime to UTC without a timezone, the way timestamps are stored in the database
+
+    Datetimes without a timezone are assumed to already be in UTC.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+UtcDatetime = Annotated[datetime, AfterValidator(naive_utc)]
+
+
+class PartialUpdate(SQLModel):
+    """Request body of a partial update, where fields can be left out but not set to null"""
+
+    @field_validator("*")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("Field can't be set to null")
+        return value
+
+
+# Most ids that can be given in one batch request
+BATCH_MAX_IDS = 1000
+
+
+class IdBatch(SQLModel):
+    """Request body of a batch request on many ids"""
+
+    ids: List[int] = Field(min_length=1, max_length=BATCH_MAX_IDS)
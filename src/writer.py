@@ -0,0 +1,157 @@
+"""
+Group commit write queue
+
+By default every write request commits its own transaction, so concurrent writes are serialised by SQLite with
+one sync to disk each. When the write queue is enabled, writes from concurrent requests are handed to a single
+writer thread, which runs them in a shared transaction and commits once for the whole group. Each write runs in
+its own savepoint, so a failing write is rolled back without affecting the rest of its group. A request only
+gets its response once the group it was in has been committed.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Annotated, Callable, List, Tuple, TypeVar
+
+from fastapi import Depends
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session as SQLModelSession
+
+from .config import WRITE_QUEUE_MAX_BATCH_SIZE, WRITE_QUEUE_MAX_WAIT
+from .database import Session, SessionLocal
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# A write takes a session, makes its changes without committing and returns the response data
+Write = Callable[[SQLModelSession], T]
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_batch_size: int = WRITE_QUEUE_MAX_BATCH_SIZE,
+        max_wait: float = WRITE_QUEUE_MAX_WAIT,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.commits = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the writer thread"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+        log.info("Write queue started")
+
+    def stop(self):
+        """Commit any queued writes and stop the writer thread"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        log.info("Write queue stopped")
+
+    def submit(self, write: Write[T]) -> Future:
+        """Queue a write, returning a future that resolves once the write has been committed"""
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def _next_batch(self) -> Tuple[List[Tuple[Write, Future]], bool]:
+        """Wait for the next group of writes, bounded by the max batch size and wait time
+
+        Takes all the writes that queued up while the previous group was being committed, then waits up to the
+        max wait time for more to join. Also returns whether the queue has been stopped.
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[Write, Future]]):
+        outcomes = []
+        with self.session_factory() as session:
+            for write, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        outcomes.append((future, write(session), None))
+                except Exception as err:
+                    outcomes.append((future, None, err))
+
+            try:
+                session.commit()
+            except Exception as err:
+                log.exception(f"Failed to commit group of {len(batch)} writes")
+                for future, _, write_error in outcomes:
+                    future.set_exception(write_error or err)
+                return
+        self.commits += 1
+
+        for future, result, err in outcomes:
+            if err is None:
+                future.set_result(result)
+            else:
+                future.set_exception(err)
+
+
+write_queue = WriteQueue(SessionLocal)
+
+
+class RequestWriter:
+    """Runs a request's write, either through the write queue when it is running or directly with its session"""
+
+    def __init__(self, session: SQLModelSession, write_queue: WriteQueue):
+        self.session = session
+        self.write_queue = write_queue
+
+    def __call__(self, write: Write[T]) -> T:
+        if self.write_queue.running:
+            return self.write_queue.submit(write).result()
+
+        result = write(self.session)
+        self.session.commit()
+        return result
+
+
+def get_writer(session: Session) -> RequestWriter:
+    return RequestWriter(session, write_queue)
+
+
+Writer = Annotated[RequestWriter, Depends(get_writer)]
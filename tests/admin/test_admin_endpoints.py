@@ -0,0 +1,125 @@
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from src.admin import router as admin_router
+from src.backup import BackupManager
+from src.database import database_key
+from src.metrics import MetricsRegistry
+
+from ..test_backup import count_rows
+
+ROUTE_URL = "/admin"
+ADMIN_HEADERS = {"X-Admin-API-Key": "admin-test-key"}
+
+
+@pytest.fixture
+def backup_manager(encrypted_database: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    manager = BackupManager(backup_path=tmp_path / "backups", source=encrypted_database)
+    monkeypatch.setattr(admin_router, "backup_manager", manager)
+    return manager
+
+
+def wait_for_backup(test_client: TestClient, backup_id: str) -> dict:
+    for _ in range(100):
+        data = test_client.get(f"{ROUTE_URL}/backups/{backup_id}", headers=ADMIN_HEADERS).json()
+        if data["status"] in ("completed", "failed"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError("Backup didn't finish")
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-API-Key": "wrong-key"}])
+def test_admin_auth_error(test_client: TestClient, headers: dict):
+    response = test_client.get(f"{ROUTE_URL}/backups", headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+# POST /admin/backups
+def test_create_backup(test_client: TestClient, backup_manager: BackupManager):
+    response = test_client.post(
+        f"{ROUTE_URL}/backups", headers=ADMIN_HEADERS, json={"file_name": "snapshot.db"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["file_name"] == "snapshot.db"
+
+    data = wait_for_backup(test_client, response.json()["id"])
+    assert data["status"] == "completed"
+    assert data["progress"] == 1.0
+    assert data["pages_remaining"] == 0
+    assert count_rows(backup_manager.backup_path / "snapshot.db", database_key()) == 5000
+
+    response = test_client.get(f"{ROUTE_URL}/backups", headers=ADMIN_HEADERS)
+    assert [backup["id"] for backup in response.json()] == [data["id"]]
+
+
+def test_create_backup_default_name(test_client: TestClient, backup_manager: BackupManager):
+    response = test_client.post(f"{ROUTE_URL}/backups", headers=ADMIN_HEADERS)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    data = wait_for_backup(test_client, response.json()["id"])
+    assert (backup_manager.backup_path / data["file_name"]).exists()
+
+
+@pytest.mark.parametrize("file_name", ["../escape.db", "backup.txt", "/tmp/backup.db"])
+def test_create_backup_error(test_client: TestClient, backup_manager: BackupManager, file_name: str):
+    response = test_client.post(f"{ROUTE_URL}/backups", headers=ADMIN_HEADERS, json={"file_name": file_name})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+# GET /admin/backups/{backup_id}
+def test_get_backup_error(test_client: TestClient, backup_manager: BackupManager):
+    response = test_client.get(f"{ROUTE_URL}/backups/unknown", headers=ADMIN_HEADERS)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# GET /admin/metrics
+def test_get_metrics(test_client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    registry = MetricsRegistry()
+    registry.increment("maintenance.runs", 2)
+    registry.register_collector("database", lambda: {"database.wal_size_bytes": 4096})
+    monkeypatch.setattr(admin_router, "metrics", registry)
+
+    response = test_client.get(f"{ROUTE_URL}/metrics", headers=ADMIN_HEADERS)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"database.wal_size_bytes": 4096, "maintenance.runs": 2}
+
+
+# POST /admin/profile
+def test_profile_collapsed(test_client: TestClient):
+    response = test_client.post(f"{ROUTE_URL}/profile", params={"seconds": 0.05}, headers=ADMIN_HEADERS)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_profile_speedscope(test_client: TestClient):
+    response = test_client.post(
+        f"{ROUTE_URL}/profile",
+        params={"seconds": 0.05, "format": "speedscope", "route": "/reviews/{review_id}"},
+        headers=ADMIN_HEADERS,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+
+
+@pytest.mark.parametrize(
+    "params, expected_status",
+    [
+        ({"route": "/unknown"}, status.HTTP_404_NOT_FOUND),
+        ({"seconds": 0}, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ({"seconds": 3600}, status.HTTP_422_UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_profile_error(test_client: TestClient, params: dict, expected_status: int):
+    response = test_client.post(f"{ROUTE_URL}/profile", params=params, headers=ADMIN_HEADERS)
+    assert response.status_code == expected_status
+
+
+def test_profile_already_running(test_client: TestClient):
+    with admin_router.profile_lock:
+        response = test_client.post(f"{ROUTE_URL}/profile", params={"seconds": 0.05}, headers=ADMIN_HEADERS)
+    assert response.status_code == status.HTTP_409_CONFLICT
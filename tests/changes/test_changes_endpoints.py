@@ -0,0 +1,81 @@
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from ..conftest import REVIEWERS_COUNT, REVIEWS_COUNT
+
+ROUTE_URL = "/changes"
+
+SEEDED_CHANGES = REVIEWERS_COUNT + REVIEWS_COUNT
+
+
+def get_all_changes(test_client: TestClient, since: int = 0) -> list:
+    changes = []
+    while True:
+        response = test_client.get(ROUTE_URL, params={"since": since, "limit": 1000})
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        if not page:
+            return changes
+        changes.extend(page)
+        since = page[-1]["seq"]
+
+
+# GET /changes
+def test_get_changes(test_client: TestClient):
+    response = test_client.get(ROUTE_URL, params={"limit": 1000})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert len(data) == SEEDED_CHANGES
+    assert [change["seq"] for change in data] == list(range(1, SEEDED_CHANGES + 1))
+    assert all(change["operation"] == "insert" for change in data)
+    assert data[0]["entity"] == "reviewer"
+    assert data[0]["data"]["id"] == data[0]["entity_id"]
+    assert data[-1]["entity"] == "review"
+
+
+def test_get_changes_pagination(test_client: TestClient):
+    since, pages = 0, 0
+    seqs = []
+    while True:
+        response = test_client.get(ROUTE_URL, params={"since": since, "limit": 50})
+        page = response.json()
+        if not page:
+            break
+        pages += 1
+        seqs.extend(change["seq"] for change in page)
+        since = page[-1]["seq"]
+
+    assert pages == -(-SEEDED_CHANGES // 50)
+    assert seqs == sorted(seqs)
+    assert len(seqs) == SEEDED_CHANGES
+
+
+def test_get_changes_records_writes(test_client: TestClient):
+    response = test_client.post(
+        "/reviewers", json={"name": "Felicity Smoak", "email": "overwatch@arrow.com", "country": "USA"}
+    )
+    reviewer_id = response.json()["id"]
+    test_client.patch(f"/reviewers/{reviewer_id}", json={"name": "Overwatch"})
+    test_client.delete(f"/reviewers/{reviewer_id}")
+    test_client.patch("/reviews/1", json={"title": "Changed my mind"})
+    test_client.delete("/reviews/2")
+
+    changes = get_all_changes(test_client, since=SEEDED_CHANGES)
+    assert [(change["entity"], change["entity_id"], change["operation"]) for change in changes] == [
+        ("reviewer", reviewer_id, "insert"),
+        ("reviewer", reviewer_id, "update"),
+        ("reviewer", reviewer_id, "delete"),
+        ("review", 1, "update"),
+        ("review", 2, "delete"),
+    ]
+    assert changes[1]["data"]["name"] == "Overwatch"
+    assert changes[3]["data"]["title"] == "Changed my mind"
+    # Deletes are recorded as tombstones
+    assert changes[2]["data"] is None
+    assert changes[4]["data"] is None
+
+
+def test_get_changes_error(test_client: TestClient):
+    response = test_client.get(ROUTE_URL, params={"since": -1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -1,18 +1,19 @@
 import random
 from datetime import datetime
+from pathlib import Path
 from typing import List
 
 import pycountry
 import pytest
 from faker import Faker
 from fastapi.testclient import TestClient
-from sqlalchemy import Engine
+from sqlalchemy import Engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from sqlmodel import Session, SQLModel, create_engine
 
 from src.api import app
-from src.database import get_session
+from src.database import connection_pragmas, database_key, get_session, sqlcipher_driver
 from src.reviewers.models import Reviewer, ReviewerCreate
 from src.reviews.models import Review, ReviewCreate
 
@@ -114,6 +115,30 @@ def database(reviewers_data: List[ReviewerCreate], reviews_data: List[ReviewCrea
     yield engine
 
 
+@pytest.fixture(scope="function")
+def empty_sessionmaker():
+    """Sessionmaker bound to a new empty database"""
+    engine = create_engine(
+        SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    yield sessionmaker(class_=Session, autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def encrypted_database(tmp_path: Path) -> Path:
+    """Create a SQLCipher database file, encrypted with the configured key, with 5000 rows in table t"""
+    path = tmp_path / "source.db"
+    connection = sqlcipher_driver.connect(str(path))
+    for pragma in connection_pragmas(database_key()):
+        connection.execute(pragma)
+    connection.execute("CREATE TABLE t (x)")
+    connection.executemany("INSERT INTO t VALUES (?)", [(n,) for n in range(5000)])
+    connection.commit()
+    connection.close()
+    return path
+
+
 @pytest.fixture(scope="function")
 def session(engine: Engine):
     """Create a new database session with a rollback at the end of the test."""
@@ -128,6 +153,32 @@ def session(engine: Engine):
     connection.close()
 
 
+class QueryCounter:
+    """Records the SQL statements executed on an engine"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def reset(self):
+        self.statements.clear()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@pytest.fixture(scope="function")
+def query_counter(engine: Engine):
+    """Count the SQL statements executed on the test database"""
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
+
+
 @pytest.fixture(scope="function")
 def test_client(session: Session):
     """Create a test client
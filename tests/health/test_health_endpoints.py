@@ -0,0 +1,110 @@
+import csv
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, func, select
+
+from src.database import SCHEMA_VERSION, file_lock
+from src.health import router as health_router
+from src.health.models import SeedStatus
+from src.health.service import Seeder
+from src.ingest import CSV_COLUMNS
+from src.reviews.models import Review
+
+
+@pytest.fixture
+def client(test_client: TestClient, session: Session) -> TestClient:
+    """Test client without an API key, for a database with an up to date schema"""
+    session.connection().exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    del test_client.headers["X-API-Key"]
+    return test_client
+
+
+@pytest.fixture
+def seeder(tmp_path: Path, empty_sessionmaker: sessionmaker, monkeypatch: pytest.MonkeyPatch) -> Seeder:
+    path = tmp_path / "seed.csv"
+    with open(path, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerow(
+            ["Jane Doe", "Great", "5", "Loved it, would buy again", "jane@example.com", "UK", "2023-01-01"]
+        )
+    seeder = Seeder(
+        path=path,
+        rejects_path=tmp_path / "rejects.jsonl",
+        lock_path=tmp_path / "seed.lock",
+        session_factory=empty_sessionmaker,
+    )
+    monkeypatch.setattr(health_router, "seeder", seeder)
+    return seeder
+
+
+# GET /healthz
+def test_get_health(client: TestClient):
+    response = client.get("/healthz")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"status": "ok"}
+
+
+# GET /readyz
+def test_get_readiness(client: TestClient, seeder: Seeder):
+    response = client.get("/readyz")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["ready"] is True
+    assert data["database"] is True
+    assert data["schema_version"] == data["expected_schema_version"] == SCHEMA_VERSION
+    assert data["seed"]["status"] == SeedStatus.not_needed
+
+
+def test_get_readiness_old_schema(client: TestClient, session: Session, seeder: Seeder):
+    session.connection().exec_driver_sql("PRAGMA user_version = 0")
+    response = client.get("/readyz")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["schema_version"] == 0
+
+
+@pytest.mark.parametrize("seed_status", [SeedStatus.running, SeedStatus.failed])
+def test_get_readiness_seeding(client: TestClient, seeder: Seeder, seed_status: SeedStatus):
+    seeder.status = seed_status
+    response = client.get("/readyz")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["ready"] is False
+    assert response.json()["seed"]["status"] == seed_status
+
+
+def test_get_readiness_seeding_elsewhere(client: TestClient, seeder: Seeder):
+    # Another worker holds the seed lock while it seeds the database
+    with file_lock(seeder.lock_path):
+        response = client.get("/readyz")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["seed"]["status"] == SeedStatus.running
+
+    assert client.get("/readyz").status_code == status.HTTP_200_OK
+
+
+def test_health_checks_exempt_from_auth(client: TestClient):
+    assert client.get("/reviews").status_code == status.HTTP_403_FORBIDDEN
+
+
+# Seeding
+@pytest.mark.parametrize("background", [False, True])
+def test_seeder(seeder: Seeder, empty_sessionmaker: sessionmaker, background: bool):
+    seeder.start(background=background)
+    for _ in range(100):
+        if seeder.status != SeedStatus.running:
+            break
+        time.sleep(0.05)
+
+    assert seeder.status == SeedStatus.completed
+    response = seeder.response()
+    assert (response.progress, response.rows) == (1.0, 1)
+    with empty_sessionmaker() as session:
+        assert session.exec(select(func.count()).select_from(Review)).one() == 1
+    # The seed lock is released once the data has loaded
+    with file_lock(seeder.lock_path, blocking=False) as acquired:
+        assert acquired
@@ -0,0 +1,192 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import func, select
+
+from src.ingest import CSV_COLUMNS
+from src.ingestion import router as ingestion_router
+from src.ingestion.service import IngestManager, IngestQueueFull
+from src.reviews.models import Review
+
+ROUTE_URL = "/ingest"
+
+ROWS = [
+    ["Jane Doe", "Great Product", "5", "Loved it, would buy again", "jane@example.com", "UK", "2023-01-01"],
+    ["Jane Doe", "Good Product", "4", "Quite satisfied with it", "jane@example.com", "UK", "2023-01-02"],
+    ["John Doe", "Bad Rating", "9", "Rating is out of range", "john@example.com", "Spain", "2023-01-03"],
+    ["No Email", "Nice Product", "4", "Reviewer email is invalid", "invalid-email", "Spain", "2023-01-04"],
+]
+
+
+def csv_body(rows=ROWS) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+@pytest.fixture
+def ingest_manager(empty_sessionmaker: sessionmaker, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    manager = IngestManager(ingest_path=tmp_path / "ingest", session_factory=empty_sessionmaker)
+    monkeypatch.setattr(ingestion_router, "ingest_manager", manager)
+    return manager
+
+
+def wait_for_job(test_client: TestClient, job_id: str) -> dict:
+    for _ in range(100):
+        data = test_client.get(f"{ROUTE_URL}/{job_id}").json()
+        if data["status"] in ("completed", "failed"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError("Ingest job didn't finish")
+
+
+# POST /ingest
+def test_create_ingest_job(
+    test_client: TestClient, ingest_manager: IngestManager, empty_sessionmaker: sessionmaker
+):
+    body = csv_body()
+    response = test_client.post(ROUTE_URL, content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["bytes_total"] == len(body)
+
+    data = wait_for_job(test_client, response.json()["id"])
+    assert data["status"] == "completed"
+    assert data["progress"] == 1.0
+    assert data["rows"] == 4
+    assert data["rows_per_second"] > 0
+    assert (data["reviewers_loaded"], data["reviewers_skipped"]) == (2, 2)
+    assert (data["reviews_loaded"], data["reviews_skipped"]) == (2, 2)
+    assert data["rejected_rows"] == 2
+
+    with empty_sessionmaker() as session:
+        assert session.exec(select(func.count()).select_from(Review)).one() == 2
+    # The uploaded file is removed once it has been loaded, only the rejected rows are kept
+    assert [path.name for path in ingest_manager.ingest_path.iterdir()] == [f"{data['id']}.rejects.jsonl"]
+
+
+def test_create_ingest_job_compressed(test_client: TestClient, ingest_manager: IngestManager):
+    body = gzip.compress(csv_body())
+    response = test_client.post(ROUTE_URL, content=body, headers={"Content-Type": "application/gzip"})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    data = wait_for_job(test_client, response.json()["id"])
+    assert data["status"] == "completed"
+    assert (data["rows"], data["reviews_loaded"], data["bytes_read"]) == (4, 2, len(body))
+
+
+def test_create_ingest_job_invalid_file(test_client: TestClient, ingest_manager: IngestManager):
+    response = test_client.post(
+        ROUTE_URL, content=b"\xff\xfe not utf-8", headers={"Content-Type": "text/csv"}
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    data = wait_for_job(test_client, response.json()["id"])
+    assert data["status"] == "failed"
+    assert data["error"]
+
+
+def test_create_ingest_job_too_large(test_client: TestClient, ingest_manager: IngestManager):
+    ingest_manager.max_upload_size = 100
+
+    response = test_client.post(ROUTE_URL, content=csv_body(), headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert not ingest_manager.jobs
+    assert ingest_manager.queued == 0
+    assert not list(ingest_manager.ingest_path.iterdir())
+
+
+def test_create_ingest_job_queue_full(test_client: TestClient, ingest_manager: IngestManager):
+    ingest_manager.max_queued = 0
+
+    response = test_client.post(ROUTE_URL, content=csv_body(), headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "retry-after" in response.headers
+
+
+def test_create_ingest_job_queue_full_while_uploading(ingest_manager: IngestManager):
+    ingest_manager.max_queued = 1
+
+    async def run():
+        receiving, received = asyncio.Event(), asyncio.Event()
+
+        async def chunks():
+            receiving.set()
+            await received.wait()
+            yield csv_body()
+
+        # The first upload's place is taken while it is still being received
+        first = asyncio.create_task(ingest_manager.start(chunks()))
+        await receiving.wait()
+        with pytest.raises(IngestQueueFull):
+            await asyncio.wait_for(ingest_manager.start(chunks()), timeout=1)
+
+        received.set()
+        job = await first
+        while not job.finished_at:
+            await asyncio.sleep(0.01)
+        assert list(ingest_manager.jobs) == [job.id]
+        assert ingest_manager.queued == 0
+
+    asyncio.run(run())
+
+
+# GET /ingest/{job_id}/rejects
+def test_get_ingest_job_rejects(test_client: TestClient, ingest_manager: IngestManager):
+    response = test_client.post(ROUTE_URL, content=csv_body(), headers={"Content-Type": "text/csv"})
+    job_id = wait_for_job(test_client, response.json()["id"])["id"]
+
+    response = test_client.get(f"{ROUTE_URL}/{job_id}/rejects")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rejects = [json.loads(line) for line in response.text.splitlines()]
+    assert [(reject["row"], reject["entity"]) for reject in rejects] == [(2, "review"), (3, "reviewer")]
+
+
+def test_get_ingest_job_rejects_none(test_client: TestClient, ingest_manager: IngestManager):
+    response = test_client.post(ROUTE_URL, content=csv_body(ROWS[:2]), headers={"Content-Type": "text/csv"})
+    job_id = wait_for_job(test_client, response.json()["id"])["id"]
+
+    response = test_client.get(f"{ROUTE_URL}/{job_id}/rejects")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# GET /ingest/{job_id}
+def test_get_ingest_job_not_found(test_client: TestClient, ingest_manager: IngestManager):
+    response = test_client.get(f"{ROUTE_URL}/unknown")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_finished_jobs_evicted(test_client: TestClient, ingest_manager: IngestManager):
+    ingest_manager.max_finished_jobs = 1
+    job_ids = []
+    for _ in range(2):
+        response = test_client.post(ROUTE_URL, content=csv_body(), headers={"Content-Type": "text/csv"})
+        job_ids.append(wait_for_job(test_client, response.json()["id"])["id"])
+    first, second = (ingest_manager.ingest_path / f"{job_id}.rejects.jsonl" for job_id in job_ids)
+
+    # Only the most recently finished job is kept
+    assert test_client.get(f"{ROUTE_URL}/{job_ids[0]}").status_code == status.HTTP_404_NOT_FOUND
+    assert not first.exists()
+    assert test_client.get(f"{ROUTE_URL}/{job_ids[1]}").status_code == status.HTTP_200_OK
+    assert second.exists()
+
+    ingest_manager.job_ttl = timedelta(0)
+    assert test_client.get(f"{ROUTE_URL}/{job_ids[1]}").status_code == status.HTTP_404_NOT_FOUND
+    assert not second.exists()
+    assert ingest_manager.jobs == {}
@@ -6,6 +6,7 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session, func, select
 
 from src.reviewers.models import Reviewer, ReviewerCreate
+from src.reviews.models import Review
 
 from ..conftest import COUNTY_CODES, FIX_COUNTRY, FIXED_REVIEWER_EMAIL, REVIEWERS_COUNT
 
@@ -52,6 +53,48 @@ def test_get_reviewers_error(test_client: TestClient):
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
+def test_get_reviewers_filters(test_client: TestClient, session: Session):
+    reviewer = session.get(Reviewer, 2)
+
+    response = test_client.get(ROUTE_URL, params={"email": reviewer.email})
+    assert [data["id"] for data in response.json()] == [2]
+
+    response = test_client.get(ROUTE_URL, params={"name": reviewer.name, "id": "ne:2"})
+    assert all(data["name"] == reviewer.name and data["id"] != 2 for data in response.json())
+
+    response = test_client.get(ROUTE_URL, params={"id": ["gt:10", "lte:20"]})
+    assert [data["id"] for data in response.json()] == list(range(11, 21))
+
+
+def test_get_reviewers_country_in(test_client: TestClient, session: Session):
+    countries = session.exec(select(Reviewer.country).distinct().limit(3)).all()
+
+    response = test_client.get(ROUTE_URL, params={"country": f"in:{','.join(countries)}"})
+    assert response.status_code == status.HTTP_200_OK
+    expected_count = session.exec(select(func.count()).where(Reviewer.country.in_(countries))).one()
+    assert len(response.json()) == expected_count
+
+
+@pytest.mark.parametrize("sort", ["country", "-country", "email", "-id"])
+def test_get_reviewers_sort(test_client: TestClient, sort: str):
+    field = sort.removeprefix("-")
+    descending = sort.startswith("-")
+    all_reviewers = test_client.get(ROUTE_URL).json()
+    expected = sorted(
+        all_reviewers, key=lambda reviewer: (reviewer[field], reviewer["id"]), reverse=descending
+    )
+
+    response = test_client.get(ROUTE_URL, params={"sort": sort, "limit": 7})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected[:7]
+
+
+@pytest.mark.parametrize("params", [{"sort": "name"}, {"sort": "created_at"}, {"limit": 0}])
+def test_get_reviewers_sort_error(test_client: TestClient, params: dict):
+    response = test_client.get(ROUTE_URL, params=params)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 # POST /reviewers
 @pytest.mark.parametrize(
     "name, email, country",
@@ -93,6 +136,23 @@ def test_post_reviews_error(
     assert response.status_code == expected_status
 
 
+# POST /reviewers/batch-get
+def test_batch_get_reviewers(test_client: TestClient, reviewers_data: List[ReviewerCreate]):
+    missing_id = REVIEWERS_COUNT + 1
+    response = test_client.post(f"{ROUTE_URL}/batch-get", json={"ids": [3, 1, missing_id]})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert [reviewer["id"] for reviewer in data["reviewers"]] == [3, 1]
+    assert data["reviewers"][1]["email"] == reviewers_data[0].email
+    assert data["not_found"] == [missing_id]
+
+
+def test_batch_get_reviewers_error(test_client: TestClient):
+    response = test_client.post(f"{ROUTE_URL}/batch-get", json={"ids": []})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 # GET /reviewers/{id}
 def test_get_reviewer(test_client: TestClient, reviewers_data: List[ReviewerCreate]):
     id = 1
@@ -181,3 +241,154 @@ def test_delete_reviewer(test_client: TestClient, session: Session):
 def test_delete_reviewer_error(test_client: TestClient, id: int, expected_status: int):
     response = test_client.delete(f"{ROUTE_URL}/{id}")
     assert response.status_code == expected_status
+
+
+@pytest.fixture
+def reviewer_id(session: Session) -> int:
+    """Id of a reviewer who has reviews"""
+    return session.exec(select(Review.reviewer_id)).first()
+
+
+def test_delete_reviewer_cascade(test_client: TestClient, session: Session, reviewer_id: int):
+    reviews_count = test_client.get("/reviews/count").json()["count"]
+    reviewer_reviews = session.exec(
+        select(func.count(Review.id)).where(Review.reviewer_id == reviewer_id)
+    ).one()
+
+    response = test_client.delete(f"{ROUTE_URL}/{reviewer_id}", params={"cascade": True})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert session.get(Reviewer, reviewer_id) is None
+    assert session.exec(select(func.count(Review.id)).where(Review.reviewer_id == reviewer_id)).one() == 0
+
+    # Counts are kept consistent with the deleted reviews
+    assert test_client.get("/reviews/count").json()["count"] == reviews_count - reviewer_reviews
+    assert test_client.get("/reviews/count", params={"ReviewerId": reviewer_id}).json()["count"] == 0
+
+
+def test_delete_reviewer_cascade_query_count(test_client: TestClient, query_counter, reviewer_id: int):
+    # One statement for the reviews and one for the reviewer, however many reviews they have
+    query_counter.reset()
+    response = test_client.delete(f"{ROUTE_URL}/{reviewer_id}", params={"cascade": True})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert [statement.split()[:3] for statement in query_counter.statements[:2]] == [
+        ["DELETE", "FROM", "review"],
+        ["DELETE", "FROM", "reviewer"],
+    ]
+
+
+# POST /reviewers/bulk-delete
+def test_bulk_delete_reviewers(test_client: TestClient, session: Session):
+    missing_id = REVIEWERS_COUNT + 1
+    response = test_client.post(f"{ROUTE_URL}/bulk-delete", json={"ids": [10, 20, missing_id, 10]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": [10, 20], "not_found": [missing_id], "reviews_deleted": 0}
+    assert session.get(Reviewer, 10) is None
+
+
+def test_bulk_delete_reviewers_cascade(test_client: TestClient, session: Session):
+    reviews_count = session.exec(
+        select(func.count(Review.id)).where(Review.reviewer_id.in_([1, 2, 30]))
+    ).one()
+    response = test_client.post(f"{ROUTE_URL}/bulk-delete", json={"ids": [1, 2, 30], "cascade": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(response.json()["deleted"]) == [1, 2, 30]
+    assert response.json()["reviews_deleted"] == reviews_count
+    assert session.exec(select(func.count(Review.id)).where(Review.reviewer_id.in_([1, 2, 30]))).one() == 0
+
+
+def test_bulk_delete_reviewers_conflict(test_client: TestClient, session: Session, reviewer_id: int):
+    # One of the reviewers has reviews, so none of the reviewers are deleted
+    response = test_client.post(f"{ROUTE_URL}/bulk-delete", json={"ids": [10, reviewer_id]})
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert session.get(Reviewer, 10) is not None
+
+
+@pytest.mark.parametrize("body", [{"ids": []}, {"ids": list(range(1, 1002))}, {"ids": ["a"]}, {}])
+def test_bulk_delete_reviewers_error(test_client: TestClient, body: dict):
+    response = test_client.post(f"{ROUTE_URL}/bulk-delete", json=body)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+# GET /reviewers/count
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"country": FIX_COUNTRY},
+        {"country": f"in:{FIX_COUNTRY},GBR"},
+        {"country": f"ne:{FIX_COUNTRY}"},
+        {"id": "lte:5"},
+    ],
+)
+def test_get_reviewers_count(test_client: TestClient, params: dict):
+    expected_count = len(test_client.get(ROUTE_URL, params=params).json())
+
+    response = test_client.get(f"{ROUTE_URL}/count", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"count": expected_count}
+
+    response = test_client.get(ROUTE_URL, params={**params, "count": True})
+    assert response.headers["X-Total-Count"] == str(expected_count)
+
+
+# GET /reviewers?include=reviews
+def test_get_reviewers_include_reviews(test_client: TestClient, session: Session):
+    response = test_client.get(ROUTE_URL, params={"include": "reviews"})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert len(data) == REVIEWERS_COUNT
+    for reviewer in data:
+        review_ids = session.exec(
+            select(Review.id).where(Review.reviewer_id == reviewer["id"]).order_by(Review.id)
+        ).all()
+        assert [review["id"] for review in reviewer["reviews"]] == review_ids
+        assert all(review["reviewer_id"] == reviewer["id"] for review in reviewer["reviews"])
+
+
+@pytest.mark.parametrize("params", [{}, {"id": "lte:5"}])
+def test_get_reviewers_include_reviews_query_count(test_client: TestClient, query_counter, params: dict):
+    test_client.get(ROUTE_URL, params=params)
+    base_count = query_counter.count
+
+    query_counter.reset()
+    response = test_client.get(ROUTE_URL, params={**params, "include": "reviews"})
+    assert response.status_code == status.HTTP_200_OK
+    # Reviews are loaded with a single query, however many reviewers there are
+    assert query_counter.count == base_count + 1
+
+
+def test_get_reviewer_include_reviews(test_client: TestClient, session: Session):
+    id = 10
+    response = test_client.get(f"{ROUTE_URL}/{id}", params={"include": "reviews"})
+    assert response.status_code == status.HTTP_200_OK
+
+    # Reviewers with an id that is a multiple of 10 have no reviews
+    data = response.json()
+    assert data["id"] == id
+    assert data["reviews"] == []
+
+
+def test_get_reviewer_include_error(test_client: TestClient):
+    response = test_client.get(f"{ROUTE_URL}/1", params={"include": "reviewer"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+# Writes are a single statement
+@pytest.mark.parametrize(
+    "method, url, body, expected_status",
+    [
+        ("post", ROUTE_URL, {"name": "Jane Doe", "email": "jane.doe@example.com", "country": "GBR"}, 201),
+        ("patch", f"{ROUTE_URL}/1", {"name": "Jane Doe"}, 200),
+        ("patch", f"{ROUTE_URL}/999", {"name": "Jane Doe"}, 404),
+        ("delete", f"{ROUTE_URL}/999", None, 404),
+    ],
+)
+def test_write_query_count(
+    test_client: TestClient, query_counter, method: str, url: str, body: dict | None, expected_status: int
+):
+    response = test_client.request(method, url, json=body)
+    assert response.status_code == expected_status
+    assert query_counter.count == 1
+    statement_types = {"post": "INSERT", "patch": "UPDATE", "delete": "DELETE"}
+    assert query_counter.statements[0].split()[0] == statement_types[method]
@@ -1,5 +1,7 @@
+import csv
+import io
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 
 import emoji
 import pytest
@@ -7,6 +9,8 @@ from fastapi import status
 from fastapi.testclient import TestClient
 from sqlmodel import Session, func, select
 
+from src.ingest import CSV_COLUMNS
+from src.reviewers.models import Reviewer
 from src.reviews.models import Review, ReviewCreate
 from src.utils import OPERATOR_MAPPING
 
@@ -14,6 +18,21 @@ from ..conftest import REVIEWERS_COUNT, REVIEWS_COUNT
 
 ROUTE_URL = "/reviews"
 
+# Long enough that small edits leave it well above the similarity thresholds
+SPAM_CONTENT = (
+    "I ordered a new phone from this shop and it arrived two weeks late with a cracked screen and a missing charger. "
+    "Customer service took days to reply to my emails, then refused to refund me or send a replacement, and "
+    "eventually stopped answering altogether. I had to open a dispute with my bank to get my money back. "
+    "Save yourself the trouble and buy from somewhere else."
+)
+
+
+def create_review(test_client: TestClient, content: str) -> int:
+    body = {"reviewer_id": 5, "title": "Copied", "rating": 1, "content": content}
+    response = test_client.post(ROUTE_URL, json=body)
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()["id"]
+
 
 # GET /reviews
 def test_get_reviews(test_client: TestClient):
@@ -41,6 +60,48 @@ def test_get_reviews_auth_error(test_client: TestClient, api_key: str):
     assert data["detail"] == "Not authenticated"
 
 
+@pytest.mark.parametrize(
+    "sort, keys",
+    [
+        ("-created_at", [("created_at", True), ("id", True)]),
+        ("rating", [("rating", False), ("id", False)]),
+        ("-rating,created_at", [("rating", True), ("created_at", False), ("id", True)]),
+    ],
+)
+def test_get_reviews_sort(test_client: TestClient, sort: str, keys: List[Tuple[str, bool]]):
+    expected = test_client.get(ROUTE_URL).json()
+    # Sorting by each key, from the last to the first, leaves them sorted by all the keys
+    for field, descending in reversed(keys):
+        expected.sort(key=lambda review: review[field], reverse=descending)
+
+    response = test_client.get(ROUTE_URL, params={"sort": sort, "limit": 10})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected[:10]
+
+
+def test_get_reviews_limit(test_client: TestClient):
+    response = test_client.get(ROUTE_URL, params={"limit": 5, "count": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 5
+    # The total count is of all matching reviews
+    assert response.headers["X-Total-Count"] == str(REVIEWS_COUNT)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"sort": "title"},
+        {"sort": "-created_at,rating"},
+        {"sort": "updated_at"},
+        {"limit": 0},
+        {"limit": 1001},
+    ],
+)
+def test_get_reviews_sort_error(test_client: TestClient, params: dict):
+    response = test_client.get(ROUTE_URL, params=params)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 # TODO: Improve performance of this test and add more test cases
 @pytest.mark.parametrize(
     "rating_filter, date_filter, reviewer_id_filter",
@@ -111,6 +172,39 @@ def test_get_reviews_dynamic(
             assert matching_review.reviewer_id == reviewer_id_filter
 
 
+@pytest.mark.parametrize(
+    "params, predicate",
+    [
+        ({"rating": ["gte:2", "lte:4"]}, lambda r: 2 <= r.rating <= 4),
+        ({"rating": "in:1,5"}, lambda r: r.rating in (1, 5)),
+        (
+            {"ReviewerId": "in:1,2,3", "rating": "ne:3"},
+            lambda r: r.reviewer_id in (1, 2, 3) and r.rating != 3,
+        ),
+        (
+            {"date": ["gte:2024-03-01", "lt:2024-06-01"]},
+            lambda r: datetime(2024, 3, 1) <= r.created_at < datetime(2024, 6, 1),
+        ),
+        ({"id": "in:1,2,3"}, lambda r: r.id in (1, 2, 3)),
+    ],
+)
+def test_get_reviews_combined_filters(test_client: TestClient, session: Session, params: dict, predicate):
+    expected_ids = [review.id for review in session.exec(select(Review)).all() if predicate(review)]
+
+    response = test_client.get(ROUTE_URL, params=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(review["id"] for review in response.json()) == sorted(expected_ids)
+
+
+@pytest.mark.parametrize(
+    "params", [{"rating": "6"}, {"rating": "in:1,six"}, {"title": "gt:A"}, {"ReviewerId": "0"}]
+)
+def test_get_reviews_filter_error(test_client: TestClient, params: dict):
+    response = test_client.get(ROUTE_URL, params=params)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["query", next(iter(params))]
+
+
 # POST /reviews
 @pytest.mark.parametrize(
     "reviewer_id, title, rating, content",
@@ -151,6 +245,59 @@ def test_post_reviews_error(
     assert response.status_code == expected_status
 
 
+def test_post_reviews_check_duplicates(test_client: TestClient, session: Session):
+    original_id = create_review(test_client, SPAM_CONTENT)
+    body = {"reviewer_id": 5, "title": "Copied", "rating": 1, "content": f"{SPAM_CONTENT} Avoid!"}
+    response = test_client.post(ROUTE_URL, json=body, params={"check_duplicates": "true"})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    duplicates = response.json()["detail"]["duplicates"]
+    assert duplicates[0]["id"] == original_id
+    assert duplicates[0]["similarity"] >= 0.8
+    assert session.exec(select(func.count(Review.id))).first() == REVIEWS_COUNT + 1
+
+    # Without the check near-duplicates are still accepted
+    response = test_client.post(ROUTE_URL, json=body)
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def test_post_reviews_check_duplicates_unique(test_client: TestClient):
+    body = {
+        "reviewer_id": 5,
+        "title": "Original",
+        "rating": 4,
+        "content": "Nothing like any of the other reviews",
+    }
+    response = test_client.post(ROUTE_URL, json=body, params={"check_duplicates": "true"})
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+# POST /reviews/batch-get
+def test_batch_get_reviews(test_client: TestClient):
+    missing_id = REVIEWS_COUNT + 1
+    response = test_client.post(f"{ROUTE_URL}/batch-get", json={"ids": [5, missing_id, 2, 5]})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert [review["id"] for review in data["reviews"]] == [5, 2, 5]
+    assert data["not_found"] == [missing_id]
+    assert data["reviews"][0] == test_client.get(f"{ROUTE_URL}/5").json()
+
+
+def test_batch_get_reviews_query_count(test_client: TestClient, query_counter):
+    response = test_client.post(f"{ROUTE_URL}/batch-get", json={"ids": list(range(1, 1001))})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["reviews"]) == REVIEWS_COUNT
+    # One query for each chunk of ids
+    assert query_counter.count == 2
+
+
+@pytest.mark.parametrize("body", [{"ids": []}, {"ids": list(range(1, 1002))}, {"ids": ["a"]}, {}])
+def test_batch_get_reviews_error(test_client: TestClient, body: dict):
+    response = test_client.post(f"{ROUTE_URL}/batch-get", json=body)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 # GET /reviews/{id}
 def test_get_review(test_client: TestClient, reviews_data: List[ReviewCreate]):
     id = 1
@@ -215,6 +362,53 @@ def test_update_review_error(test_client: TestClient, id: int, body: dict, expec
     assert response.status_code == expected_status
 
 
+# GET /reviews/{id}/similar
+def test_get_similar_reviews(test_client: TestClient):
+    original_id = create_review(test_client, SPAM_CONTENT)
+    copies = [
+        create_review(test_client, f"{SPAM_CONTENT} {suffix}")
+        for suffix in ["Avoid!", "Avoid this shop at all costs, they never replied to my emails."]
+    ]
+
+    response = test_client.get(f"{ROUTE_URL}/{original_id}/similar")
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert [review["id"] for review in data] == copies
+    assert data[0]["similarity"] > data[1]["similarity"] >= 0.5
+    assert data[0]["content"] == f"{SPAM_CONTENT} Avoid!"
+
+    response = test_client.get(f"{ROUTE_URL}/{original_id}/similar", params={"threshold": 1, "limit": 1})
+    assert response.json() == []
+    response = test_client.get(f"{ROUTE_URL}/{copies[0]}/similar", params={"limit": 1})
+    assert [review["id"] for review in response.json()] == [original_id]
+
+
+def test_get_similar_reviews_after_update(test_client: TestClient):
+    original_id = create_review(test_client, SPAM_CONTENT)
+    response = test_client.patch(f"{ROUTE_URL}/2", json={"content": SPAM_CONTENT})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = test_client.get(f"{ROUTE_URL}/{original_id}/similar").json()
+    assert [(review["id"], review["similarity"]) for review in data] == [(2, 1.0)]
+
+    test_client.delete(f"{ROUTE_URL}/2")
+    assert test_client.get(f"{ROUTE_URL}/{original_id}/similar").json() == []
+
+
+@pytest.mark.parametrize(
+    "id, params, expected_status",
+    [
+        (REVIEWS_COUNT + 1, {}, status.HTTP_404_NOT_FOUND),
+        (1, {"threshold": 1.5}, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        (1, {"limit": 0}, status.HTTP_422_UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_get_similar_reviews_error(test_client: TestClient, id: int, params: dict, expected_status: int):
+    response = test_client.get(f"{ROUTE_URL}/{id}/similar", params=params)
+    assert response.status_code == expected_status
+
+
 # DELETE /reviews/{id}
 def test_delete_review(test_client: TestClient, session: Session):
     del_records = 4
@@ -231,3 +425,164 @@ def test_delete_review_error(test_client: TestClient):
     id = REVIEWS_COUNT + 1
     response = test_client.delete(f"{ROUTE_URL}/{id}")
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# GET /reviews/export
+def test_export_reviews(test_client: TestClient):
+    response = test_client.get(f"{ROUTE_URL}/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == REVIEWS_COUNT
+    assert list(rows[0].keys()) == CSV_COLUMNS
+
+
+def test_export_reviews_filtered(test_client: TestClient, session: Session):
+    expected_count = session.exec(select(func.count(Review.id)).where(Review.rating >= 4)).first()
+
+    response = test_client.get(f"{ROUTE_URL}/export", params={"rating": "gte:4"})
+    assert response.status_code == status.HTTP_200_OK
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == expected_count
+    assert all(int(row["Review Rating"]) >= 4 for row in rows)
+
+
+def test_export_reviews_parquet(test_client: TestClient):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    response = test_client.get(f"{ROUTE_URL}/export", params={"format": "parquet"})
+    assert response.status_code == status.HTTP_200_OK
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == REVIEWS_COUNT
+    assert table.column_names == CSV_COLUMNS
+
+
+# GET /reviews/count
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"rating": "3"},
+        {"rating": "eq:5"},
+        {"rating": "gte:4"},
+        {"rating": "lt:3"},
+        {"ReviewerId": 5},
+        {"date": "gte:2024-06-01"},
+        {"rating": "gt:2", "ReviewerId": 3},
+        {"rating": "lte:4", "date": "lt:2024-09-01"},
+        {"rating": ["gte:2", "lte:4"]},
+        {"rating": "in:1,5"},
+        {"rating": "ne:3"},
+        {"ReviewerId": "in:1,2,3"},
+    ],
+)
+def test_get_reviews_count(test_client: TestClient, params: dict):
+    expected_count = len(test_client.get(ROUTE_URL, params=params).json())
+
+    response = test_client.get(f"{ROUTE_URL}/count", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"count": expected_count}
+
+    response = test_client.get(ROUTE_URL, params={**params, "count": True})
+    assert response.headers["X-Total-Count"] == str(expected_count)
+
+
+def test_get_reviews_count_header_opt_in(test_client: TestClient):
+    response = test_client.get(ROUTE_URL)
+    assert "X-Total-Count" not in response.headers
+
+
+def test_get_reviews_count_error(test_client: TestClient):
+    response = test_client.get(f"{ROUTE_URL}/count", params={"rating": "6"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+# GET /reviews?include=reviewer
+def test_get_reviews_include_reviewer(test_client: TestClient, session: Session):
+    response = test_client.get(ROUTE_URL, params={"include": "reviewer"})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert len(data) == REVIEWS_COUNT
+    for review in data:
+        reviewer = session.get(Reviewer, review["reviewer_id"])
+        assert review["reviewer"] == {
+            "id": reviewer.id,
+            "name": reviewer.name,
+            "email": reviewer.email,
+            "country": reviewer.country,
+        }
+
+
+# A `ReviewerId` of None is filled in with a reviewer who has reviews, as the test data is random
+@pytest.mark.parametrize("params", [{}, {"rating": "5"}, {"ReviewerId": None}])
+def test_get_reviews_include_reviewer_query_count(
+    test_client: TestClient, session: Session, query_counter, params: dict
+):
+    if "ReviewerId" in params:
+        params = {"ReviewerId": session.exec(select(Review.reviewer_id)).first()}
+    query_counter.reset()
+    test_client.get(ROUTE_URL, params=params)
+    base_count = query_counter.count
+
+    query_counter.reset()
+    response = test_client.get(ROUTE_URL, params={**params, "include": "reviewer"})
+    assert response.status_code == status.HTTP_200_OK
+    # Reviewers are loaded with a single query, however many reviews there are
+    assert query_counter.count == base_count + 1
+
+
+def test_get_reviews_include_error(test_client: TestClient):
+    response = test_client.get(ROUTE_URL, params={"include": "reviews"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_review_include_reviewer(test_client: TestClient, session: Session):
+    response = test_client.get(f"{ROUTE_URL}/1", params={"include": "reviewer"})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()
+    assert data["id"] == 1
+    assert data["reviewer"]["id"] == data["reviewer_id"]
+    assert data["reviewer"]["email"] == session.get(Reviewer, data["reviewer_id"]).email
+
+
+def test_get_review_without_include(test_client: TestClient):
+    response = test_client.get(f"{ROUTE_URL}/1")
+    assert "reviewer" not in response.json()
+
+
+# Writes are a single statement
+@pytest.mark.parametrize(
+    "method, url, body, expected_status",
+    [
+        (
+            "post",
+            ROUTE_URL,
+            {"reviewer_id": 1, "title": "Great", "rating": 5, "content": "Really great!"},
+            201,
+        ),
+        ("patch", f"{ROUTE_URL}/1", {"rating": 2}, 200),
+        ("patch", f"{ROUTE_URL}/999", {"rating": 2}, 404),
+        ("delete", f"{ROUTE_URL}/1", None, 204),
+        ("delete", f"{ROUTE_URL}/999", None, 404),
+    ],
+)
+def test_write_query_count(
+    test_client: TestClient, query_counter, method: str, url: str, body: dict | None, expected_status: int
+):
+    response = test_client.request(method, url, json=body)
+    assert response.status_code == expected_status
+    assert query_counter.count == 1
+    statement_types = {"post": "INSERT", "patch": "UPDATE", "delete": "DELETE"}
+    assert query_counter.statements[0].split()[0] == statement_types[method]
+
+
+def test_update_review_empty_body(test_client: TestClient, session: Session):
+    response = test_client.patch(f"{ROUTE_URL}/1", json={})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == session.get(Review, 1).title
+    assert session.get(Review, 1).updated_at is None
@@ -0,0 +1,182 @@
+import asyncio
+from typing import List, Tuple
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from src.admission import AdmissionMiddleware, ConcurrencyLimit, RequestClass, classify, route_path
+from src.metrics import MetricsRegistry
+from src.responses import MSGPACK_MEDIA_TYPE
+
+
+@pytest.mark.parametrize(
+    "path, root_path, expected",
+    [
+        ("/reviews/", "", "/reviews"),
+        ("/api/v1/reviews/", "/api/v1", "/reviews"),
+        ("/api/v1/reviews/1", "/api/v1", "/reviews/1"),
+        ("/", "", "/"),
+    ],
+)
+def test_route_path(path: str, root_path: str, expected: str):
+    assert route_path({"path": path, "root_path": root_path}) == expected
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/reviews", RequestClass.heavy),
+        ("GET", "/reviews/export", RequestClass.heavy),
+        ("GET", "/reviews/1", RequestClass.read),
+        ("GET", "/reviewers", RequestClass.read),
+        ("POST", "/reviews", RequestClass.write),
+        ("DELETE", "/reviewers/1", RequestClass.write),
+    ],
+)
+def test_classify(method: str, path: str, expected: RequestClass):
+    assert classify(method, path) == expected
+
+
+def test_limit_queues_then_rejects():
+    async def run():
+        limit = ConcurrencyLimit(limit=1, queue_size=1, queue_timeout=1.0)
+        assert await limit.acquire()
+
+        waiting = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        # Queue is full
+        assert not await limit.acquire()
+
+        limit.release()
+        assert await waiting
+        assert limit.active == 1
+        limit.release()
+        assert limit.active == 0
+
+    asyncio.run(run())
+
+
+def test_limit_queue_timeout():
+    async def run():
+        limit = ConcurrencyLimit(limit=1, queue_size=1, queue_timeout=0.01)
+        assert await limit.acquire()
+        assert not await limit.acquire()
+        assert limit.queued == 0
+        limit.release()
+        assert await limit.acquire()
+
+    asyncio.run(run())
+
+
+def test_limit_slot_handed_over_as_wait_times_out(monkeypatch: pytest.MonkeyPatch):
+    limit = ConcurrencyLimit(limit=1, queue_size=1, queue_timeout=1.0)
+
+    async def wait_for(waiter: asyncio.Future, timeout: float):
+        # The slot is released to the waiter and the wait times out together
+        limit.release()
+        raise asyncio.TimeoutError
+
+    async def run():
+        assert await limit.acquire()
+        monkeypatch.setattr(asyncio, "wait_for", wait_for)
+        assert await limit.acquire()
+        monkeypatch.undo()
+        assert limit.queued == 0
+        assert limit.active == 1
+        limit.release()
+        assert limit.active == 0
+
+    asyncio.run(run())
+
+
+def test_limit_cancelled_waiter():
+    async def run():
+        limit = ConcurrencyLimit(limit=1, queue_size=2, queue_timeout=1.0)
+        assert await limit.acquire()
+        waiting = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limit.queued == 0
+        limit.release()
+        assert limit.active == 0
+
+    asyncio.run(run())
+
+
+def test_middleware_sheds_load():
+    async def run():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        registry = MetricsRegistry()
+        middleware = AdmissionMiddleware(
+            app,
+            limits={
+                RequestClass.read: ConcurrencyLimit(10, 10, 1.0),
+                RequestClass.write: ConcurrencyLimit(10, 10, 1.0),
+                RequestClass.heavy: ConcurrencyLimit(1, 1, 1.0),
+            },
+            retry_after=5,
+            metrics=registry,
+        )
+
+        async def request(
+            method: str, path: str, headers: Tuple[Tuple[bytes, bytes], ...] = ()
+        ) -> List[dict]:
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                "type": "http",
+                "method": method,
+                "path": path,
+                "root_path": "",
+                "headers": list(headers),
+            }
+            await middleware(scope, None, send)
+            return messages
+
+        running = asyncio.create_task(request("GET", "/reviews"))
+        queued = asyncio.create_task(request("GET", "/reviews"))
+        await asyncio.sleep(0)
+        rejected = await request("GET", "/reviews/")
+        assert rejected[0]["status"] == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert (b"retry-after", b"5") in rejected[0]["headers"]
+        assert (b"content-type", b"application/json") in rejected[0]["headers"]
+        rejected = await request("GET", "/reviews", headers=((b"accept", MSGPACK_MEDIA_TYPE.encode()),))
+        assert (b"content-type", MSGPACK_MEDIA_TYPE.encode()) in rejected[0]["headers"]
+
+        # Other classes have their own budget
+        assert registry.snapshot()["admission.heavy.queued"] == 1
+        read = asyncio.create_task(request("GET", "/reviews/1"))
+        await asyncio.sleep(0)
+        assert registry.snapshot()["admission.read.active"] == 1
+
+        release.set()
+        for task in (running, queued, read):
+            assert (await task)[0]["status"] == status.HTTP_200_OK
+
+        snapshot = registry.snapshot()
+        assert snapshot["admission.heavy.admitted"] == 2
+        assert snapshot["admission.heavy.rejected"] == 2
+        assert snapshot["admission.heavy.active"] == 0
+        assert snapshot["admission.read.admitted"] == 1
+
+    asyncio.run(run())
+
+
+def test_admission_metrics(test_client: TestClient):
+    assert test_client.get("/reviews").status_code == status.HTTP_200_OK
+    response = test_client.get("/admin/metrics", headers={"X-Admin-API-Key": "admin-test-key"})
+    assert response.json()["admission.heavy.limit"] >= 1
+    assert response.json()["admission.heavy.admitted"] >= 1
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import pytest
+
+from src.backup import backup_database
+from src.database import connection_pragmas, database_key, sqlcipher_driver
+
+
+def count_rows(path: Path, key: str) -> int:
+    connection = sqlcipher_driver.connect(str(path))
+    try:
+        for pragma in connection_pragmas(key)[:3]:
+            connection.execute(pragma)
+        return connection.execute("SELECT count(*) FROM t").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_database(encrypted_database: Path, tmp_path: Path):
+    destination = tmp_path / "backup.db"
+    steps = []
+
+    backup_database(
+        destination, source=encrypted_database, pages=5, sleep=0, progress=lambda *step: steps.append(step)
+    )
+
+    assert count_rows(destination, database_key()) == 5000
+    # Copied in several steps, ending with no pages remaining
+    assert len(steps) > 1
+    assert steps[-1][0] == 0
+    assert not (tmp_path / "backup.db.partial").exists()
+
+
+def test_backup_is_encrypted(encrypted_database: Path, tmp_path: Path):
+    destination = tmp_path / "backup.db"
+    backup_database(destination, source=encrypted_database, sleep=0)
+
+    with pytest.raises(sqlcipher_driver.DatabaseError):
+        count_rows(destination, "not-the-key")
+
+
+def test_backup_does_not_overwrite(encrypted_database: Path, tmp_path: Path):
+    destination = tmp_path / "backup.db"
+    destination.write_bytes(b"existing")
+
+    with pytest.raises(FileExistsError):
+        backup_database(destination, source=encrypted_database, sleep=0)
+
+    assert destination.read_bytes() == b"existing"
+
+
+def test_backup_failure_leaves_no_file(encrypted_database: Path, tmp_path: Path):
+    destination = tmp_path / "backup.db"
+
+    with pytest.raises(sqlcipher_driver.DatabaseError):
+        backup_database(destination, source=encrypted_database, key="not-the-key", sleep=0)
+
+    assert not destination.exists()
+    assert not (tmp_path / "backup.db.partial").exists()
+
+
+def test_backup_restarted_by_writes(encrypted_database: Path, tmp_path: Path):
+    destination = tmp_path / "backup.db"
+    writer = sqlcipher_driver.connect(str(encrypted_database))
+    for pragma in connection_pragmas(database_key()):
+        writer.execute(pragma)
+    steps = []
+
+    def write_between_steps(remaining: int, total: int, restarts: int):
+        steps.append((remaining, total, restarts))
+        writer.execute("INSERT INTO t VALUES (0)")
+        writer.commit()
+
+    try:
+        restarts = backup_database(
+            destination,
+            source=encrypted_database,
+            pages=5,
+            sleep=0,
+            progress=write_between_steps,
+            max_restarts=3,
+        )
+    finally:
+        writer.close()
+
+    # Each write restarted the paced backup, until the rest was copied in one step
+    assert restarts == 4
+    assert steps[-1] == (0, steps[-1][1], 4)
+    assert count_rows(destination, database_key()) >= 5000
@@ -0,0 +1,144 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlmodel import Session
+
+from src.coalescing import SingleFlight, database_version, read_flights
+from src.database import sqlcipher_driver
+from src.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def flights() -> SingleFlight:
+    return SingleFlight("test", metrics=MetricsRegistry())
+
+
+def wait_for_followers(flights: SingleFlight, count: int):
+    while flights.metrics.get("coalescing.test.shared") < count:
+        threading.Event().wait(0.001)
+
+
+def test_single_flight_shares_call(flights: SingleFlight):
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flights.do, "key", call)
+        while not calls:
+            threading.Event().wait(0.001)
+        followers = [executor.submit(flights.do, "key", call) for _ in range(4)]
+        wait_for_followers(flights, 4)
+        release.set()
+        results = {id(future.result()) for future in [leader, *followers]}
+
+    assert len(calls) == 1
+    assert len(results) == 1
+    assert flights.collect() == {"coalescing.test.ratio": 0.8}
+
+
+def test_single_flight_different_keys(flights: SingleFlight):
+    assert flights.do("a", lambda: 1) == 1
+    assert flights.do("b", lambda: 2) == 2
+    assert flights.metrics.get("coalescing.test.executed") == 2
+
+
+def test_single_flight_shares_errors(flights: SingleFlight):
+    release = threading.Event()
+
+    def call():
+        release.wait()
+        raise ValueError("Failed")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flights.do, "key", call)
+        while not flights.metrics.get("coalescing.test.executed"):
+            threading.Event().wait(0.001)
+        follower = executor.submit(flights.do, "key", call)
+        wait_for_followers(flights, 1)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    # Failed calls aren't kept, so the next call runs again
+    assert flights.do("key", lambda: 1) == 1
+
+
+def test_single_flight_invalidate(flights: SingleFlight):
+    release = threading.Event()
+
+    def slow_call():
+        release.wait()
+        return "before"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = executor.submit(flights.do, "key", slow_call)
+        while not flights.metrics.get("coalescing.test.executed"):
+            threading.Event().wait(0.001)
+        # After a write commits, calls don't share the result of a call that started before it
+        flights.invalidate()
+        assert flights.do("key", lambda: "after") == "after"
+        release.set()
+        assert before.result() == "before"
+
+
+def test_single_flight_version():
+    release = threading.Event()
+    version = [1]
+    flights = SingleFlight("test", metrics=MetricsRegistry(), version=lambda: version[0])
+
+    def slow_call():
+        release.wait()
+        return "before"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = executor.submit(flights.do, "key", slow_call)
+        while not flights.metrics.get("coalescing.test.executed"):
+            threading.Event().wait(0.001)
+        # Another worker committed a write, which this worker only sees through the version
+        version[0] = 2
+        assert flights.do("key", lambda: "after") == "after"
+        release.set()
+        assert before.result() == "before"
+
+
+def test_database_version(tmp_path: Path):
+    database = tmp_path / "coalescing.db"
+    assert database_version(database) == (0, 0)
+
+    engine = create_engine(f"sqlite:///{database}", module=sqlcipher_driver)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x)"))
+    version = database_version(database)
+    # A commit through another engine, as another worker would make
+    other_engine = create_engine(f"sqlite:///{database}", module=sqlcipher_driver)
+    with other_engine.begin() as connection:
+        connection.execute(text("INSERT INTO t VALUES (1)"))
+    assert database_version(database) != version
+    other_engine.dispose()
+    engine.dispose()
+
+
+def test_commit_invalidates_reads(session: Session):
+    generation = read_flights.generation
+    session.commit()
+    assert read_flights.generation == generation + 1
+
+
+def test_read_after_write(test_client: TestClient):
+    rating = 1 if test_client.get("/reviews/1").json()["rating"] != 1 else 2
+    response = test_client.patch("/reviews/1", json={"rating": rating})
+    assert response.status_code == status.HTTP_200_OK
+
+    assert test_client.get("/reviews/1").json()["rating"] == rating
+    assert test_client.get("/reviews", params={"id": "1"}).json()[0]["rating"] == rating
@@ -0,0 +1,56 @@
+import gzip
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from src.compression import select_encoding
+from src.config import COMPRESSION_MINIMUM_SIZE
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected_encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "gzip"),
+        ("gzip;q=1.0, zstd;q=0.5", "gzip"),
+        ("gzip;q=0, *", "zstd"),
+        ("gzip;q=0", None),
+    ],
+)
+def test_select_encoding(accept_encoding: str, expected_encoding: str | None):
+    pytest.importorskip("zstandard")
+    assert select_encoding(accept_encoding) == expected_encoding
+
+
+def test_gzip_response(test_client: TestClient):
+    response = test_client.get("/reviews", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert isinstance(response.json(), list)
+
+
+def test_zstd_response(test_client: TestClient):
+    pytest.importorskip("zstandard")
+    response = test_client.get("/reviews", headers={"Accept-Encoding": "zstd, gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "zstd"
+    assert isinstance(response.json(), list)
+
+
+def test_small_response_not_compressed(test_client: TestClient):
+    response = test_client.get("/reviewers/1", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.content) < COMPRESSION_MINIMUM_SIZE
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_compressed(test_client: TestClient):
+    with test_client.stream("GET", "/reviews/export", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        body = gzip.decompress(b"".join(response.iter_raw()))
+    assert body.decode("utf-8").startswith("Reviewer Name,")
@@ -0,0 +1,92 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from src.counters import Counter, get_count, rebuild_counters
+from src.reviewers.models import Reviewer
+from src.reviewers.service import delete_reviewers
+from src.reviews.models import Review
+
+from .conftest import QueryCounter
+
+# Reviews written by one reviewer for the large cascade delete
+LARGE_CASCADE_REVIEWS = 2000
+
+
+def actual_counters(session: Session) -> dict:
+    """Calculate what every counter should be from the counted tables"""
+    counters = {
+        ("reviewer", ""): session.exec(select(func.count(Reviewer.id))).one(),
+        ("review", ""): session.exec(select(func.count(Review.id))).one(),
+    }
+    for country, count in session.exec(select(Reviewer.country, func.count()).group_by(Reviewer.country)):
+        counters[("reviewer.country", country)] = count
+    for rating, count in session.exec(select(Review.rating, func.count()).group_by(Review.rating)):
+        counters[("review.rating", str(rating))] = count
+    for reviewer_id, count in session.exec(
+        select(Review.reviewer_id, func.count()).group_by(Review.reviewer_id)
+    ):
+        counters[("review.reviewer_id", str(reviewer_id))] = count
+    return counters
+
+
+def stored_counters(session: Session) -> dict:
+    """Fetch all non zero counters"""
+    return {
+        (counter.name, counter.key): counter.value
+        for counter in session.exec(select(Counter).where(Counter.value != 0)).all()
+    }
+
+
+def test_counters_after_load(session: Session):
+    assert stored_counters(session) == actual_counters(session)
+
+
+def test_counters_after_writes(test_client: TestClient, session: Session):
+    response = test_client.post(
+        "/reviewers", json={"name": "John Diggle", "email": "spartan@arrow.com", "country": "USA"}
+    )
+    reviewer_id = response.json()["id"]
+    test_client.patch("/reviewers/1", json={"country": "GRL"})
+    test_client.post(
+        "/reviews",
+        json={"reviewer_id": reviewer_id, "title": "Solid", "rating": 4, "content": "Dependable and strong"},
+    )
+    test_client.patch("/reviews/1", json={"rating": 1})
+    test_client.patch("/reviews/2", json={"title": "No change to counts"})
+    test_client.delete("/reviews/3")
+    test_client.delete("/reviewers/10")
+
+    assert stored_counters(session) == actual_counters(session)
+
+
+def test_rebuild_counters(session: Session):
+    expected = actual_counters(session)
+    session.exec(Counter.__table__.delete())
+    assert get_count(session, Review.__table__) == 0
+
+    rebuild_counters(session.connection())
+
+    assert stored_counters(session) == expected
+
+
+def test_counters_after_large_cascade(session: Session, query_counter: QueryCounter):
+    session.add_all(
+        Review(reviewer_id=1, title="Bulk", rating=i % 5 + 1, content=f"Bulk loaded review {i}")
+        for i in range(LARGE_CASCADE_REVIEWS)
+    )
+    session.flush()
+    reviews = get_count(session, Review.__table__, Review.__table__.c.reviewer_id, 1)
+    assert reviews >= LARGE_CASCADE_REVIEWS
+
+    # The counter triggers run for every deleted review, but the delete is still a fixed number of statements
+    query_counter.reset()
+    assert delete_reviewers(session, [1], cascade=True) == ([1], reviews)
+    assert [statement.split()[:3] for statement in query_counter.statements] == [
+        ["DELETE", "FROM", "review"],
+        ["DELETE", "FROM", "reviewer"],
+        ["DELETE", "FROM", "counter"],
+    ]
+    assert stored_counters(session) == actual_counters(session)
+    assert not session.exec(
+        select(Counter).where(Counter.name == "review.reviewer_id", Counter.key == "1")
+    ).all()
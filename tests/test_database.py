@@ -0,0 +1,167 @@
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from src import database
+from src.database import (
+    LEGACY_KEY,
+    connection_pragmas,
+    database_key,
+    derive_raw_key,
+    get_schema_version,
+    migrate_database,
+    rekey_database,
+    sqlcipher_driver,
+    startup_lock,
+    warm_pool,
+)
+
+
+@pytest.fixture
+def applied(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    """Versions migrated to, with migrations that only record their version instead of the registered ones"""
+    applied = []
+    monkeypatch.setattr(
+        database,
+        "MIGRATIONS",
+        {version: lambda connection, version=version: applied.append(version) for version in (1, 2, 3)},
+    )
+    return applied
+
+
+def create_encrypted_database(path: Path, key: str):
+    connection = sqlcipher_driver.connect(str(path))
+    for pragma in connection_pragmas(key):
+        connection.execute(pragma)
+    connection.execute("CREATE TABLE t (x)")
+    connection.execute("INSERT INTO t VALUES (42)")
+    connection.commit()
+    connection.close()
+
+
+def read_encrypted_database(path: Path, key: str):
+    connection = sqlcipher_driver.connect(str(path))
+    try:
+        for pragma in connection_pragmas(key):
+            connection.execute(pragma)
+        return connection.execute("SELECT x FROM t").fetchall()
+    finally:
+        connection.close()
+
+
+def test_derive_raw_key():
+    key = derive_raw_key("passphrase", "salt", iterations=1000)
+    assert len(key) == 64
+    assert key == derive_raw_key("passphrase", "salt", iterations=1000)
+    assert key != derive_raw_key("passphrase", "pepper", iterations=1000)
+
+
+def test_connection_pragmas():
+    pragmas = connection_pragmas("it's a secret", kdf_iter=1000, cipher_page_size=8192, cache_size=-4000)
+    assert pragmas[0] == "PRAGMA key = 'it''s a secret'"
+    assert "PRAGMA kdf_iter = 1000" in pragmas
+    assert "PRAGMA cipher_page_size = 8192" in pragmas
+    assert "PRAGMA cache_size = -4000" in pragmas
+
+
+def test_raw_key(tmp_path: Path):
+    key = f"x'{derive_raw_key('passphrase', 'salt', iterations=1000)}'"
+    create_encrypted_database(tmp_path / "raw.db", key)
+    assert read_encrypted_database(tmp_path / "raw.db", key) == [(42,)]
+
+
+def test_rekey_legacy_database(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "legacy.db"
+    create_encrypted_database(path, LEGACY_KEY)
+    monkeypatch.setattr(database, "DATABASE", path)
+
+    rekey_database()
+
+    assert read_encrypted_database(path, database_key()) == [(42,)]
+    with pytest.raises(sqlcipher_driver.DatabaseError):
+        read_encrypted_database(path, LEGACY_KEY)
+
+
+def test_warm_pool(tmp_path: Path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", module=sqlcipher_driver, poolclass=QueuePool, pool_size=3
+    )
+    warm_pool(engine)
+    assert engine.pool.checkedin() == 3
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+    assert engine.pool.checkedin() == 3
+
+
+def test_startup_lock(tmp_path: Path):
+    acquired = threading.Event()
+
+    def acquire():
+        with startup_lock(tmp_path / "startup.lock"):
+            acquired.set()
+
+    with startup_lock(tmp_path / "startup.lock"):
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        assert not acquired.wait(timeout=0.2)
+
+    thread.join(timeout=5)
+    assert acquired.is_set()
+
+
+def test_migrate_database(tmp_path: Path, applied: List[int]):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}", module=sqlcipher_driver)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 1")
+
+    assert migrate_database(engine, version=3) == 3
+    assert applied == [2, 3]
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 3
+
+    # Already up to date
+    assert migrate_database(engine, version=3) == 3
+    assert applied == [2, 3]
+    engine.dispose()
+
+
+def test_migrate_database_missing_migration(tmp_path: Path, applied: List[int]):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}", module=sqlcipher_driver)
+    del database.MIGRATIONS[3]
+
+    # Left at the last version that could be migrated to, so it is reported as not ready
+    assert migrate_database(engine, version=4) == 2
+    assert applied == [1, 2]
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 2
+    engine.dispose()
+
+
+def test_migrate_database_newer_schema(tmp_path: Path, applied: List[int]):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}", module=sqlcipher_driver)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 5")
+
+    assert migrate_database(engine, version=3) == 5
+    assert applied == []
+    engine.dispose()
+
+
+def test_failed_migration_keeps_version(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    def fail(connection):
+        connection.exec_driver_sql("CREATE TABLE added (x)")
+        raise RuntimeError("Migration failed")
+
+    monkeypatch.setattr(database, "MIGRATIONS", {1: fail})
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}", module=sqlcipher_driver)
+    with pytest.raises(RuntimeError):
+        migrate_database(engine, version=1)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 0
+        assert not connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE name = 'added'").all()
+    engine.dispose()
@@ -0,0 +1,61 @@
+import csv
+
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, func, select
+
+from src import ingest
+from src.export import ExportFormat, main, stream_csv
+from src.ingest import load_database_from_csv
+from src.reviewers.models import Reviewer
+from src.reviews.dependencies import ReviewFilterSet
+from src.reviews.models import Review
+from src.utils import demojize_str
+
+from .conftest import REVIEWS_COUNT
+
+
+def test_stream_csv_batches(session: Session):
+    chunks = list(stream_csv(session, ReviewFilterSet(), batch_size=50))
+
+    # Header and first batch, two more batches and a final empty flush
+    assert len(chunks) == 4
+    rows = list(csv.reader("".join(chunks).splitlines()))
+    assert len(rows) == REVIEWS_COUNT + 1
+
+
+def test_export_round_trip(session: Session, empty_sessionmaker: sessionmaker, monkeypatch, tmp_path):
+    export_file = tmp_path / "reviews.csv"
+    with open(export_file, mode="w", encoding="utf-8", newline="") as csv_file:
+        for chunk in stream_csv(session, ReviewFilterSet()):
+            csv_file.write(chunk)
+
+    monkeypatch.setattr(ingest, "SessionLocal", empty_sessionmaker)
+    load_database_from_csv(export_file)
+
+    exported = session.exec(
+        select(Reviewer.email, Review.title, Review.rating, Review.content).join(Reviewer).order_by(Review.id)
+    ).all()
+    with empty_sessionmaker() as loaded_session:
+        loaded = loaded_session.exec(
+            select(Reviewer.email, Review.title, Review.rating, Review.content)
+            .join(Reviewer)
+            .order_by(Review.id)
+        ).all()
+        loaded_reviewers = loaded_session.exec(select(func.count(Reviewer.id))).first()
+
+    # Ingest demojizes content again, which picks up any emoji characters left over from the first pass
+    assert loaded == [
+        (email, title, rating, demojize_str(content)) for email, title, rating, content in exported
+    ]
+    assert loaded_reviewers == len({email for email, *_ in exported})
+
+
+def test_export_cli(session: Session, monkeypatch, tmp_path):
+    export_file = tmp_path / "reviews.csv"
+    monkeypatch.setattr("src.export.SessionLocal", lambda: session)
+
+    main(["--output", str(export_file), "--format", ExportFormat.csv.value, "--reviewer-id", "5"])
+
+    expected_count = session.exec(select(func.count(Review.id)).where(Review.reviewer_id == 5)).first()
+    with open(export_file, mode="r", encoding="utf-8") as csv_file:
+        assert len(list(csv.DictReader(csv_file))) == expected_count
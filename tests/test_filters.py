@@ -0,0 +1,130 @@
+from datetime import date, datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from src.filters import Condition, FilterError
+from src.reviewers.dependencies import ReviewerFilterSet
+from src.reviews.dependencies import ReviewFilterSet
+from src.reviews.models import Review
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("5", Condition("rating", "eq", 5)),
+        ("eq:5", Condition("rating", "eq", 5)),
+        ("gte:2", Condition("rating", "gte", 2)),
+        ("ne:3", Condition("rating", "ne", 3)),
+        ("in:1,2,5", Condition("rating", "in", (1, 2, 5))),
+    ],
+)
+def test_parse_value(raw: str, expected: Condition):
+    assert ReviewFilterSet.parse_value("rating", raw) == expected
+
+
+def test_parse_value_keeps_colons():
+    condition = ReviewFilterSet.parse_value("title", "Re: Great service")
+    assert condition == Condition("title", "eq", "Re: Great service")
+
+
+def test_parse_date():
+    condition = ReviewFilterSet.parse_value("date", "lt:2024-06-01")
+    assert condition == Condition("date", "lt", date(2024, 6, 1))
+
+
+def test_parse_datetime_to_utc():
+    condition = ReviewFilterSet.parse_value("updated_at", "gt:2024-06-01T12:00:00+02:00")
+    assert condition == Condition("updated_at", "gt", datetime(2024, 6, 1, 10, 0))
+
+
+@pytest.mark.parametrize(
+    "name, raw",
+    [
+        ("rating", "6"),
+        ("rating", "in:1,six"),
+        ("rating", "like:5"),
+        ("title", "gt:A"),
+        ("date", "2024-13-01"),
+        ("date", "in:2024-06-01,2024-06-02"),
+    ],
+)
+def test_parse_value_error(name: str, raw: str):
+    with pytest.raises(FilterError):
+        ReviewFilterSet.parse_value(name, raw)
+
+
+def test_filter_shape():
+    filters = ReviewFilterSet.parse({"rating": ["lte:4", "gte:2"], "reviewer_id": ["3"]})
+    same_shape = ReviewFilterSet.parse({"reviewer_id": ["7"], "rating": ["gte:1", "lte:5"]})
+
+    assert filters.shape == (("rating", "gte"), ("rating", "lte"), ("reviewer_id", "eq"))
+    assert filters.shape == same_shape.shape
+    assert filters.params != same_shape.params
+    assert filters.statement() is same_shape.statement()
+    assert filters.count_statement() is same_shape.count_statement()
+
+
+def test_statement_matches_clauses(session: Session):
+    filters = ReviewFilterSet.parse({"rating": ["gte:2", "lte:4"], "reviewer_id": ["in:1,2,3,4,5,6"]})
+
+    cached = session.exec(filters.statement(), params=filters.params).all()
+    expected = session.exec(select(Review).where(*filters.clauses)).all()
+
+    assert cached == expected
+    assert all(2 <= review.rating <= 4 and review.reviewer_id <= 6 for review in cached)
+
+
+def test_in_filter_any_length(session: Session):
+    for ids in (["1"], ["1", "2", "3"], [str(n) for n in range(1, 50)]):
+        filters = ReviewerFilterSet.parse({"id": [f"in:{','.join(ids)}"]})
+        reviewers = session.exec(filters.statement(), params=filters.params).all()
+        assert sorted(reviewer.id for reviewer in reviewers) == [int(n) for n in ids]
+
+
+@pytest.mark.parametrize(
+    "raw, expected_times",
+    [
+        ("2030-06-01", ["start", "afternoon", "end"]),
+        ("eq:2030-06-01", ["start", "afternoon", "end"]),
+        ("ne:2030-06-01", ["day before", "next day"]),
+        ("gt:2030-06-01", ["next day"]),
+        ("gte:2030-06-01", ["start", "afternoon", "end", "next day"]),
+        ("lt:2030-06-01", ["day before"]),
+        ("lte:2030-06-01", ["day before", "start", "afternoon", "end"]),
+    ],
+)
+def test_day_filter(session: Session, raw: str, expected_times: list):
+    times = {
+        "day before": datetime(2030, 5, 31, 23, 59, 59, 999999),
+        "start": datetime(2030, 6, 1),
+        "afternoon": datetime(2030, 6, 1, 15, 30),
+        "end": datetime(2030, 6, 1, 23, 59, 59, 999999),
+        "next day": datetime(2030, 6, 2),
+    }
+    reviews = {
+        name: Review(
+            reviewer_id=1, title="Timing", rating=3, content="Reviewed at a set time", created_at=created_at
+        )
+        for name, created_at in times.items()
+    }
+    session.add_all(reviews.values())
+    session.flush()
+
+    filters = ReviewFilterSet.parse({"date": [raw], "title": ["Timing"]})
+    matched = session.exec(filters.statement(), params=filters.params).all()
+
+    assert sorted(review.id for review in matched) == sorted(reviews[name].id for name in expected_times)
+
+
+@pytest.mark.parametrize("raw", ["2024-06-01", "gt:2024-06-01", "lte:2024-06-01"])
+def test_day_filter_uses_index(session: Session, raw: str):
+    filters = ReviewFilterSet.parse({"date": [raw]})
+    compiled = filters.statement().compile(dialect=session.bind.dialect)
+    params = compiled.construct_params(filters.params)
+    values = tuple(str(params[name]) for name in compiled.positiontup)
+
+    plan = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", values).all()
+
+    details = " ".join(row[-1] for row in plan)
+    assert "USING INDEX ix_review_created_at" in details
@@ -1,15 +1,204 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+import uuid
+from pathlib import Path
 from typing import Tuple
 
 import pytest
-from sqlmodel import Session
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, select
 
-from src.ingest import load_row
+from src.ingest import (
+    CSV_COLUMNS,
+    Compression,
+    IngestSource,
+    RateLimitedLog,
+    RejectSink,
+    SourceError,
+    SourceFormat,
+    load_database,
+    load_database_from_csv,
+    load_row,
+)
+from src.reviews.models import Review
 
 from .conftest import FIXED_REVIEWER_EMAIL
 
 
-def test_load_database_from_csv():
-    pass
+def test_load_database_from_csv(empty_sessionmaker: sessionmaker, tmp_path: Path):
+    csv_file = tmp_path / "reviews.csv"
+    with open(csv_file, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerow(
+            ["Jane Doe", "Great", "5", "Loved it, would buy again", "jane@example.com", "UK", "2023-01-01"]
+        )
+        writer.writerow(
+            ["Jane Doe", "Good", "4", "Quite satisfied with it", "jane@example.com", "UK", "2023-01-02"]
+        )
+        writer.writerow(
+            ["John Doe", "Bad", "9", "Rating is out of range", "john@example.com", "Spain", "2023-01-03"]
+        )
+        writer.writerow(
+            ["No Email", "Nice", "4", "Reviewer email is invalid", "invalid", "Spain", "2023-01-04"]
+        )
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    stats = load_database_from_csv(
+        str(csv_file), rejects_path=rejects_path, session_factory=empty_sessionmaker
+    )
+
+    assert stats.rows == 4
+    assert stats.bytes_read == csv_file.stat().st_size
+    assert (stats.reviewers_loaded, stats.reviewers_skipped) == (2, 2)
+    assert (stats.reviews_loaded, stats.reviews_skipped) == (2, 2)
+    assert stats.rejected_rows == 2
+
+    rejects = [json.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert [(reject["row"], reject["entity"]) for reject in rejects] == [(2, "review"), (3, "reviewer")]
+    assert rejects[0]["data"]["Review Rating"] == "9"
+    assert rejects[0]["errors"][0]["loc"] == ["rating"]
+
+
+ROWS = [
+    ["Jane Doe", "Great", "5", "Loved it, would buy again", "jane@example.com", "UK", "2023-01-01"],
+    ["John Doe", "Good", "4", "Quite satisfied with it", "john@example.com", "Spain", "2023-01-02"],
+]
+
+COMPRESSORS = {
+    Compression.none: lambda data: data,
+    Compression.gzip: gzip.compress,
+    Compression.zstd: lambda data: pytest.importorskip("zstandard").ZstdCompressor().compress(data),
+}
+
+
+def csv_bytes(rows=ROWS) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+@pytest.mark.parametrize("compression", list(Compression))
+def test_load_database_compressed(empty_sessionmaker: sessionmaker, tmp_path: Path, compression: Compression):
+    # The compression is detected from the file's contents, not its name
+    path = tmp_path / "reviews.csv"
+    path.write_bytes(COMPRESSORS[compression](csv_bytes()))
+
+    stats = load_database_from_csv(str(path), session_factory=empty_sessionmaker)
+
+    assert (stats.rows, stats.reviews_loaded) == (2, 2)
+    assert stats.bytes_read == path.stat().st_size
+
+
+def test_load_database_jsonl(empty_sessionmaker: sessionmaker, tmp_path: Path):
+    names = {"Reviewer Name": "name", "Review Rating": "stars", "Email Address": "email"}
+    records = [{names.get(column, column): value for column, value in zip(CSV_COLUMNS, row)} for row in ROWS]
+    records[1]["stars"] = 4
+    lines = [json.dumps(record) for record in records] + ["", "{not json", "[1, 2]"]
+    path = tmp_path / "reviews.jsonl.gz"
+    path.write_bytes(gzip.compress("\n".join(lines).encode()))
+    rejects_path = tmp_path / "rejects.jsonl"
+
+    source = IngestSource(str(path), columns=names)
+    assert source.format == SourceFormat.jsonl
+    stats = load_database(source, rejects_path=rejects_path, session_factory=empty_sessionmaker)
+
+    assert (stats.rows, stats.reviewers_loaded, stats.reviews_loaded, stats.rejected_rows) == (4, 2, 2, 2)
+    rejects = [json.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert [(reject["row"], reject["entity"]) for reject in rejects] == [(2, "record"), (3, "record")]
+    assert rejects[1]["data"] == {"line": "[1, 2]"}
+    with empty_sessionmaker() as session:
+        assert sorted(session.exec(select(Review.rating))) == [4, 5]
+
+
+def test_load_database_stdin(
+    empty_sessionmaker: sessionmaker, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+):
+    stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(gzip.compress(csv_bytes()))))
+    monkeypatch.setattr(sys, "stdin", stdin)
+
+    with caplog.at_level(logging.INFO):
+        stats = load_database(IngestSource("-"), session_factory=empty_sessionmaker)
+
+    assert stats.reviews_loaded == 2
+    assert "Loading csv data from stdin" in caplog.messages
+    # stdin is left open
+    assert not stdin.buffer.closed
+
+
+def test_source_missing_fields(empty_sessionmaker: sessionmaker, tmp_path: Path):
+    path = tmp_path / "reviews.jsonl"
+    path.write_text(json.dumps({"Reviewer Name": "Jane Doe", "Email Address": "jane@example.com"}))
+
+    records = list(IngestSource(path).records())
+    assert records[0]["Country"] == ""
+    stats = load_database(IngestSource(path), session_factory=empty_sessionmaker)
+    assert (stats.rows, stats.rejected_rows) == (1, 1)
+
+
+def test_source_streams_records(tmp_path: Path):
+    rows = [
+        [f"Reviewer {n}", "Title", "5", f"Content {uuid.uuid4()}", f"r{n}@example.com", "UK", "2023-01-01"]
+        for n in range(20000)
+    ]
+    path = tmp_path / "reviews.csv.gz"
+    path.write_bytes(gzip.compress(csv_bytes(rows)))
+
+    source = IngestSource(path)
+    records = source.records()
+    assert next(records)["Reviewer Name"] == "Reviewer 0"
+    # Only the start of the file has been read and decompressed
+    assert 0 < source.bytes_read < path.stat().st_size
+    assert sum(1 for _ in records) == len(rows) - 1
+    assert source.bytes_read == path.stat().st_size
+
+
+def test_source_unknown_column():
+    with pytest.raises(SourceError):
+        IngestSource("reviews.jsonl", columns={"Stars": "stars"})
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("reviews.csv", SourceFormat.csv),
+        ("reviews.csv.gz", SourceFormat.csv),
+        ("reviews.ndjson", SourceFormat.jsonl),
+        ("reviews.2024-01-01.jsonl.zst", SourceFormat.jsonl),
+        ("-", SourceFormat.csv),
+    ],
+)
+def test_source_format(path: str, expected: SourceFormat):
+    assert IngestSource(path).format == expected
+
+
+def test_reject_sink_only_creates_file_when_rejecting(tmp_path: Path):
+    path = tmp_path / "rejects.jsonl"
+    with RejectSink(path):
+        pass
+    assert not path.exists()
+
+    with RejectSink(path) as rejects:
+        rejects.write(1, {"Country": "Atlantis"}, "reviewer", [{"msg": "Unknown country"}])
+    assert rejects.count == 1
+    assert json.loads(path.read_text())["errors"] == [{"msg": "Unknown country"}]
+
+
+def test_rate_limited_log(caplog: pytest.LogCaptureFixture):
+    rate_limited_log = RateLimitedLog(logging.getLogger("test"), interval=3600)
+    with caplog.at_level(logging.WARNING):
+        for n in range(5):
+            rate_limited_log.warning(f"Skipping row {n}")
+        rate_limited_log._last -= 3600
+        rate_limited_log.warning("Skipping row 5")
+
+    assert caplog.messages == ["Skipping row 0", "Skipping row 5 (4 similar messages suppressed)"]
 
 
 @pytest.mark.parametrize(
@@ -98,3 +287,18 @@ def test_load_database_from_csv():
 def test_load_row(session: Session, row_number: int, row: dict, expected_result: Tuple[bool]):
     result = load_row(row_number, row, session)
     assert result == expected_result
+
+
+def test_load_row_unknown_country(session: Session):
+    row = {
+        "Email Address": "valid@example.com",
+        "Reviewer Name": "John Doe",
+        "Country": "Atlantis",
+        "Review Title": "Nice Product",
+        "Review Rating": "4",
+        "Review Content": "Great product!",
+        "Review Date": "2023-01-01",
+    }
+    rejects = RejectSink(None)
+    assert load_row(7, row, session, rejects) == (False, False)
+    assert rejects.count == 1
@@ -0,0 +1,143 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Engine, create_engine, text
+
+from src.database import sqlcipher_driver
+from src.maintenance import (
+    AUTO_VACUUM_INCREMENTAL,
+    MaintenanceScheduler,
+    _pragma,
+    database_stats,
+    enable_incremental_vacuum,
+    last_write_time,
+    wal_path,
+)
+from src.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> Path:
+    return tmp_path / "maintenance.db"
+
+
+@pytest.fixture
+def file_engine(database: Path):
+    engine = create_engine(f"sqlite:///{database}", module=sqlcipher_driver)
+    enable_incremental_vacuum(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)"))
+    yield engine
+    engine.dispose()
+
+
+def insert_rows(engine: Engine, count: int = 2000):
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO t (value) VALUES (:value)"), [{"value": "x" * 200} for _ in range(count)]
+        )
+
+
+def make_scheduler(engine: Engine, database: Path, **kwargs) -> MaintenanceScheduler:
+    kwargs = {"idle_seconds": 0, "checkpoint_size": 1, "vacuum_freelist_pages": 1, **kwargs}
+    return MaintenanceScheduler(engine, database, metrics=MetricsRegistry(), **kwargs)
+
+
+def test_enable_incremental_vacuum(database: Path):
+    engine = create_engine(f"sqlite:///{database}", module=sqlcipher_driver)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    assert _pragma(engine, "auto_vacuum")[0][0] == 0
+
+    enable_incremental_vacuum(engine)
+    assert _pragma(engine, "auto_vacuum")[0][0] == AUTO_VACUUM_INCREMENTAL
+    engine.dispose()
+
+
+def test_truncate_checkpoint_when_idle(file_engine: Engine, database: Path):
+    insert_rows(file_engine)
+    assert wal_path(database).stat().st_size > 0
+
+    scheduler = make_scheduler(file_engine, database)
+    scheduler.run_once()
+
+    assert database_stats(file_engine, database).wal_size_bytes == 0
+    snapshot = scheduler.metrics.snapshot()
+    assert snapshot["maintenance.checkpoints.truncate"] == 1
+    assert "maintenance.checkpoints.passive" not in snapshot
+
+
+def test_passive_checkpoint_when_busy(file_engine: Engine, database: Path):
+    scheduler = make_scheduler(file_engine, database, idle_seconds=3600)
+    insert_rows(file_engine)
+    assert not scheduler.idle
+
+    scheduler.run_once()
+
+    snapshot = scheduler.metrics.snapshot()
+    assert snapshot["maintenance.checkpoints.passive"] == 1
+    assert "maintenance.checkpoints.truncate" not in snapshot
+    assert "maintenance.vacuumed_pages" not in snapshot
+
+
+def test_idle_sees_writes_from_other_workers(file_engine: Engine, database: Path):
+    scheduler = make_scheduler(file_engine, database, idle_seconds=60)
+    insert_rows(file_engine)
+    stale = time.time() - 120
+    os.utime(wal_path(database), (stale, stale))
+    assert scheduler.idle
+
+    # A write through another engine, as another worker process would make, isn't seen by a commit listener
+    other_engine = create_engine(f"sqlite:///{database}", module=sqlcipher_driver)
+    insert_rows(other_engine, count=1)
+    other_engine.dispose()
+    assert last_write_time(database) > stale
+    assert not scheduler.idle
+
+
+def test_passive_checkpoint_below_threshold(file_engine: Engine, database: Path):
+    scheduler = make_scheduler(file_engine, database, idle_seconds=3600, checkpoint_size=1 << 30)
+    insert_rows(file_engine)
+
+    scheduler.run_once()
+
+    assert scheduler.metrics.snapshot() == {"maintenance.runs": 1}
+
+
+def test_vacuum_releases_free_pages(file_engine: Engine, database: Path):
+    insert_rows(file_engine)
+    with file_engine.begin() as connection:
+        connection.execute(text("DELETE FROM t"))
+    freelist_pages = database_stats(file_engine, database).freelist_pages
+    assert freelist_pages > 10
+
+    scheduler = make_scheduler(file_engine, database, vacuum_pages=10)
+    scheduler.run_once()
+
+    assert database_stats(file_engine, database).freelist_pages == freelist_pages - 10
+    assert scheduler.metrics.snapshot()["maintenance.vacuumed_pages"] == 10
+
+
+def test_scheduler_start_stop(file_engine: Engine, database: Path):
+    scheduler = make_scheduler(file_engine, database, interval=0.01)
+    scheduler.start()
+    assert scheduler.running
+    for _ in range(100):
+        if scheduler.metrics.snapshot().get("maintenance.runs"):
+            break
+        time.sleep(0.01)
+    scheduler.stop()
+    assert not scheduler.running
+    assert scheduler.metrics.snapshot()["maintenance.runs"] >= 1
+
+
+def test_collect(file_engine: Engine, database: Path):
+    values = make_scheduler(file_engine, database).collect()
+    assert set(values) == {
+        "database.page_size",
+        "database.page_count",
+        "database.freelist_pages",
+        "database.wal_size_bytes",
+    }
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from src.profiler import Profile, SamplingProfiler
+
+
+def busy_work(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def idle_work(stop: threading.Event):
+    stop.wait()
+
+
+@pytest.fixture
+def threads():
+    stop = threading.Event()
+    busy = threading.Thread(target=busy_work, args=(stop,), name="busy")
+    idle = threading.Thread(target=idle_work, args=(stop,), name="idle")
+    busy.start()
+    idle.start()
+    yield
+    stop.set()
+    busy.join()
+    idle.join()
+
+
+def thread_names(profile: Profile):
+    return {thread_name for thread_name, _ in profile.samples}
+
+
+def test_profile_all_threads(threads):
+    profile = SamplingProfiler(interval=0.001).run(0.1)
+
+    assert profile.duration >= 0.1
+    assert "busy" in thread_names(profile)
+    # Threads waiting for work are left out, along with the profiler's own thread
+    assert "idle" not in thread_names(profile)
+    assert threading.current_thread().name not in thread_names(profile)
+
+
+def test_profile_include_idle(threads):
+    profile = SamplingProfiler(interval=0.001, include_idle=True).run(0.05)
+    assert {"busy", "idle"} <= thread_names(profile)
+
+
+def test_profile_codes(threads):
+    profile = SamplingProfiler(interval=0.001, codes=frozenset([idle_work.__code__]), include_idle=True).run(
+        0.05
+    )
+    assert thread_names(profile) == {"idle"}
+
+
+def test_collapsed(threads):
+    collapsed = SamplingProfiler(interval=0.001).run(0.05).collapsed()
+    line = next(line for line in collapsed.splitlines() if line.startswith("busy;"))
+    stack, count = line.rsplit(" ", 1)
+    assert f"{__name__}:busy_work" in stack.split(";")
+    assert int(count) > 0
+
+
+def test_speedscope(threads):
+    profile = SamplingProfiler(interval=0.001).run(0.05)
+    speedscope = profile.speedscope()
+
+    frames = speedscope["shared"]["frames"]
+    busy = next(thread for thread in speedscope["profiles"] if thread["name"] == "busy")
+    assert busy["type"] == "sampled"
+    assert len(busy["samples"]) == len(busy["weights"])
+    assert any(frames[index]["name"] == f"{__name__}:busy_work" for index in busy["samples"][0])
+    assert busy["endValue"] == pytest.approx(sum(busy["weights"]))
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Dict, List
+
+import pytest
+from fastapi import status
+
+from src.admission import RequestClass
+from src.metrics import MetricsRegistry
+from src.ratelimit import MemoryStore, RateLimitMiddleware
+
+COSTS = {RequestClass.read: 1, RequestClass.write: 5, RequestClass.heavy: 10}
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def request(
+    middleware: RateLimitMiddleware, method: str, path: str, api_key: str | None = "key"
+) -> List[dict]:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    headers = [(b"x-api-key", api_key.encode())] if api_key is not None else []
+    scope = {"type": "http", "method": method, "path": path, "root_path": "", "headers": headers}
+    asyncio.run(middleware(scope, None, send))
+    return messages
+
+
+def headers(messages: List[dict]) -> Dict[bytes, bytes]:
+    return dict(messages[0]["headers"])
+
+
+def test_memory_store_refills():
+    store = MemoryStore()
+    assert store.take("key", 3, rate=1, burst=4, now=0) == (True, 1)
+    assert store.take("key", 3, rate=1, burst=4, now=1) == (False, 2)
+    assert store.take("key", 3, rate=1, burst=4, now=2) == (True, 0)
+    # Refills up to the burst size
+    assert store.take("key", 1, rate=1, burst=4, now=100) == (True, 3)
+    # Keys have their own buckets
+    assert store.take("other", 4, rate=1, burst=4, now=2) == (True, 0)
+
+
+def test_memory_store_prunes_full_buckets():
+    store = MemoryStore(max_keys=3)
+    store.take("a", 1, rate=1, burst=10, now=0)
+    store.take("b", 1, rate=1, burst=10, now=5)
+    store.take("c", 1, rate=1, burst=10, now=5)
+    # Bucket a has refilled, so it is dropped to make room
+    store.take("d", 1, rate=1, burst=10, now=5)
+    assert list(store.buckets) == ["b", "c", "d"]
+    # No bucket has refilled, so the oldest is dropped
+    store.take("e", 1, rate=1, burst=10, now=5)
+    assert list(store.buckets) == ["c", "d", "e"]
+
+
+def test_middleware_limits_key():
+    registry = MetricsRegistry()
+    middleware = RateLimitMiddleware(ok_app, rate=0.001, burst=12, costs=COSTS, metrics=registry)
+
+    response = request(middleware, "GET", "/reviews")
+    assert response[0]["status"] == status.HTTP_200_OK
+    assert headers(response)[b"ratelimit-limit"] == b"12"
+    assert headers(response)[b"ratelimit-remaining"] == b"2"
+    assert headers(response)[b"content-type"] == b"text/plain"
+
+    # A write costs more than is left
+    response = request(middleware, "POST", "/reviews")
+    assert response[0]["status"] == status.HTTP_429_TOO_MANY_REQUESTS
+    assert headers(response)[b"ratelimit-remaining"] == b"2"
+    assert int(headers(response)[b"retry-after"]) > 0
+    assert registry.get("ratelimit.limited") == 1
+
+    # Cheaper reads still fit
+    assert request(middleware, "GET", "/reviews/1")[0]["status"] == status.HTTP_200_OK
+    # Other keys aren't affected
+    assert request(middleware, "POST", "/reviews", api_key="other")[0]["status"] == status.HTTP_200_OK
+
+
+@pytest.mark.parametrize(
+    "path, api_key", [("/healthz", "key"), ("/admin/metrics", "key"), ("/reviews", None)]
+)
+def test_middleware_exempt(path: str, api_key: str | None):
+    middleware = RateLimitMiddleware(ok_app, rate=0.001, burst=1, costs=COSTS)
+    for _ in range(20):
+        response = request(middleware, "GET", path, api_key=api_key)
+        assert response[0]["status"] == status.HTTP_200_OK
+    assert b"ratelimit-limit" not in headers(response)
+
+
+def test_middleware_overhead():
+    middleware = RateLimitMiddleware(ok_app, rate=1e9, burst=1e9, costs=COSTS)
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/reviews/1",
+        "root_path": "",
+        "headers": [(b"x-api-key", b"key")],
+    }
+
+    async def send(message):
+        pass
+
+    async def run(app, count: int) -> float:
+        start = time.perf_counter()
+        for _ in range(count):
+            await app(scope, None, send)
+        return (time.perf_counter() - start) / count
+
+    async def overhead() -> float:
+        return await run(middleware, 10000) - await run(ok_app, 10000)
+
+    # Microseconds a request, with a generous margin for slow machines
+    assert asyncio.run(overhead()) < 50e-6
@@ -0,0 +1,63 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from src.responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, select_media_type
+
+from .conftest import REVIEWS_COUNT
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.mark.parametrize(
+    "accept, expected_media_type",
+    [
+        ("", JSON_MEDIA_TYPE),
+        ("*/*", JSON_MEDIA_TYPE),
+        ("application/json", JSON_MEDIA_TYPE),
+        ("application/msgpack", MSGPACK_MEDIA_TYPE),
+        ("application/x-msgpack", MSGPACK_MEDIA_TYPE),
+        ("application/msgpack, */*;q=0.8", MSGPACK_MEDIA_TYPE),
+        ("application/json, application/msgpack;q=0.5", JSON_MEDIA_TYPE),
+    ],
+)
+def test_select_media_type(accept: str, expected_media_type: str):
+    assert select_media_type(accept) == expected_media_type
+
+
+def test_msgpack_list_response(test_client: TestClient):
+    response = test_client.get("/reviews", headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert "Accept" in response.headers["vary"]
+
+    data = msgpack.unpackb(response.content)
+    assert len(data) == REVIEWS_COUNT
+    assert data == test_client.get("/reviews").json()
+
+
+def test_msgpack_item_response(test_client: TestClient):
+    response = test_client.get("/reviewers/1", headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(response.content)["id"] == 1
+
+
+def test_json_response_by_default(test_client: TestClient):
+    response = test_client.get("/reviewers/1")
+    assert response.headers["content-type"] == JSON_MEDIA_TYPE
+    assert response.json()["id"] == 1
+
+
+@pytest.mark.parametrize(
+    "url, expected_status",
+    [
+        ("/reviewers/0", status.HTTP_404_NOT_FOUND),
+        ("/reviews?limit=abc", status.HTTP_422_UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_msgpack_error_response(test_client: TestClient, url: str, expected_status: int):
+    response = test_client.get(url, headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == expected_status
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(response.content) == test_client.get(url).json()
@@ -0,0 +1,119 @@
+import time
+from pathlib import Path
+from typing import Dict
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import Engine, text
+from sqlmodel import Session, SQLModel, delete, func, select
+
+from src.minhash import BANDS, bands, shingles, signature, similarity
+from src.reviews.models import Review
+from src.similarity import (
+    ReviewBand,
+    ReviewSignature,
+    SimilarityBackfill,
+    backfill,
+    candidates_statement,
+    find_similar,
+)
+
+from .conftest import REVIEWS_COUNT
+from .test_sorting import query_plan
+
+TEXT = "I ordered a new phone and it arrived broken, customer service was useless and refused to refund me."
+
+
+def indexed_reviews(session: Session) -> Dict[int, bytes]:
+    return {row.review_id: row.signature for row in session.exec(select(ReviewSignature))}
+
+
+def test_shingles():
+    assert shingles("Great product, GREAT price") == {"great product great", "product great price"}
+    assert shingles("Great!") == {"great"}
+
+
+@pytest.mark.parametrize(
+    "other, low, high",
+    [
+        (TEXT, 1.0, 1.0),
+        (TEXT.upper().replace(",", ""), 1.0, 1.0),
+        (f"{TEXT} Avoid!", 0.7, 1.0),
+        ("Great shop, fast delivery and the staff were friendly. Would buy again.", 0.0, 0.1),
+    ],
+)
+def test_similarity(other: str, low: float, high: float):
+    assert low <= similarity(signature(TEXT), signature(other)) <= high
+
+
+def test_near_duplicates_share_a_band():
+    assert len(bands(signature(TEXT))) == BANDS
+    assert set(bands(signature(TEXT))) & set(bands(signature(f"{TEXT} Avoid!")))
+
+
+def test_reviews_indexed_on_write(test_client: TestClient, session: Session):
+    signatures = indexed_reviews(session)
+    assert len(signatures) == REVIEWS_COUNT
+    assert signatures[1] == signature(session.get(Review, 1).content)
+    assert session.exec(select(func.count()).select_from(ReviewBand)).one() == REVIEWS_COUNT * BANDS
+
+    test_client.patch("/reviews/1", json={"content": TEXT})
+    assert indexed_reviews(session)[1] == signature(TEXT)
+    assert {band.bucket for band in session.exec(select(ReviewBand).where(ReviewBand.review_id == 1))} == set(
+        bands(signature(TEXT))
+    )
+
+    reviewer_id = session.get(Review, 1).reviewer_id
+    response = test_client.delete(f"/reviewers/{reviewer_id}", params={"cascade": "true"})
+    assert response.status_code == 204
+    assert 1 not in indexed_reviews(session)
+    assert not session.exec(select(ReviewBand).where(ReviewBand.review_id == 1)).all()
+
+
+def test_backfill(session: Session):
+    expected = indexed_reviews(session)
+    session.exec(delete(ReviewBand))
+    session.exec(delete(ReviewSignature))
+
+    assert backfill(session.connection(), batch_size=50) == REVIEWS_COUNT
+    assert indexed_reviews(session) == expected
+    assert session.exec(select(func.count()).select_from(ReviewBand)).one() == REVIEWS_COUNT * BANDS
+    assert backfill(session.connection()) == 0
+
+
+def test_existing_reviews_indexed_in_background(engine: Engine, tmp_path: Path):
+    with engine.begin() as connection:
+        ReviewBand.__table__.drop(connection)
+        ReviewSignature.__table__.drop(connection)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        assert not indexed_reviews(session)
+
+    similarity_backfill = SimilarityBackfill(engine, lock_path=tmp_path / "similarity.lock", batch_size=50)
+    similarity_backfill.start()
+    for _ in range(500):
+        if not similarity_backfill.running:
+            break
+        time.sleep(0.01)
+    similarity_backfill.stop()
+
+    with Session(engine) as session:
+        assert len(indexed_reviews(session)) == REVIEWS_COUNT
+        assert session.exec(select(func.count()).select_from(ReviewBand)).one() == REVIEWS_COUNT * BANDS
+
+
+def test_find_similar(session: Session):
+    content = session.get(Review, 1).content
+    assert find_similar(session, signature(content), 1.0) == [(1, 1.0)]
+    assert find_similar(session, signature(content), 0.5, exclude=1) == []
+
+
+def test_candidate_lookup_uses_index(engine: Engine):
+    plan = query_plan(engine, candidates_statement(signature(TEXT)))
+    assert not any(step.startswith("SCAN") for step in plan)
+    assert sum(step.startswith("SEARCH review_band") for step in plan) == BANDS
+
+
+def test_minhash_functions_registered(engine: Engine):
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT minhash(:text)"), {"text": TEXT}).scalar() == signature(TEXT)
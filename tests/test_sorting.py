@@ -0,0 +1,57 @@
+from typing import List
+
+import pytest
+from sqlalchemy import Engine, text
+
+from src.reviewers.dependencies import ReviewerFilterSet, ReviewerSortSet
+from src.reviews.dependencies import ReviewFilterSet, ReviewSortSet
+from src.sorting import SortOrder
+
+
+def query_plan(engine: Engine, statement) -> List[str]:
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def test_sort_order_parse():
+    order = SortOrder.parse("rating,-created_at")
+    assert order.keys == (("rating", False), ("created_at", True))
+    assert str(order.reverse()) == "-rating,created_at"
+
+
+def test_sort_set_accepts_reverse():
+    assert {"rating,-created_at", "-rating,created_at", "-created_at"} <= set(ReviewSortSet.valid)
+    assert "-created_at,rating" not in ReviewSortSet.valid
+
+
+def test_order_by_breaks_ties_by_id():
+    order_by = ReviewSortSet(ReviewSortSet.valid["-rating,created_at"]).order_by
+    assert [str(clause) for clause in order_by] == [
+        "review.rating DESC",
+        "review.created_at ASC",
+        "review.id DESC",
+    ]
+    assert [str(clause) for clause in ReviewSortSet(ReviewSortSet.valid["-id"]).order_by] == [
+        "review.id DESC"
+    ]
+    assert ReviewSortSet().order_by == []
+
+
+@pytest.mark.parametrize(
+    "filter_set, sort_set, sort",
+    [(ReviewFilterSet, ReviewSortSet, sort) for sort in ReviewSortSet.valid]
+    + [(ReviewerFilterSet, ReviewerSortSet, sort) for sort in ReviewerSortSet.valid],
+)
+def test_sort_uses_index(engine: Engine, filter_set, sort_set, sort: str):
+    statement = filter_set().statement().order_by(*sort_set(sort_set.valid[sort]).order_by).limit(20)
+    plan = query_plan(engine, statement)
+    # Rows are read in order from an index, rather than all being sorted
+    assert not any("TEMP B-TREE" in step for step in plan)
+    assert len(plan) == 1 and plan[0].startswith("SCAN")
+
+
+def test_unsupported_sort_needs_sorting(engine: Engine):
+    order = ReviewSortSet(SortOrder.parse("-created_at,rating"))
+    plan = query_plan(engine, ReviewFilterSet().statement().order_by(*order.order_by).limit(20))
+    assert any("TEMP B-TREE" in step for step in plan)
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, func, select
+
+from src import writer
+from src.reviewers.models import Reviewer
+from src.writer import WriteQueue
+
+WRITES_COUNT = 50
+
+
+def create_reviewer(email: str):
+    def write(session: Session) -> int:
+        db_reviewer = Reviewer(email=email, name="Roy Harper", country="USA")
+        session.add(db_reviewer)
+        session.flush()
+        return db_reviewer.id
+
+    return write
+
+
+@pytest.fixture(scope="function")
+def write_queue(empty_sessionmaker: sessionmaker):
+    write_queue = WriteQueue(empty_sessionmaker, max_batch_size=20, max_wait=0.05)
+    write_queue.start()
+    yield write_queue
+    write_queue.stop()
+
+
+def test_write_queue_group_commits(write_queue: WriteQueue, empty_sessionmaker: sessionmaker):
+    with ThreadPoolExecutor(max_workers=WRITES_COUNT) as executor:
+        futures = [
+            executor.submit(
+                lambda n: write_queue.submit(create_reviewer(f"arsenal{n}@arrow.com")).result(), n
+            )
+            for n in range(WRITES_COUNT)
+        ]
+        ids = [future.result() for future in futures]
+
+    assert sorted(ids) == list(range(1, WRITES_COUNT + 1))
+    # Concurrent writes share commits, bounded by the max batch size
+    assert -(-WRITES_COUNT // write_queue.max_batch_size) <= write_queue.commits < WRITES_COUNT
+    with empty_sessionmaker() as session:
+        assert session.exec(select(func.count(Reviewer.id))).first() == WRITES_COUNT
+
+
+def test_write_queue_isolates_failed_writes(write_queue: WriteQueue, empty_sessionmaker: sessionmaker):
+    emails = ["speedy@arrow.com", "speedy@arrow.com", "thea@arrow.com"]
+    futures = [write_queue.submit(create_reviewer(email)) for email in emails]
+
+    assert futures[0].result() == 1
+    with pytest.raises(IntegrityError):
+        futures[1].result()
+    assert futures[2].result() == 2
+    with empty_sessionmaker() as session:
+        assert session.exec(select(Reviewer.email).order_by(Reviewer.id)).all() == [emails[0], emails[2]]
+
+
+def test_write_queue_stop_commits_queued_writes(empty_sessionmaker: sessionmaker):
+    write_queue = WriteQueue(empty_sessionmaker, max_batch_size=100, max_wait=1)
+    write_queue.start()
+    futures = [write_queue.submit(create_reviewer(f"canary{n}@arrow.com")) for n in range(5)]
+    write_queue.stop()
+
+    assert [future.result(timeout=0) for future in futures] == [1, 2, 3, 4, 5]
+
+
+def test_post_reviewer_with_write_queue(test_client: TestClient, write_queue: WriteQueue, monkeypatch):
+    monkeypatch.setattr(writer, "write_queue", write_queue)
+    body = {"name": "Oliver Queen", "email": "green.arrow@queen-consolidated.com", "country": "USA"}
+
+    response = test_client.post("/reviewers", json=body)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id"] == 1
+
+    response = test_client.post("/reviewers", json=body)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    response = test_client.patch("/reviewers/2", json={"name": "Green Arrow"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND